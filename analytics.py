@@ -0,0 +1,257 @@
+"""
+Practice analytics
+Write handlers bump per-doctor daily counters in `daily_stats` inside their
+own transaction, so /api/analytics only ever reads a few hundred rollup rows
+instead of grouping visits, documents and sheet entries on the fly.
+`rebuild` recomputes rollups from the source tables; run it nightly to pick
+up rows written outside the API.
+
+The counters are hot rows: all of a doctor's visits of one type on one day,
+and all of their uploads of one day, add to the same row, and its lock is
+held until the handler commits. Concurrent writes of one doctor therefore
+serialize on it. Handlers bump just before record_change and the commit,
+so the wait is one commit long, which a single practice's write rate
+(a few writes a minute) never notices. Buffering the increments would cost
+the rollups their transactional accuracy.
+
+Usage:
+    python analytics.py rebuild [days]   # every shard, last `days` days
+    python analytics.py rebuild all      # every shard, full history
+
+Weekly summaries use pandas when it is installed.
+"""
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+
+import mysql.connector
+from config import SHARDS, ANALYTICS_REBUILD_DAYS
+
+import db_backend
+
+try:
+    import pandas as pd  # type: ignore
+except ImportError:
+    pd = None
+
+# Longest chief complaint kept as a dimension
+COMPLAINT_LENGTH = 100
+
+# metric -> (source tables, time column, dimension, value, extra condition).
+# Every source joins `patients p` so rows are attributed to the owning doctor.
+SOURCES = {
+    "visits": (
+        "visits v JOIN patients p ON p.id = v.patient_id",
+        "v.visit_date", "COALESCE(v.visit_type, '')", "COUNT(*)", "",
+    ),
+    "complaints": (
+        "visits v JOIN patients p ON p.id = v.patient_id",
+        "v.visit_date", f"LEFT(LOWER(TRIM(v.chief_complaint)), {COMPLAINT_LENGTH})", "COUNT(*)",
+        "AND TRIM(v.chief_complaint) <> ''",
+    ),
+    "documents": (
+        "documents d JOIN patients p ON p.id = d.patient_id",
+        "d.uploaded_at", "COALESCE(d.file_type, '')", "COUNT(*)", "",
+    ),
+    "document_bytes": (
+        "documents d JOIN patients p ON p.id = d.patient_id",
+        "d.uploaded_at", "''", "COALESCE(SUM(d.file_size), 0)", "",
+    ),
+    "sheets": (
+        "sheet_entries se JOIN patients p ON p.id = se.patient_id",
+        "se.created_at", "se.sheet_type", "COUNT(*)", "",
+    ),
+}
+
+
+# ---------- write path ----------
+
+def bump(cur, doctor_id, metric, dimension="", amount=1, day=None):
+    """Add `amount` to one counter; `day` defaults to today on the database clock."""
+    cur.execute(
+        """
+        INSERT INTO daily_stats (doctor_id, day, metric, dimension, value)
+        VALUES (%s, COALESCE(%s, CURRENT_DATE), %s, %s, %s)
+        ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+        """,
+        (doctor_id, day, metric, dimension, amount),
+    )
+
+
+def record_visit(cur, doctor_id, visit_date, visit_type, chief_complaint):
+    bump(cur, doctor_id, "visits", visit_type or "", day=visit_date)
+    # Same normalization as the "complaints" source query
+    complaint = (chief_complaint or "").strip(" ").lower()[:COMPLAINT_LENGTH]
+    if complaint:
+        bump(cur, doctor_id, "complaints", complaint, day=visit_date)
+
+
+def record_document(cur, doctor_id, file_type, file_size):
+    bump(cur, doctor_id, "documents", file_type or "")
+    bump(cur, doctor_id, "document_bytes", amount=file_size or 0)
+
+
+def record_sheet(cur, doctor_id, sheet_type):
+    bump(cur, doctor_id, "sheets", sheet_type)
+
+
+def _aggregate(cur, condition, params, sign=1):
+    """Add (sign=1) or subtract (sign=-1) the source rows matching `condition`.
+
+    `condition` may refer to the source's time column as {time}.
+    """
+    for metric, (source, time_column, dimension, value, extra) in SOURCES.items():
+        cur.execute(
+            f"""
+            INSERT INTO daily_stats (doctor_id, day, metric, dimension, value)
+            SELECT p.doctor_id, DATE({time_column}), '{metric}', {dimension}, {sign} * {value}
+            FROM {source}
+            WHERE {condition.format(time=time_column)} {extra}
+            GROUP BY 1, 2, 4
+            ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+            """,
+            params,
+        )
+
+
+def retract_patient(cur, doctor_id, patient_id):
+    """Take a patient's rows out of the rollups; call before deleting them."""
+    _aggregate(cur, "p.id = %s", (patient_id,), sign=-1)
+    cur.execute("DELETE FROM daily_stats WHERE doctor_id = %s AND value = 0", (doctor_id,))
+
+
+def rebuild(conn, since=None, doctor_id=None):
+    """Recompute rollups from `since` (None: all history), for one doctor or all."""
+    condition, params = "1 = 1", ()
+    if since is not None:
+        condition, params = "{time} >= %s", (since,)
+    delete = "DELETE FROM daily_stats WHERE 1 = 1"
+    delete_params = ()
+    if since is not None:
+        delete += " AND day >= %s"
+        delete_params += (since,)
+    if doctor_id is not None:
+        condition += " AND p.doctor_id = %s"
+        params += (doctor_id,)
+        delete += " AND doctor_id = %s"
+        delete_params += (doctor_id,)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(delete, delete_params)
+        _aggregate(cur, condition, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# ---------- read path ----------
+
+def version(cur, doctor_id):
+    """Cheap stand-in for the doctor's rollups, for ETags.
+
+    Every handler that bumps a counter also records a change in the same
+    transaction, so the latest change id moves whenever the rollups do;
+    the date covers the nightly rebuild.
+    """
+    cur.execute("SELECT MAX(id) FROM change_log WHERE doctor_id = %s", (doctor_id,))
+    return cur.fetchone()[0], date.today()
+
+
+def load(cur, doctor_id, since, until):
+    """Rollup rows as (day, metric, dimension, value) tuples, since <= day < until."""
+    cur.execute(
+        """
+        SELECT day, metric, dimension, value FROM daily_stats
+        WHERE doctor_id = %s AND day >= %s AND day < %s AND value <> 0
+        ORDER BY day, metric, dimension
+        """,
+        (doctor_id, since, until),
+    )
+    return cur.fetchall()
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _nest(series):
+    nested = defaultdict(dict)
+    for (metric, key), value in series.items():
+        nested[metric][key] = int(value)
+    return nested
+
+
+def _totals(rows):
+    """{metric: {week: n}} and {metric: {dimension: n}}."""
+    if pd is not None and rows:
+        frame = pd.DataFrame(rows, columns=["day", "metric", "dimension", "value"])
+        days = pd.to_datetime(frame["day"])
+        frame["week"] = (days - pd.to_timedelta(days.dt.weekday, unit="D")).dt.date
+        frame["value"] = frame["value"].astype("int64")
+        return (
+            _nest(frame.groupby(["metric", "week"])["value"].sum()),
+            _nest(frame.groupby(["metric", "dimension"])["value"].sum()),
+        )
+    weekly = defaultdict(lambda: defaultdict(int))
+    by_dimension = defaultdict(lambda: defaultdict(int))
+    for day, metric, dimension, value in rows:
+        weekly[metric][week_start(day)] += int(value)
+        by_dimension[metric][dimension] += int(value)
+    return weekly, by_dimension
+
+
+def summarize(rows, since, until, top=10):
+    """Caseload summary over [since, until) from `load` rows."""
+    weekly, by_dimension = _totals(rows)
+    weeks = []
+    week = week_start(since)
+    while week < until:
+        weeks.append(week)
+        week += timedelta(days=7)
+
+    def per_week(metric):
+        counts = weekly.get(metric, {})
+        return [counts.get(w, 0) for w in weeks]
+
+    visit_types = sorted(by_dimension.get("visits", {}).items(), key=lambda kv: (-kv[1], kv[0]))
+    total_visits = sum(n for _, n in visit_types)
+    complaints = sorted(by_dimension.get("complaints", {}).items(), key=lambda kv: (-kv[1], kv[0]))
+    return {
+        "weeks": weeks,
+        "visits_per_week": per_week("visits"),
+        "documents_per_week": per_week("documents"),
+        "document_bytes_per_week": per_week("document_bytes"),
+        "visit_types": [
+            {"visit_type": t, "visits": n, "share": round(n / total_visits, 3)}
+            for t, n in visit_types
+        ],
+        "sheets": dict(sorted(by_dimension.get("sheets", {}).items())),
+        "top_complaints": [{"complaint": c, "visits": n} for c, n in complaints[:top]],
+        "totals": {metric: sum(values.values()) for metric, values in by_dimension.items()},
+    }
+
+
+def rebuild_all(days):
+    since = None if days is None else date.today() - timedelta(days=days)
+    for name, shard in SHARDS.items():
+        conn = db_backend.connect(**shard["primary"])
+        try:
+            rebuild(conn, since)
+            print(f"[OK] Rebuilt rollups on {name}" + (f" since {since}" if since else ""))
+        except mysql.connector.Error as e:
+            print(f"[ERROR] Rebuilding rollups on {name} failed: {e}")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print(__doc__)
+    elif len(sys.argv) > 2 and sys.argv[2] == "all":
+        rebuild_all(None)
+    else:
+        rebuild_all(int(sys.argv[2]) if len(sys.argv) > 2 else ANALYTICS_REBUILD_DAYS)
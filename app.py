@@ -1,17 +1,53 @@
-from flask import Flask, request, jsonify, session, send_from_directory # type: ignore
+from flask import Flask, Response, request, jsonify, session, send_from_directory, redirect, abort, g # type: ignore
 from flask_cors import CORS # type: ignore
 import mysql.connector # type: ignore
 from werkzeug.security import generate_password_hash, check_password_hash  # type: ignore
 from werkzeug.utils import secure_filename  # type: ignore
 from datetime import date, timedelta
-from config import DB_CONFIG, SECRET_KEY
+from decimal import Decimal
+from functools import wraps
+from config import (
+    DB_CONFIG, SECRET_KEY, LATEST_SHEET_WINDOW_MONTHS,
+    REPLICA_CONFIGS, REPLICA_POOL_SIZE, REPLICA_MAX_LAG_SECONDS,
+    REPLICA_LAG_CHECK_INTERVAL, READ_YOUR_WRITES_SECONDS,
+    SHARDS, DEFAULT_SHARD, SHARD_ID_STRIDE, SHARD_MAP_CACHE_SECONDS,
+    COMPRESS_MIN_SIZE,
+    SESSION_BACKEND, DOCTOR_CONTEXT_TTL,
+    RATE_LIMIT_BACKEND, RATE_LIMITS, CONCURRENCY_LIMITS,
+    AUDIT_SINK, AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL,
+    ADMIN_DOCTOR_IDS, CHANGE_FEED_PAGE_SIZE, CHANGE_FEED_MAX_WAIT, CHANGE_FEED_POLL_INTERVAL,
+    EVENT_BROKER, EVENT_QUEUE_SIZE, EVENT_HEARTBEAT_SECONDS, EVENT_STREAMS_REQUIRE_GEVENT,
+    VITALS_MAX_POINTS, ANALYTICS_DEFAULT_WEEKS, ANALYTICS_TOP_COMPLAINTS, UPLOAD_FOLDER,
+    PROFILING_SETTINGS_FILE, PROFILING_FOLDER, PROFILING_INTERVAL, PROFILING_MAX_PROFILES,
+    PRIMARY_POOL_SIZE, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE, SEARCH_MAX_RESULTS,
+    FRONTEND_FOLDER, FRONTEND_BASE,
+)
+from db_router import ReplicaRouter
+from db_backend import router_connect
+from sharding import ShardMap, ShardMoving
+from json_provider import FastJSONProvider, RawJSON
+from http_cache import not_modified, apply_cache_headers, compress_response
+from session_store import DoctorContextCache, make_backend, make_session_interface
+from rate_limit import RateLimiter, make_rate_backend
+from audit import AuditLog, MySQLSink, FileSink
+from changes import record_change, fetch_changes
+from pubsub import make_broker, check_gevent
+import analytics
+import jobs
+from profiling import Profiler, span, trace_connection
+from frontend import Frontend
+import repository
+import search
 import os
+import time
 import uuid
 import json
 
 
 app = Flask(__name__, static_folder='static')
 app.secret_key = SECRET_KEY
+# Dates, decimals and stored sheet JSON are serialized by the provider
+app.json = FastJSONProvider(app)
 CORS(app, supports_credentials=True, origins=["http://localhost:5173"])
 
 
@@ -23,9 +59,14 @@ app.config.update(
     PERMANENT_SESSION_LIFETIME=timedelta(hours=6),
 )
 
+# Session data and per-doctor auth context live server-side, unless
+# SESSION_BACKEND is "cookie"
+session_backend = make_backend(SESSION_BACKEND)
+app.session_interface = make_session_interface(session_backend)
+doctor_context = DoctorContextCache(session_backend, ttl=DOCTOR_CONTEXT_TTL)
+
 
 # Configure upload folder
-UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
@@ -39,8 +80,216 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+router_options = dict(
+    pool_size=REPLICA_POOL_SIZE,
+    primary_pool_size=PRIMARY_POOL_SIZE,
+    max_lag=REPLICA_MAX_LAG_SECONDS,
+    check_interval=REPLICA_LAG_CHECK_INTERVAL,
+    connect=router_connect(),
+)
+# Directory database: doctors and the doctor -> shard map
+db_router = ReplicaRouter(DB_CONFIG, REPLICA_CONFIGS, name="directory", **router_options)
+shard_map = ShardMap(
+    db_router,
+    SHARDS,
+    DEFAULT_SHARD,
+    SHARD_ID_STRIDE,
+    cache_seconds=SHARD_MAP_CACHE_SECONDS,
+    **router_options,
+)
+
+
+def read_only(view):
+    """Mark a handler as safe to serve from a read replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    wrapper.read_only = True
+    return wrapper
+
+
+# ---------- RATE LIMITING / ADMISSION CONTROL ----------
+
+rate_limiter = RateLimiter(make_rate_backend(RATE_LIMIT_BACKEND), RATE_LIMITS, CONCURRENCY_LIMITS)
+ROUTE_CLASSES = {
+    "login": "auth",
+    "register": "auth",
+    "upload_document": "uploads",
+    # Long-lived; rate limited but not counted against in-flight limits
+    "patient_events": "streams",
+    # Long polls: kept apart so that waiting clients cannot starve "reads"
+    "get_changes": "polls",
+}
+
+
+def route_class():
+    if request.endpoint in ROUTE_CLASSES:
+        return ROUTE_CLASSES[request.endpoint]
+    view = app.view_functions.get(request.endpoint)
+    if request.method == "GET" or getattr(view, "read_only", False):
+        return "reads"
+    return "writes"
+
+
+@app.before_request
+def limit_request():
+    if request.method == "OPTIONS" or request.endpoint in (None, "static", "frontend_app"):
+        return None
+    client = f"doctor:{session['doctor_id']}" if "doctor_id" in session else f"ip:{request.remote_addr}"
+    name = route_class()
+    refused = rate_limiter.check(client, name)
+    if refused:
+        status, retry_after = refused
+        message = "Too many requests" if status == 429 else "Server busy"
+        response = jsonify({"error": f"{message}, retry in {retry_after}s"})
+        response.headers["Retry-After"] = str(retry_after)
+        return response, status
+    g.admitted_class = name
+    return None
+
+
+@app.teardown_request
+def release_admission(exc):
+    name = g.pop("admitted_class", None)
+    if name is not None:
+        rate_limiter.done(name)
+
+
+# ---------- AUDIT TRAIL ----------
+
+audit_log = AuditLog(
+    FileSink(AUDIT_SINK[len("file:"):]) if AUDIT_SINK.startswith("file:")
+    else MySQLSink(lambda: db_router.primary()),
+    max_queue=AUDIT_QUEUE_SIZE,
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL,
+)
+# endpoint -> (action, entity)
+AUDITED_ENDPOINTS = {
+    "search_patient": ("search", "patient"),
+    "verify_patient": ("view", "patient"),
+    "create_patient": ("create", "patient"),
+    "get_patient": ("view", "patient"),
+    "get_patient_dashboard": ("view", "patient"),
+    "update_patient": ("update", "patient"),
+    "delete_patient": ("delete", "patient"),
+    "create_visit": ("create", "visit"),
+    "get_visit": ("view", "visit"),
+    "get_latest_sheet": ("view", "sheet"),
+    "get_sheet_history": ("view", "sheet"),
+    "get_sheet_entry": ("view", "sheet"),
+    "save_sheet": ("create", "sheet"),
+    "upload_document": ("create", "document"),
+    "get_digestive": ("view", "digestive"),
+    "save_digestive": ("update", "digestive"),
+    "patient_events": ("subscribe", "patient"),
+    "get_vitals": ("view", "vitals"),
+    "search_notes": ("search", "notes"),
+}
+
+
+@app.after_request
+def audit_access(response):
+    audited = AUDITED_ENDPOINTS.get(request.endpoint)
+    if audited and response.status_code < 400 and "doctor_id" in session:
+        view_args = request.view_args or {}
+        entity_id = next((v for v in view_args.values() if isinstance(v, int)), None)
+        audit_log.record(
+            session["doctor_id"],
+            audited[0],
+            audited[1],
+            entity_id=entity_id,
+            # Handlers that only know a visit/entry id set g.audit_patient_id
+            patient_id=g.get("audit_patient_id", view_args.get("patient_id")),
+            ip=request.remote_addr,
+        )
+    return response
+
+
+# ---------- PROFILING ----------
+
+profiler = Profiler(
+    PROFILING_SETTINGS_FILE, PROFILING_FOLDER,
+    interval=PROFILING_INTERVAL, max_profiles=PROFILING_MAX_PROFILES,
+)
+
+
+@app.before_request
+def start_profile():
+    if request.endpoint in (None, "static") or request.endpoint.startswith("profiling"):
+        return None
+    profiler.start(session.get("doctor_id"), request.endpoint)
+    return None
+
+
+@app.after_request
+def note_profile_status(response):
+    g.profile_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_profile(exc):
+    profiler.finish(g.get("profile_status", 500))
+
+
+def get_directory_db():
+    return trace_connection(db_router.primary())
+
+
 def get_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Connection to the shard of the logged-in doctor."""
+    doctor_id = session.get("doctor_id")
+    if doctor_id is None:
+        return get_directory_db()
+    read_only_request = bool(g.get("read_only"))
+    router = shard_map.router_for(doctor_id, write=not read_only_request)
+    # Read-your-writes: a session that just wrote keeps reading the primary
+    return trace_connection(router.connection(
+        read_only_request, session.get("last_write_at", 0), READ_YOUR_WRITES_SECONDS
+    ))
+
+
+@app.after_request
+def http_cache_and_compression(response):
+    apply_cache_headers(response)
+    return compress_response(response, COMPRESS_MIN_SIZE)
+
+
+def patient_version(conn, patient_id):
+    """Cheap probe of everything a patient's visit list depends on."""
+    return repository.fetch_one(conn, "patient_version", (patient_id,) * 4, dictionary=True)
+
+
+def sheet_version(cur, patient_id, sheet_types):
+    placeholders = ", ".join(["%s"] * len(sheet_types))
+    cur.execute(
+        f"""
+        SELECT COUNT(*) AS entries, MAX(id) AS max_id, MAX(updated_at) AS updated
+        FROM sheet_entries
+        WHERE patient_id = %s AND sheet_type IN ({placeholders})
+        """,
+        (patient_id,) + tuple(sheet_types),
+    )
+    return cur.fetchone()
+
+
+@app.errorhandler(ShardMoving)
+def shard_moving(e):
+    response = jsonify({"error": "Patient data is being moved, please retry shortly"})
+    response.headers["Retry-After"] = str(SHARD_MAP_CACHE_SECONDS)
+    return response, 503
+
+
+@app.after_request
+def remember_write(response):
+    if (request.method in ("POST", "PUT", "DELETE")
+            and not g.get("read_only")
+            and response.status_code < 400
+            and "doctor_id" in session):
+        session["last_write_at"] = time.time()
+    return response
 
 
 # ---------- AUTH (simple) ----------
@@ -65,7 +314,9 @@ def register():
     # Password strength check
     if len(password) < 8:
         return jsonify({"error": "Password must be at least 8 characters."}), 400
-    conn = get_db()
+    with span("hash", "generate_password_hash"):
+        password_hash = generate_password_hash(password)
+    conn = get_directory_db()
     cur = conn.cursor()
     try:
         cur.execute(
@@ -73,9 +324,29 @@ def register():
             INSERT INTO doctors (name, email, doctor_number, password_hash)
             VALUES (%s, %s, %s, %s)
             """,
-            (name, email, doctor_number, generate_password_hash(password)),
+            (name, email, doctor_number, password_hash),
         )
+        doctor_id = cur.lastrowid
+        shard = shard_map.assign(cur, doctor_id)
+        # Committed first: the shard may be this same database, where mirroring
+        # would wait on the uncommitted row
         conn.commit()
+        try:
+            shard_map.mirror_doctor(shard, {
+                "id": doctor_id,
+                "doctor_number": doctor_number,
+                "name": name,
+                "email": email,
+                "password_hash": password_hash,
+            })
+        except mysql.connector.Error:
+            # Without its shard row the doctor could log in but not write;
+            # undo the registration so it can simply be retried
+            cur.execute("DELETE FROM doctor_shards WHERE doctor_id = %s", (doctor_id,))
+            cur.execute("DELETE FROM doctors WHERE id = %s", (doctor_id,))
+            conn.commit()
+            shard_map.invalidate(doctor_id)
+            raise
         return jsonify({"message": "Doctor registered"}), 201
     except mysql.connector.Error as e:
         conn.rollback()
@@ -98,24 +369,25 @@ def login():
     doctor_number = data.get("doctor_number")
     password = data.get("password")
 
-    conn = get_db()
-    cur = conn.cursor(dictionary=True)
-    cur.execute(
-        "SELECT * FROM doctors WHERE doctor_number = %s", (doctor_number,)
-    )
-    doctor = cur.fetchone()
-    cur.close()
+    conn = get_directory_db()
+    doctor = repository.fetch_one(conn, "doctor_by_number", (doctor_number,), dictionary=True)
     conn.close()
 
-    if doctor and check_password_hash(doctor["password_hash"], password):
+    with span("hash", "check_password_hash"):
+        valid = doctor is not None and check_password_hash(doctor["password_hash"], password)
+    if valid:
+        app.session_interface.regenerate(session)
         session.permanent = True
         session["doctor_id"] = doctor["id"]
+        session["doctor_name"] = doctor["name"]
         return jsonify({"message": "Logged in", "doctor": {"id": doctor["id"], "name": doctor["name"]}})
     return jsonify({"error": "Invalid credentials"}), 401
 
 
 @app.route("/api/logout", methods=["POST"])
 def logout():
+    if "doctor_id" in session:
+        doctor_context.clear(session["doctor_id"])
     session.clear()
     return jsonify({"message": "Logged out"})
 
@@ -134,9 +406,41 @@ def require_login():
     return True, session["doctor_id"], None
 
 
+def require_admin():
+    ok, doc_or_resp, code = require_login()
+    if ok and doc_or_resp not in ADMIN_DOCTOR_IDS:
+        return False, jsonify({"error": "Forbidden"}), 403
+    return ok, doc_or_resp, code
+
+
+def owns_patient(conn, doctor_id, patient_id):
+    """Ownership check, answered from the doctor's cached context when possible."""
+    if doctor_context.lookup(doctor_id, f"p:{patient_id}") is not None:
+        return True
+    found = repository.fetch_one(conn, "patient_owned", (patient_id, doctor_id)) is not None
+    if found:
+        doctor_context.remember(doctor_id, f"p:{patient_id}", patient_id)
+    return found
+
+
+def visit_patient_id(conn, doctor_id, visit_id):
+    """Patient id of one of the doctor's visits, or None."""
+    patient_id = doctor_context.lookup(doctor_id, f"v:{visit_id}")
+    # Only while the patient is cached too: forget_patient drops just that entry
+    if patient_id is not None and doctor_context.lookup(doctor_id, f"p:{patient_id}") is not None:
+        return patient_id
+    result = repository.fetch_one(conn, "visit_patient", (visit_id, doctor_id))
+    if not result:
+        return None
+    doctor_context.remember(doctor_id, f"p:{result[0]}", result[0])
+    doctor_context.remember(doctor_id, f"v:{visit_id}", result[0])
+    return result[0]
+
+
 # ---------- PATIENT SEARCH & VERIFICATION ----------
 
 @app.route("/api/patients/search", methods=["GET"])
+@read_only
 def search_patient():
     """Step 1: Patient lookup using insurance number"""
     ok, doc_or_resp, code = require_login()
@@ -163,15 +467,13 @@ def search_patient():
     conn.close()
     
     if patient:
-        # Convert date to string for JSON
-        if patient.get("birth_date"):
-            patient["birth_date"] = str(patient["birth_date"])
         return jsonify({"found": True, "patient": patient})
     else:
         return jsonify({"found": False, "insurance_number": insurance_number})
 
 
 @app.route("/api/patients/verify", methods=["POST"])
+@read_only
 def verify_patient():
     """Step 2: Verify patient match using 2 identifiers (insurance_number + DOB)"""
     ok, doc_or_resp, code = require_login()
@@ -215,13 +517,6 @@ def verify_patient():
         )
         visits = cur.fetchall()
         
-        # Convert dates to strings
-        if patient.get("birth_date"):
-            patient["birth_date"] = str(patient["birth_date"])
-        for visit in visits:
-            if visit.get("visit_date"):
-                visit["visit_date"] = str(visit["visit_date"])
-        
         cur.close()
         conn.close()
         return jsonify({
@@ -274,16 +569,18 @@ def create_patient():
             """,
             (doctor_id, first_name, last_name, birth_date, insurance_number)
         )
-        conn.commit()
         patient_id = cur.lastrowid
+        change = record_change(cur, doctor_id, patient_id, "patient", patient_id, "create")
+        conn.commit()
+        publish_change(change)
+        doctor_context.remember(doctor_id, f"p:{patient_id}", patient_id)
+        g.audit_patient_id = patient_id
         
         cur.execute(
             "SELECT * FROM patients WHERE id = %s",
             (patient_id,)
         )
         patient = cur.fetchone()
-        if patient.get("birth_date"):
-            patient["birth_date"] = str(patient["birth_date"])
         
         cur.close()
         conn.close()
@@ -296,6 +593,7 @@ def create_patient():
 
 
 @app.route("/api/patients/<int:patient_id>", methods=["GET"])
+@read_only
 def get_patient(patient_id):
     """Get patient details with visit history"""
     ok, doc_or_resp, code = require_login()
@@ -304,44 +602,25 @@ def get_patient(patient_id):
     doctor_id = doc_or_resp
     
     conn = get_db()
-    cur = conn.cursor(dictionary=True)
     
     # Get patient
-    cur.execute(
-        "SELECT * FROM patients WHERE id = %s AND doctor_id = %s",
-        (patient_id, doctor_id)
-    )
-    patient = cur.fetchone()
+    patient = repository.fetch_one(conn, "patient", (patient_id, doctor_id), dictionary=True)
     
     if not patient:
-        cur.close()
         conn.close()
         return jsonify({"error": "Patient not found"}), 404
+    doctor_context.remember(doctor_id, f"p:{patient_id}", patient_id)
     
-    # Get visit history
-    cur.execute(
-        """
-        SELECT v.*, COUNT(d.id) as document_count
-        FROM visits v
-        LEFT JOIN documents d ON v.id = d.visit_id
-        WHERE v.patient_id = %s
-        GROUP BY v.id
-        ORDER BY v.visit_date DESC
-        """,
-        (patient_id,)
-    )
-    visits = cur.fetchall()
+    # Skip the GROUP BY below if the client's copy is still current
+    version = patient_version(conn, patient_id)
+    if not_modified(sorted(patient.items()), sorted(version.items()),
+                    last_modified=version["visits_updated"]):
+        conn.close()
+        return "", 304
     
-    # Convert dates
-    if patient.get("birth_date"):
-        patient["birth_date"] = str(patient["birth_date"])
-    for visit in visits:
-        if visit.get("visit_date"):
-            visit["visit_date"] = str(visit["visit_date"])
-        if visit.get("created_at"):
-            visit["created_at"] = str(visit["created_at"])
+    # Get visit history
+    visits = repository.fetch_all(conn, "patient_visits", (patient_id,), dictionary=True)
     
-    cur.close()
     conn.close()
     return jsonify({"patient": patient, "visits": visits})
 
@@ -360,11 +639,7 @@ def update_patient(patient_id):
     
     try:
         # Verify patient belongs to doctor
-        cur.execute(
-            "SELECT id FROM patients WHERE id = %s AND doctor_id = %s",
-            (patient_id, doctor_id)
-        )
-        if not cur.fetchone():
+        if not owns_patient(conn, doctor_id, patient_id):
             cur.close()
             conn.close()
             return jsonify({"error": "Patient not found"}), 404
@@ -384,15 +659,19 @@ def update_patient(patient_id):
                 patient_id
             )
         )
+        change = record_change(cur, doctor_id, patient_id, "patient", patient_id, "update")
         conn.commit()
+        publish_change(change)
         
         cur.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
         patient = cur.fetchone()
-        if patient.get("birth_date"):
-            patient["birth_date"] = str(patient["birth_date"])
         
         cur.close()
         conn.close()
+        if not patient:
+            # Deleted through another worker whose cache we have not seen
+            doctor_context.forget_patient(doctor_id, patient_id)
+            return jsonify({"error": "Patient not found"}), 404
         return jsonify({"message": "Patient updated", "patient": patient})
     except mysql.connector.Error as e:
         conn.rollback()
@@ -414,17 +693,26 @@ def delete_patient(patient_id):
     
     try:
         # Verify patient belongs to doctor
-        cur.execute(
-            "SELECT id FROM patients WHERE id = %s AND doctor_id = %s",
-            (patient_id, doctor_id)
-        )
-        if not cur.fetchone():
+        if not owns_patient(conn, doctor_id, patient_id):
             cur.close()
             conn.close()
             return jsonify({"error": "Patient not found"}), 404
         
+        analytics.retract_patient(cur, doctor_id, patient_id)
+        search.retract_patient(cur, patient_id)
+        # The files go once the rows are gone; the worker removes them
+        cur.execute("SELECT file_path FROM documents WHERE patient_id = %s", (patient_id,))
+        paths = [row[0] for row in cur.fetchall()]
+        if paths:
+            jobs.enqueue(cur, "delete_files", {"paths": paths})
+        # sheet_entries may be partitioned (partition_db.py) and then has no
+        # foreign keys, so no cascade there
+        cur.execute("DELETE FROM sheet_entries WHERE patient_id = %s", (patient_id,))
         cur.execute("DELETE FROM patients WHERE id = %s", (patient_id,))
+        change = record_change(cur, doctor_id, patient_id, "patient", patient_id, "delete")
         conn.commit()
+        publish_change(change)
+        doctor_context.forget_patient(doctor_id, patient_id)
         cur.close()
         conn.close()
         return jsonify({"message": "Patient deleted"})
@@ -449,11 +737,7 @@ def create_visit(patient_id):
     conn = get_db()
     cur = conn.cursor()
     try:
-        cur.execute(
-            "SELECT id FROM patients WHERE id = %s AND doctor_id = %s",
-            (patient_id, doctor_id)
-        )
-        if not cur.fetchone():
+        if not owns_patient(conn, doctor_id, patient_id):
             cur.close()
             conn.close()
             return jsonify({"error": "Patient not found"}), 404
@@ -475,13 +759,15 @@ def create_visit(patient_id):
                 """,
                 (patient_id, visit_date, visit_type, chief_complaint, notes)
             )
-            conn.commit()
             visit_id = cur.lastrowid
+            analytics.record_visit(cur, doctor_id, visit_date, visit_type, chief_complaint)
+            search.index_visit(cur, doctor_id, patient_id, visit_id, visit_type, chief_complaint, notes)
+            change = record_change(cur, doctor_id, patient_id, "visit", visit_id, "create")
+            conn.commit()
+            publish_change(change)
             
             cur.execute("SELECT * FROM visits WHERE id = %s", (visit_id,))
             visit = cur.fetchone()
-            if visit.get("visit_date"):
-                visit["visit_date"] = str(visit["visit_date"])
             
             cur.close()
             conn.close()
@@ -499,6 +785,7 @@ def create_visit(patient_id):
 
 
 @app.route("/api/visits/<int:visit_id>", methods=["GET"])
+@read_only
 def get_visit(visit_id):
     """Get visit details with documents"""
     ok, doc_or_resp, code = require_login()
@@ -524,6 +811,7 @@ def get_visit(visit_id):
         cur.close()
         conn.close()
         return jsonify({"error": "Visit not found"}), 404
+    g.audit_patient_id = visit["patient_id"]
     
     # Get documents for this visit
     cur.execute(
@@ -532,13 +820,6 @@ def get_visit(visit_id):
     )
     documents = cur.fetchall()
     
-    # Convert dates
-    if visit.get("visit_date"):
-        visit["visit_date"] = str(visit["visit_date"])
-    for doc in documents:
-        if doc.get("uploaded_at"):
-            doc["uploaded_at"] = str(doc["uploaded_at"])
-    
     cur.close()
     conn.close()
     return jsonify({"visit": visit, "documents": documents})
@@ -547,6 +828,7 @@ def get_visit(visit_id):
 # ---------- SHEET ENDPOINTS (NEW) ----------
 
 @app.route("/api/sheets/<sheet_type>/<int:patient_id>/latest", methods=["GET"])
+@read_only
 def get_latest_sheet(sheet_type, patient_id):
     """Get latest sheet for patient"""
     ok, doc_or_resp, code = require_login()
@@ -556,53 +838,62 @@ def get_latest_sheet(sheet_type, patient_id):
     visit_id = request.args.get("visit_id")
     
     conn = get_db()
-    cur = conn.cursor(dictionary=True)
     
-    query = """
-        SELECT * FROM sheet_entries 
-        WHERE patient_id = %s AND sheet_type = %s
-        ORDER BY created_at DESC LIMIT 1
-    """
-    cur.execute(query, (patient_id, sheet_type))
-    entry = cur.fetchone()
+    # Look in the recent partitions first; only scan all of them if the
+    # patient has no entry in that window
+    entry = repository.fetch_one(
+        conn, "latest_sheet_recent", (patient_id, sheet_type, LATEST_SHEET_WINDOW_MONTHS),
+        dictionary=True,
+    )
+    if not entry:
+        entry = repository.fetch_one(conn, "latest_sheet", (patient_id, sheet_type), dictionary=True)
     
-    cur.close()
     conn.close()
     
     if entry:
-        entry['data'] = json.loads(entry['data_json']) if entry.get('data_json') else {}
-        if entry.get('created_at'):
-            entry['created_at'] = str(entry['created_at'])
-        if entry.get('updated_at'):
-            entry['updated_at'] = str(entry['updated_at'])
+        entry['data'] = RawJSON(entry['data_json']) if entry.get('data_json') else {}
         return jsonify(entry)
     return jsonify({"data": {}})
 
 
 @app.route("/api/sheets/<sheet_type>/<int:patient_id>/history", methods=["GET"])
+@read_only
 def get_sheet_history(sheet_type, patient_id):
     """Get sheet history"""
     ok, doc_or_resp, code = require_login()
     if not ok:
         return doc_or_resp, code
     
+    # Optional created_at bounds let MySQL prune sheet_entries partitions
+    since = request.args.get("since")
+    until = request.args.get("until")
+    
     conn = get_db()
     cur = conn.cursor(dictionary=True)
     
-    cur.execute("""
+    version = sheet_version(cur, patient_id, [sheet_type])
+    if not_modified(sorted(version.items()), last_modified=version["updated"]):
+        cur.close()
+        conn.close()
+        return "", 304
+    
+    query = """
         SELECT se.id, se.created_at, v.visit_date
         FROM sheet_entries se
         LEFT JOIN visits v ON se.visit_id = v.id
         WHERE se.patient_id = %s AND se.sheet_type = %s
-        ORDER BY se.created_at DESC
-    """, (patient_id, sheet_type))
+    """
+    params = [patient_id, sheet_type]
+    if since:
+        query += " AND se.created_at >= %s"
+        params.append(since)
+    if until:
+        query += " AND se.created_at < %s"
+        params.append(until)
+    query += " ORDER BY se.created_at DESC"
+    cur.execute(query, tuple(params))
     
     history = cur.fetchall()
-    for entry in history:
-        if entry.get('created_at'):
-            entry['created_at'] = str(entry['created_at'])
-        if entry.get('visit_date'):
-            entry['visit_date'] = str(entry['visit_date'])
     
     cur.close()
     conn.close()
@@ -619,21 +910,38 @@ def save_sheet(sheet_type):
     doctor_id = doc_or_resp
     
     data = request.json
-    patient_id = data.get("patient_id")
-    visit_id = data.get("visit_id")
+    try:
+        patient_id = int(data.get("patient_id"))
+        visit_id = int(data["visit_id"]) if data.get("visit_id") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "patient_id and visit_id must be integers"}), 400
     sheet_data = data.get("data", {})
+    g.audit_patient_id = patient_id
     
     conn = get_db()
     cur = conn.cursor()
     
+    # The entry is indexed, counted and published under this doctor: the
+    # patient (and visit) must be theirs
+    if not owns_patient(conn, doctor_id, patient_id) or (
+            visit_id is not None and visit_patient_id(conn, doctor_id, visit_id) != patient_id):
+        cur.close()
+        conn.close()
+        return jsonify({"error": "Patient not found"}), 404
+    
     try:
         cur.execute("""
             INSERT INTO sheet_entries 
             (patient_id, visit_id, sheet_type, data_json, doctor_id)
             VALUES (%s, %s, %s, %s, %s)
         """, (patient_id, visit_id, sheet_type, json.dumps(sheet_data), doctor_id))
+        entry_id = cur.lastrowid
+        analytics.record_sheet(cur, doctor_id, sheet_type)
+        search.index_sheet(cur, doctor_id, patient_id, entry_id, visit_id, sheet_type, sheet_data)
+        change = record_change(cur, doctor_id, patient_id, "sheet", entry_id, "create")
         
         conn.commit()
+        publish_change(change)
         cur.close()
         conn.close()
         return jsonify({"message": "Sheet saved"}), 201
@@ -645,6 +953,7 @@ def save_sheet(sheet_type):
 
 
 @app.route("/api/sheets/entry/<int:entry_id>", methods=["GET"])
+@read_only
 def get_sheet_entry(entry_id):
     """Get single sheet entry"""
     ok, doc_or_resp, code = require_login()
@@ -659,11 +968,8 @@ def get_sheet_entry(entry_id):
     conn.close()
     
     if entry:
-        entry['data'] = json.loads(entry['data_json']) if entry.get('data_json') else {}
-        if entry.get('created_at'):
-            entry['created_at'] = str(entry['created_at'])
-        if entry.get('updated_at'):
-            entry['updated_at'] = str(entry['updated_at'])
+        g.audit_patient_id = entry["patient_id"]
+        entry['data'] = RawJSON(entry['data_json']) if entry.get('data_json') else {}
         return jsonify(entry)
     return jsonify({"error": "Not found"}), 404
 
@@ -680,24 +986,12 @@ def upload_document(visit_id):
     
     # Verify visit belongs to doctor's patient
     conn = get_db()
-    cur = conn.cursor()
     try:
-        cur.execute(
-            """
-            SELECT v.patient_id FROM visits v
-            JOIN patients p ON v.patient_id = p.id
-            WHERE v.id = %s AND p.doctor_id = %s
-            """,
-            (visit_id, doctor_id)
-        )
-        result = cur.fetchone()
-        if not result:
-            cur.close()
+        patient_id = visit_patient_id(conn, doctor_id, visit_id)
+        if patient_id is None:
             conn.close()
             return jsonify({"error": "Visit not found"}), 404
-        
-        patient_id = result[0]
-        cur.close()  # Close first cursor before file operations
+        g.audit_patient_id = patient_id
         
         if 'file' not in request.files:
             conn.close()
@@ -722,7 +1016,8 @@ def upload_document(visit_id):
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         
         try:
-            file.save(file_path)
+            with span("file", f"save {unique_filename}"):
+                file.save(file_path)
         except Exception as e:
             conn.close()
             return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
@@ -742,13 +1037,14 @@ def upload_document(visit_id):
                 """,
                 (visit_id, patient_id, filename, file_path, file_type, file_size, description)
             )
-            conn.commit()
             doc_id = cur.lastrowid
+            analytics.record_document(cur, doctor_id, file_type, file_size)
+            change = record_change(cur, doctor_id, patient_id, "document", doc_id, "create")
+            conn.commit()
+            publish_change(change)
             
             cur.execute("SELECT * FROM documents WHERE id = %s", (doc_id,))
             document = cur.fetchone()
-            if document.get("uploaded_at"):
-                document["uploaded_at"] = str(document["uploaded_at"])
             
             cur.close()
             conn.close()
@@ -777,45 +1073,51 @@ def get_digestive(patient_id):
     ok, doc_or_resp, code = require_login()
     if not ok:
         return doc_or_resp, code
+    doctor_id = doc_or_resp
 
     conn = get_db()
-    cur = conn.cursor(dictionary=True)
-    cur.execute(
-        "SELECT * FROM digestive_visit WHERE patient_id = %s ORDER BY id DESC LIMIT 1",
-        (patient_id,),
-    )
-    visit = cur.fetchone()
-    cur.close()
+    if not owns_patient(conn, doctor_id, patient_id):
+        conn.close()
+        return jsonify({"error": "Patient not found"}), 404
+    visit = repository.fetch_one(conn, "latest_digestive", (patient_id,), dictionary=True)
     conn.close()
 
     if not visit:
-        # send defaults matching your React placeholders
-        visit = {
-            "id": None,
-            "patient_id": patient_id,
-            "visit_date": str(date.today()),
-            "digestive_inspection": "Normal",
-            "digestive_auscultation": "Normal abdomen noises",
-            "digestive_palpation": "Little pain on the right lower area",
-            "liver": "No hepatomegaly.",
-            "rectal": "",
-            "smoker": 0,
-            "insurance_type": "public",
-            "notes": "",
-            "image_path": "",
-        }
+        visit = digestive_defaults(patient_id)
 
     return jsonify(visit)
 
 
+def digestive_defaults(patient_id):
+    # send defaults matching your React placeholders
+    return {
+        "id": None,
+        "patient_id": patient_id,
+        "visit_date": str(date.today()),
+        "digestive_inspection": "Normal",
+        "digestive_auscultation": "Normal abdomen noises",
+        "digestive_palpation": "Little pain on the right lower area",
+        "liver": "No hepatomegaly.",
+        "rectal": "",
+        "smoker": 0,
+        "insurance_type": "public",
+        "notes": "",
+        "image_path": "",
+    }
+
+
 @app.route("/api/digestive/<int:patient_id>", methods=["POST"])
 def save_digestive(patient_id):
     ok, doc_or_resp, code = require_login()
     if not ok:
         return doc_or_resp, code
+    doctor_id = doc_or_resp
 
     data = request.json
     conn = get_db()
+    if not owns_patient(conn, doctor_id, patient_id):
+        conn.close()
+        return jsonify({"error": "Patient not found"}), 404
     cur = conn.cursor(dictionary=True)
 
     # check if already exists
@@ -870,7 +1172,11 @@ def save_digestive(patient_id):
                 """,
                 fields,
             )
+        digestive_id = existing["id"] if existing else cur.lastrowid
+        search.index_digestive(cur, doctor_id, patient_id, digestive_id, data.get("notes"))
+        change = record_change(cur, doctor_id, patient_id, "digestive", digestive_id, "update")
         conn.commit()
+        publish_change(change)
         return jsonify({"message": "Saved"}), 200
     except mysql.connector.Error as e:
         conn.rollback()
@@ -880,12 +1186,545 @@ def save_digestive(patient_id):
         conn.close()
 
 
+# ---------- CHANGE FEED ----------
+
+@app.route("/api/changes", methods=["GET"])
+@read_only
+def get_changes():
+    """Changes to the doctor's patients after ?since=<cursor>, oldest first.
+
+    ?wait=<seconds> long-polls until something changes; pass the returned
+    cursor as the next ?since.
+    """
+    ok, doc_or_resp, code = require_login()
+    if not ok:
+        return doc_or_resp, code
+    doctor_id = doc_or_resp
+    
+    since = request.args.get("since", 0, type=int)
+    limit = max(1, min(request.args.get("limit", CHANGE_FEED_PAGE_SIZE, type=int), CHANGE_FEED_PAGE_SIZE))
+    wait = max(0, min(request.args.get("wait", 0, type=float), CHANGE_FEED_MAX_WAIT))
+    deadline = time.monotonic() + wait
+    
+    conn = get_db()
+    cur = conn.cursor(dictionary=True)
+    try:
+        while True:
+            changes, has_more = fetch_changes(cur, doctor_id, since, limit)
+            if changes or time.monotonic() >= deadline:
+                break
+            conn.commit()  # end the snapshot so the next poll sees new rows
+            time.sleep(CHANGE_FEED_POLL_INTERVAL)
+    finally:
+        cur.close()
+        conn.close()
+    
+    cursor = changes[-1]["id"] if changes else since
+    return jsonify({"changes": changes, "cursor": cursor, "has_more": has_more})
+
+
+# ---------- LIVE PATIENT EVENTS (server-sent events) ----------
+
+event_broker = make_broker(EVENT_BROKER, max_pending=EVENT_QUEUE_SIZE)
+if EVENT_STREAMS_REQUIRE_GEVENT:
+    check_gevent()
+
+
+def publish_change(change):
+    """Notify clients watching the patient; call after the commit."""
+    event_broker.publish(f"patient:{change['patient_id']}", change)
+
+
+@app.route("/api/patients/<int:patient_id>/events", methods=["GET"])
+@read_only
+def patient_events(patient_id):
+    """Stream change notifications for one patient as text/event-stream"""
+    ok, doc_or_resp, code = require_login()
+    if not ok:
+        return doc_or_resp, code
+    doctor_id = doc_or_resp
+    
+    conn = get_db()
+    found = owns_patient(conn, doctor_id, patient_id)
+    conn.close()
+    if not found:
+        return jsonify({"error": "Patient not found"}), 404
+    
+    subscription = event_broker.subscribe(f"patient:{patient_id}")
+    
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                change = subscription.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                if subscription.overflowed:
+                    # Missed messages: the client should reload the chart
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if change is None:
+                    yield ": ping\n\n"  # keeps proxies from closing idle streams
+                    continue
+                yield f"id: {change['id']}\nevent: change\ndata: {app.json.dumps(change)}\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+# ---------- PATIENT DASHBOARD (everything a chart needs, one request) ----------
+
+SHEET_TYPES = ("digestive", "neurologic", "vascular", "cardiac", "respiratory", "abdomen")
+DASHBOARD_FIELDS = ("patient", "visits", "digestive", "sheets", "history", "documents")
+
+
+def _dashboard_visits(cur, patient_id, _):
+    cur.execute(
+        """
+        SELECT v.*, COUNT(d.id) as document_count
+        FROM visits v
+        LEFT JOIN documents d ON v.id = d.visit_id
+        WHERE v.patient_id = %s
+        GROUP BY v.id
+        ORDER BY v.visit_date DESC
+        """,
+        (patient_id,)
+    )
+    visits = cur.fetchall()
+    return visits
+
+
+def _dashboard_digestive(cur, patient_id, args):
+    """The stored form, or None: the client shows its placeholders instead."""
+    # Already read as part of the version probe
+    return args["digestive"]
+
+
+def _dashboard_sheets(cur, patient_id, args):
+    """Latest entry of every sheet type in one UNION ALL round trip."""
+    query = " UNION ALL ".join(
+        """
+        (SELECT * FROM sheet_entries
+         WHERE patient_id = %s AND sheet_type = %s
+         ORDER BY created_at DESC LIMIT 1)
+        """
+        for _ in args["sheet_types"]
+    )
+    params = []
+    for sheet_type in args["sheet_types"]:
+        params += [patient_id, sheet_type]
+    cur.execute(query, tuple(params))
+
+    sheets = {sheet_type: {"data": {}} for sheet_type in args["sheet_types"]}
+    for entry in cur.fetchall():
+        entry['data'] = RawJSON(entry['data_json']) if entry.get('data_json') else {}
+        sheets[entry["sheet_type"]] = entry
+    return sheets
+
+
+def _dashboard_history(cur, patient_id, args):
+    placeholders = ", ".join(["%s"] * len(args["sheet_types"]))
+    cur.execute(
+        f"""
+        SELECT se.id, se.sheet_type, se.created_at, v.visit_date
+        FROM sheet_entries se
+        LEFT JOIN visits v ON se.visit_id = v.id
+        WHERE se.patient_id = %s AND se.sheet_type IN ({placeholders})
+        ORDER BY se.created_at DESC
+        """,
+        (patient_id,) + tuple(args["sheet_types"]),
+    )
+    history = {sheet_type: [] for sheet_type in args["sheet_types"]}
+    for entry in cur.fetchall():
+        history[entry.pop("sheet_type")].append(entry)
+    return history
+
+
+def _dashboard_documents(cur, patient_id, args):
+    if args["visit_id"]:
+        cur.execute(
+            "SELECT * FROM documents WHERE visit_id = %s AND patient_id = %s",
+            (args["visit_id"], patient_id),
+        )
+    else:
+        cur.execute(
+            "SELECT * FROM documents WHERE patient_id = %s ORDER BY uploaded_at DESC",
+            (patient_id,),
+        )
+    documents = cur.fetchall()
+    return documents
+
+
+DASHBOARD_SECTIONS = {
+    "visits": _dashboard_visits,
+    "digestive": _dashboard_digestive,
+    "sheets": _dashboard_sheets,
+    "history": _dashboard_history,
+    "documents": _dashboard_documents,
+}
+
+
+@app.route("/api/patients/<int:patient_id>/dashboard", methods=["GET"])
+@read_only
+def get_patient_dashboard(patient_id):
+    """Patient, visits, digestive form, latest sheets, sheet history and documents.
+
+    ?fields=visits,sheets limits the sections, ?sheet_types=cardiac,... the
+    sheets, ?visit_id= scopes documents to one visit.
+    """
+    ok, doc_or_resp, code = require_login()
+    if not ok:
+        return doc_or_resp, code
+    doctor_id = doc_or_resp
+    
+    fields = request.args.get("fields")
+    fields = [f for f in fields.split(",") if f in DASHBOARD_FIELDS] if fields else list(DASHBOARD_FIELDS)
+    sheet_types = request.args.get("sheet_types")
+    # Known types only, each once: every type adds a branch to the sheets UNION ALL
+    sheet_types = ([t for t in SHEET_TYPES if t in sheet_types.split(",")]
+                   if sheet_types else list(SHEET_TYPES))
+    if "sheets" not in fields and "history" not in fields:
+        sheet_types = []
+    args = {"sheet_types": sheet_types, "visit_id": request.args.get("visit_id", type=int)}
+    
+    # Ownership check first: nothing else runs for someone else's patient
+    conn = get_db()
+    cur = conn.cursor(dictionary=True)
+    cur.execute(
+        "SELECT * FROM patients WHERE id = %s AND doctor_id = %s",
+        (patient_id, doctor_id)
+    )
+    patient = cur.fetchone()
+    
+    if not patient:
+        cur.close()
+        conn.close()
+        return jsonify({"error": "Patient not found"}), 404
+    
+    # Cheap probe of everything the sections read. The digestive form is
+    # updated in place without a timestamp, so its row is the version.
+    version = [fields, sorted(patient.items()), sorted(patient_version(conn, patient_id).items())]
+    if sheet_types:
+        version.append(sorted(sheet_version(cur, patient_id, sheet_types).items()))
+    if "digestive" in fields:
+        cur.execute(
+            "SELECT * FROM digestive_visit WHERE patient_id = %s ORDER BY id DESC LIMIT 1",
+            (patient_id,),
+        )
+        args["digestive"] = cur.fetchone()
+        version.append(sorted((args["digestive"] or {}).items()))
+    if not_modified(*version):
+        cur.close()
+        conn.close()
+        return "", 304
+    
+    # The sections run back to back on this request's connection, one indexed
+    # query each (the sheets in a single UNION ALL). Running them on other
+    # threads needed a connection each, which bypassed the read-only routing
+    # and drained the pool; mysql.connector's multi-statement API differs
+    # between versions, and sqlite3 has none. The client still gets the
+    # whole chart in one HTTP round trip.
+    result = {"patient": patient} if "patient" in fields else {}
+    try:
+        for name in fields:
+            if name in DASHBOARD_SECTIONS and (sheet_types or name not in ("sheets", "history")):
+                result[name] = DASHBOARD_SECTIONS[name](cur, patient_id, args)
+    finally:
+        cur.close()
+        conn.close()
+    return jsonify(result)
+
+
+# ---------- VITALS TIME SERIES ----------
+
+VITALS = (
+    "blood_pressure_systolic", "blood_pressure_diastolic", "temperature",
+    "heart_rate", "weight", "oxygen_saturation",
+)
+# Bucket start for each downsampling level; weeks start on Monday
+VITALS_BUCKETS = {
+    "day": "DATE(created_at)",
+    "week": "DATE(created_at) - INTERVAL WEEKDAY(created_at) DAY",
+}
+
+
+def _reading(value):
+    # Chart series are numbers; DECIMAL columns and AVG() come back as Decimal,
+    # which the JSON provider sends as strings
+    return float(value) if isinstance(value, Decimal) else value
+
+
+@app.route("/api/patients/<int:patient_id>/vitals", methods=["GET"])
+@read_only
+def get_vitals(patient_id):
+    """Vital signs over time, as parallel arrays ready for charting.
+
+    ?from=&to= bound created_at, ?metrics=heart_rate,... picks the series and
+    ?bucket=raw|day|week sets the resolution (min/max/avg per bucket).
+    Every query is answered from idx_patient_vitals alone.
+    """
+    ok, doc_or_resp, code = require_login()
+    if not ok:
+        return doc_or_resp, code
+    doctor_id = doc_or_resp
+    
+    metrics = request.args.get("metrics")
+    metrics = [m for m in metrics.split(",") if m in VITALS] if metrics else list(VITALS)
+    bucket = request.args.get("bucket", "day")
+    if not metrics or (bucket != "raw" and bucket not in VITALS_BUCKETS):
+        return jsonify({"error": "Unknown metric or bucket"}), 400
+    
+    conn = get_db()
+    if not owns_patient(conn, doctor_id, patient_id):
+        conn.close()
+        return jsonify({"error": "Patient not found"}), 404
+    
+    where = "WHERE patient_id = %s"
+    params = [patient_id]
+    if request.args.get("from"):
+        where += " AND created_at >= %s"
+        params.append(request.args["from"])
+    if request.args.get("to"):
+        where += " AND created_at < %s"
+        params.append(request.args["to"])
+    
+    # Plain tuples keep the row overhead down on years of readings
+    cur = conn.cursor()
+    if bucket == "raw":
+        cur.execute(
+            f"SELECT created_at, {', '.join(metrics)} FROM ehr_data {where} "
+            f"ORDER BY created_at LIMIT %s",
+            (*params, VITALS_MAX_POINTS + 1),
+        )
+        rows = cur.fetchall()
+        truncated = len(rows) > VITALS_MAX_POINTS
+        rows = rows[:VITALS_MAX_POINTS]
+        series = {m: [_reading(row[i + 1]) for row in rows] for i, m in enumerate(metrics)}
+        result = {"bucket": bucket, "t": [row[0] for row in rows], "series": series,
+                  "truncated": truncated}
+    else:
+        start = VITALS_BUCKETS[bucket]
+        aggregates = ", ".join(f"MIN({m}), MAX({m}), AVG({m})" for m in metrics)
+        cur.execute(
+            f"SELECT {start} AS bucket_start, COUNT(*), {aggregates} FROM ehr_data {where} "
+            f"GROUP BY bucket_start ORDER BY bucket_start",
+            tuple(params),
+        )
+        rows = cur.fetchall()
+        series = {
+            m: {
+                "min": [_reading(row[2 + 3 * i]) for row in rows],
+                "max": [_reading(row[3 + 3 * i]) for row in rows],
+                "avg": [_reading(row[4 + 3 * i]) for row in rows],
+            }
+            for i, m in enumerate(metrics)
+        }
+        result = {"bucket": bucket, "t": [row[0] for row in rows],
+                  "count": [row[1] for row in rows], "series": series}
+    
+    cur.close()
+    conn.close()
+    g.audit_patient_id = patient_id
+    return jsonify(result)
+
+
+# ---------- PRACTICE ANALYTICS ----------
+
+@app.route("/api/analytics", methods=["GET"])
+@read_only
+def get_analytics():
+    """Caseload summary from the daily rollups.
+
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD (to exclusive, defaults to the last
+    ANALYTICS_DEFAULT_WEEKS weeks), ?top= number of chief complaints (at
+    most ANALYTICS_TOP_COMPLAINTS).
+    """
+    ok, doc_or_resp, code = require_login()
+    if not ok:
+        return doc_or_resp, code
+    doctor_id = doc_or_resp
+    
+    try:
+        until = date.fromisoformat(request.args["to"]) if request.args.get("to") else date.today() + timedelta(days=1)
+        since = (date.fromisoformat(request.args["from"]) if request.args.get("from")
+                 else analytics.week_start(until - timedelta(weeks=ANALYTICS_DEFAULT_WEEKS)))
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    if since >= until:
+        return jsonify({"error": "'from' must be before 'to'"}), 400
+    top = min(max(1, request.args.get("top", ANALYTICS_TOP_COMPLAINTS, type=int)),
+              ANALYTICS_TOP_COMPLAINTS)
+    
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        if not_modified(since, until, top, analytics.version(cur, doctor_id)):
+            return "", 304
+        rows = analytics.load(cur, doctor_id, since, until)
+    finally:
+        cur.close()
+        conn.close()
+    return jsonify(analytics.summarize(rows, since, until, top))
+
+
+# ---------- FULL-TEXT SEARCH ----------
+
+@app.route("/api/search", methods=["GET"])
+@read_only
+def search_notes():
+    """Visits, digestive notes and sheets of the doctor's patients matching ?q=.
+
+    Best matches first; ?page= (from 1) and ?per_page= page through them.
+    """
+    ok, doc_or_resp, code = require_login()
+    if not ok:
+        return doc_or_resp, code
+    doctor_id = doc_or_resp
+    
+    words = search.terms(request.args.get("q", ""))
+    if not words:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+    page = max(1, request.args.get("page", 1, type=int))
+    per_page = min(max(1, request.args.get("per_page", SEARCH_PAGE_SIZE, type=int)), SEARCH_MAX_PAGE_SIZE)
+    offset = (page - 1) * per_page
+    if offset >= SEARCH_MAX_RESULTS:
+        return jsonify({"error": f"Only the first {SEARCH_MAX_RESULTS} results can be paged through"}), 400
+    
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        with span("search", " ".join(words)):
+            hits, has_more = search.search(cur, doctor_id, words, per_page, offset)
+    except mysql.connector.Error as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cur.close()
+        conn.close()
+    return jsonify({
+        "terms": words,
+        "page": page,
+        "per_page": per_page,
+        "has_more": has_more and offset + per_page < SEARCH_MAX_RESULTS,
+        "results": hits,
+    })
+
+
+# ---------- ADMIN ----------
+
+@app.route("/api/admin/audit", methods=["GET"])
+def audit_stats():
+    """Audit writer throughput and queue depth"""
+    ok, doc_or_resp, code = require_admin()
+    if not ok:
+        return doc_or_resp, code
+    return jsonify(audit_log.stats())
+
+
+@app.route("/api/admin/profiling", methods=["GET"])
+def profiling_status():
+    """Profiling switches and the newest captured profiles"""
+    ok, doc_or_resp, code = require_admin()
+    if not ok:
+        return doc_or_resp, code
+    return jsonify({
+        "settings": profiler.settings.current(),
+        "profiles": profiler.profiles(request.args.get("limit", 50, type=int)),
+    })
+
+
+@app.route("/api/admin/profiling", methods=["PUT"])
+def profiling_update():
+    """Switch profiling on/off for every worker.
+
+    Body: enabled, sample_rate (0..1), doctor_id, endpoint, duration_seconds.
+    """
+    ok, doc_or_resp, code = require_admin()
+    if not ok:
+        return doc_or_resp, code
+    data = request.json or {}
+    values = {}
+    if "enabled" in data:
+        values["enabled"] = bool(data["enabled"])
+    if "sample_rate" in data:
+        try:
+            values["sample_rate"] = min(1.0, max(0.0, float(data["sample_rate"])))
+        except (TypeError, ValueError):
+            return jsonify({"error": "sample_rate must be a number"}), 400
+    if "doctor_id" in data:
+        try:
+            values["doctor_id"] = int(data["doctor_id"]) if data["doctor_id"] is not None else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "doctor_id must be an integer"}), 400
+    if "endpoint" in data:
+        if data["endpoint"] is not None and not isinstance(data["endpoint"], str):
+            return jsonify({"error": "endpoint must be a string"}), 400
+        values["endpoint"] = data["endpoint"] or None
+    if "duration_seconds" in data:
+        try:
+            duration = float(data["duration_seconds"] or 0)
+        except (TypeError, ValueError):
+            return jsonify({"error": "duration_seconds must be a number"}), 400
+        if not 0 <= duration < float("inf"):
+            return jsonify({"error": "duration_seconds must be a non-negative number"}), 400
+        values["until"] = time.time() + duration if duration else None
+    return jsonify({"settings": profiler.settings.update(values)})
+
+
+@app.route("/api/admin/profiling/<name>", methods=["GET"])
+def profiling_download(name):
+    """One capture: <name>.json (span tree) or <name>.folded (flamegraph input)"""
+    ok, doc_or_resp, code = require_admin()
+    if not ok:
+        return doc_or_resp, code
+    if not name.endswith((".json", ".folded")) or secure_filename(name) != name:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_from_directory(PROFILING_FOLDER, name, mimetype="text/plain")
+
+
+@app.route("/api/admin/jobs", methods=["GET"])
+def job_stats():
+    """Background jobs per shard and state"""
+    ok, doc_or_resp, code = require_admin()
+    if not ok:
+        return doc_or_resp, code
+    result = {}
+    for name, router in shard_map.routers.items():
+        conn = router.primary()
+        try:
+            result[name] = jobs.counts(conn)
+        finally:
+            conn.close()
+    return jsonify(result)
+
+
 # Serve uploaded files
 @app.route("/uploads/<filename>")
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 
+# ---------- FRONTEND ----------
+
+frontend = Frontend(FRONTEND_FOLDER)
+
+
+@app.route(FRONTEND_BASE, defaults={"path": ""})
+@app.route(f"{FRONTEND_BASE}<path:path>")
+def frontend_app(path):
+    """The built app; client-side routes fall back to index.html"""
+    if path.startswith("api/"):
+        abort(404)
+    return frontend.response(path)
+
+
+if FRONTEND_BASE != "/":
+    @app.route("/")
+    def frontend_root():
+        return redirect(FRONTEND_BASE)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
 
@@ -0,0 +1,156 @@
+"""
+Access audit trail
+Handlers only enqueue events; a background thread writes them in batches
+(multi-row INSERTs into `audit_log`, or an append-only JSON lines file).
+The queue is bounded: when it is full the request thread writes its own
+event synchronously, which slows the offending traffic down instead of
+losing events.
+
+BackgroundWriter is that queue and thread on their own, for any sink with
+a write(batch) method (profiling.py saves request profiles through one).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("created_at", "doctor_id", "action", "entity", "entity_id", "patient_id", "ip")
+
+
+class MySQLSink:
+    def __init__(self, connect):
+        self.connect = connect
+
+    def write(self, events):
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            # mysql.connector turns executemany INSERTs into one multi-row INSERT
+            cur.executemany(
+                f"INSERT INTO audit_log ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join(['%s'] * len(COLUMNS))})",
+                events,
+            )
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
+
+class FileSink:
+    """Append-only JSON lines, fsync'ed per batch."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, events):
+        lines = "".join(
+            json.dumps(dict(zip(COLUMNS, event)), default=str) + "\n" for event in events
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class BackgroundWriter:
+    def __init__(self, sink, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 enqueue_timeout=0.05, name="audit-writer"):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self._started = time.monotonic()
+        self.metrics = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "sync_writes": 0,
+            "failed": 0,
+            "last_batch_ms": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, **deltas):
+        with self._metrics_lock:
+            for key, value in deltas.items():
+                self.metrics[key] += value
+
+    def put(self, event):
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+            self._count(enqueued=1)
+        except queue.Full:
+            # Backpressure: the caller pays for its own write
+            try:
+                self.sink.write([event])
+                self._count(sync_writes=1, written=1)
+            except Exception:
+                logger.exception("%s: event could not be written", self._thread.name)
+                self._count(failed=1)
+
+    def _drain(self, first):
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        delay = 0.5
+        for attempt in range(5):
+            try:
+                self.sink.write(batch)
+                break
+            except Exception:
+                logger.exception("%s: batch write failed (attempt %d)", self._thread.name, attempt + 1)
+                time.sleep(delay)
+                delay *= 2
+        else:
+            self._count(failed=len(batch))
+            return
+        with self._metrics_lock:
+            self.metrics["written"] += len(batch)
+            self.metrics["batches"] += 1
+            self.metrics["last_batch_ms"] = (time.perf_counter() - started) * 1000
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write(self._drain(first))
+
+    def close(self):
+        """Flush everything still queued; called at interpreter exit."""
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self):
+        with self._metrics_lock:
+            stats = dict(self.metrics)
+        uptime = time.monotonic() - self._started
+        stats["queue_depth"] = self._queue.qsize()
+        stats["events_per_second"] = round(stats["written"] / uptime, 2) if uptime else 0.0
+        return stats
+
+
+class AuditLog(BackgroundWriter):
+    def record(self, doctor_id, action, entity, entity_id=None, patient_id=None, ip=None):
+        self.put((datetime.now(), doctor_id, action, entity, entity_id, patient_id, ip))
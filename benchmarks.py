@@ -0,0 +1,159 @@
+"""
+Micro benchmarks
+`json` runs without a database against synthetic rows shaped like the MySQL
+results the handlers serialize. `queries` times the hottest statements
+against the database in config.py, sent as text versus through the prepared
+statements in repository.py.
+
+Usage:
+    python benchmarks.py [json]
+    python benchmarks.py queries <doctor_id> <patient_id>
+"""
+import json
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask  # type: ignore
+from flask.json.provider import DefaultJSONProvider  # type: ignore
+
+import json_provider
+import repository
+from json_provider import FastJSONProvider, RawJSON
+
+REPEAT = 5
+
+
+def _visit_rows(count):
+    start = datetime(2020, 1, 1, 8, 30)
+    return [
+        {
+            "id": i,
+            "patient_id": 1,
+            "visit_date": (start + timedelta(days=i)).date(),
+            "visit_type": "general",
+            "chief_complaint": "Abdominal pain, right lower quadrant",
+            "notes": "Follow up in two weeks. " * 4,
+            "created_at": start + timedelta(days=i, minutes=5),
+            "updated_at": start + timedelta(days=i, minutes=9),
+            "document_count": random.randint(0, 4),
+            "temperature": Decimal("37.20"),
+        }
+        for i in range(count)
+    ]
+
+
+def _sheet_row():
+    data = {f"field_{i}": "Normal findings, nothing to report. " * 3 for i in range(40)}
+    return {
+        "id": 1,
+        "patient_id": 1,
+        "visit_id": 1,
+        "sheet_type": "cardiac",
+        "data_json": json.dumps(data),
+        "doctor_id": 1,
+        "created_at": datetime(2024, 5, 1, 9, 0),
+        "updated_at": datetime(2024, 5, 1, 9, 0),
+    }
+
+
+def _legacy_visits(provider, rows):
+    # What get_patient did before the provider: str() every date, then dump
+    converted = []
+    for row in rows:
+        row = dict(row)
+        for key in ("visit_date", "created_at", "updated_at", "temperature"):
+            if row.get(key):
+                row[key] = str(row[key])
+        converted.append(row)
+    return provider.dumps({"visits": converted})
+
+
+def _legacy_sheet(provider, row):
+    row = dict(row)
+    row["data"] = json.loads(row["data_json"])
+    row["created_at"] = str(row["created_at"])
+    row["updated_at"] = str(row["updated_at"])
+    return provider.dumps(row)
+
+
+def _fast_sheet(provider, row):
+    row = dict(row)
+    row["data"] = RawJSON(row["data_json"])
+    return provider.dumps_bytes(row)
+
+
+def _report(label, seconds, number):
+    print(f"{label:<48} {seconds / number * 1000:8.3f} ms")
+
+
+def bench_json():
+    app = Flask(__name__)
+    legacy = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    print(f"orjson: {'yes' if json_provider.orjson else 'no'}")
+    for count in (100, 1000, 10000):
+        rows = _visit_rows(count)
+        number = max(1, 2000 // count)
+        _report(f"visits x{count}: str() loop + default provider",
+                min(timeit.repeat(lambda: _legacy_visits(legacy, rows), number=number, repeat=REPEAT)), number)
+        _report(f"visits x{count}: fast provider",
+                min(timeit.repeat(lambda: fast.dumps_bytes({"visits": rows}), number=number, repeat=REPEAT)), number)
+        _report(f"visits x{count}: fast provider (stdlib fallback)",
+                min(timeit.repeat(lambda: json_provider.dumps_stdlib({"visits": rows}), number=number, repeat=REPEAT)), number)
+
+    row = _sheet_row()
+    _report("sheet entry: json.loads + re-dump",
+            min(timeit.repeat(lambda: _legacy_sheet(legacy, row), number=1000, repeat=REPEAT)), 1000)
+    _report("sheet entry: RawJSON splice",
+            min(timeit.repeat(lambda: _fast_sheet(fast, row), number=1000, repeat=REPEAT)), 1000)
+
+
+def _text_query(conn, name, params):
+    cur = conn.cursor(dictionary=True)
+    cur.execute(repository.QUERIES[name], params)
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def bench_queries(doctor_id, patient_id, number=500):
+    import mysql.connector
+    from config import DB_BACKEND, DB_CONFIG
+
+    import db_backend
+
+    conn = db_backend.connect(**DB_CONFIG)
+    if DB_BACKEND == "mysql":
+        print(f"C extension: {'yes' if mysql.connector.HAVE_CEXT else 'no'}")
+    cases = {
+        "patient": (patient_id, doctor_id),
+        "patient_owned": (patient_id, doctor_id),
+        "patient_version": (patient_id,) * 4,
+        "patient_visits": (patient_id,),
+        "latest_sheet": (patient_id, "cardiac"),
+        "latest_digestive": (patient_id,),
+    }
+    try:
+        for name, params in cases.items():
+            _report(f"{name}: text protocol, new cursor",
+                    min(timeit.repeat(lambda: _text_query(conn, name, params),
+                                      number=number, repeat=REPEAT)), number)
+            _report(f"{name}: cached prepared statement",
+                    min(timeit.repeat(lambda: repository.fetch_all(conn, name, params, dictionary=True),
+                                      number=number, repeat=REPEAT)), number)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "queries":
+        if len(sys.argv) != 4:
+            print(__doc__)
+        else:
+            bench_queries(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        bench_json()
@@ -0,0 +1,57 @@
+"""
+Change feed
+Write handlers add a row to the `change_log` outbox inside the same
+transaction as the change itself; /api/changes pages through it by id.
+
+Ids are handed out at INSERT time but become visible at COMMIT, so a
+transaction holding a lower id can commit after a reader has moved its
+cursor past a higher one. Readers only see rows older than SETTLE_SECONDS,
+and record_change must be the last statement before the commit: the gap
+between taking an id and committing is then the COMMIT itself. A change
+whose COMMIT takes longer than SETTLE_SECONDS can still be skipped by a
+client that polled in between.
+"""
+
+# Rows younger than this are held back so that a transaction that took a
+# lower id but committed later is not skipped by a client's cursor
+SETTLE_SECONDS = 1
+
+
+def record_change(cur, doctor_id, patient_id, entity, entity_id, action):
+    """Add an outbox row; commits with the caller's transaction.
+
+    Call it last, right before the commit (see the module docstring).
+
+    Returns the change as a dict, ready to publish once committed.
+    """
+    cur.execute(
+        """
+        INSERT INTO change_log (doctor_id, patient_id, entity, entity_id, action)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        (doctor_id, patient_id, entity, entity_id, action),
+    )
+    return {
+        "id": cur.lastrowid,
+        "patient_id": patient_id,
+        "entity": entity,
+        "entity_id": entity_id,
+        "action": action,
+    }
+
+
+def fetch_changes(cur, doctor_id, since, limit):
+    """Up to `limit` settled changes after cursor `since`, oldest first."""
+    cur.execute(
+        """
+        SELECT id, patient_id, entity, entity_id, action, created_at
+        FROM change_log
+        WHERE doctor_id = %s AND id > %s
+          AND created_at < NOW(3) - INTERVAL %s SECOND
+        ORDER BY id
+        LIMIT %s
+        """,
+        (doctor_id, since, SETTLE_SECONDS, limit + 1),
+    )
+    rows = cur.fetchall()
+    return rows[:limit], len(rows) > limit
@@ -6,3 +6,143 @@ DB_CONFIG = {
     "database": "ehr_db",
 }
 SECRET_KEY = "change_this_secret"
+
+# Database engine: "mysql", or "sqlite" for a single-clinic install without a
+# database server (one file per database name in SQLITE_FOLDER; create them
+# with `python sqlite_backend.py init`)
+DB_BACKEND = "mysql"
+SQLITE_FOLDER = "data"
+
+# Read replicas for read-only endpoints (same keys as DB_CONFIG); empty = primary only
+REPLICA_CONFIGS = []
+REPLICA_POOL_SIZE = 5
+# Pooled primary connections per shard and worker process (0 = connect per
+# request); pooled sessions keep their prepared statements (repository.py)
+PRIMARY_POOL_SIZE = 8
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_LAG_CHECK_INTERVAL = 10
+# After a write, the same session reads from the primary for this long
+READ_YOUR_WRITES_SECONDS = 10
+
+# Doctor-scoped shards (see sharding.py). DB_CONFIG stays the directory
+# database holding `doctors` and `doctor_shards`. Each shard gets a distinct
+# id_offset (1..SHARD_ID_STRIDE) so AUTO_INCREMENT ids never collide.
+SHARDS = {
+    "shard0": {"primary": DB_CONFIG, "replicas": REPLICA_CONFIGS, "id_offset": 1},
+}
+DEFAULT_SHARD = "shard0"
+SHARD_ID_STRIDE = 16
+SHARD_MAP_CACHE_SECONDS = 5
+
+# Time-based RANGE partitioning (see partition_db.py): table -> (column, "month" | "year")
+PARTITIONED_TABLES = {
+    "sheet_entries": ("created_at", "month"),
+}
+PARTITION_PERIODS_AHEAD = 3
+# get_latest_sheet looks in this many recent months before scanning everything
+LATEST_SHEET_WINDOW_MONTHS = 12
+
+# JSON responses smaller than this (bytes) are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+
+# Sessions: "cookie" (signed cookies, any number of workers), "memory"
+# (server-side, a single worker process only) or a redis:// URL shared by
+# all workers. Ownership checks are cached with "memory" and Redis only.
+SESSION_BACKEND = "cookie"
+# Seconds a verified patient/visit ownership stays cached
+DOCTOR_CONTEXT_TTL = 300
+
+# Rate limiting per doctor (or client IP before login) and route class:
+# (tokens per second, burst). "memory" or a redis:// URL shared by all workers.
+RATE_LIMIT_BACKEND = "memory"
+RATE_LIMITS = {
+    "auth": (0.2, 5),
+    "reads": (20, 60),
+    "writes": (5, 20),
+    "uploads": (0.5, 5),
+    "streams": (0.5, 10),
+    "polls": (1, 10),
+}
+# Requests in flight per route class and worker process before shedding with 503
+CONCURRENCY_LIMITS = {
+    "auth": 4,
+    "reads": 32,
+    "writes": 16,
+    "uploads": 4,
+    # /api/changes long polls hold a worker thread for up to CHANGE_FEED_MAX_WAIT
+    "polls": 8,
+}
+
+# Access audit trail: "mysql" (audit_log table in the directory database) or
+# "file:<path>" for an append-only JSON lines file
+AUDIT_SINK = "mysql"
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 1.0
+
+# Doctors allowed to use /api/admin/* endpoints
+ADMIN_DOCTOR_IDS = set()
+
+# /api/changes paging and long-poll limits
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_WAIT = 25
+CHANGE_FEED_POLL_INTERVAL = 1.0
+
+# Live patient events: "memory" (single process) or a redis:// URL
+EVENT_BROKER = "memory"
+# Undelivered events per connected client before it is told to resync
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 20
+# Refuse to start under gunicorn without gevent workers (see pubsub.py)
+EVENT_STREAMS_REQUIRE_GEVENT = True
+
+# /api/patients/<id>/vitals?bucket=raw returns at most this many readings
+VITALS_MAX_POINTS = 5000
+
+# /api/analytics defaults and the nightly `python analytics.py rebuild` window
+ANALYTICS_DEFAULT_WEEKS = 12
+ANALYTICS_TOP_COMPLAINTS = 10
+ANALYTICS_REBUILD_DAYS = 2
+
+# /api/search paging and snippet size
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_RESULTS = 1000  # deepest page reachable is this many hits in
+SEARCH_MAX_TERMS = 8
+SEARCH_SNIPPET_CHARS = 160
+
+# Built frontend (`npm run build`), served under the `base` set in vite.config.js
+FRONTEND_FOLDER = "dist"
+FRONTEND_BASE = "/CareNexus-/"
+
+# Uploaded documents (relative to the app directory)
+UPLOAD_FOLDER = "static/uploads"
+
+# Background jobs (jobs.py, worker.py)
+JOB_WORKER_PROCESSES = 4
+JOB_POLL_INTERVAL = 1.0
+JOB_MAX_ATTEMPTS = 5
+# Retry n waits about JOB_BACKOFF_BASE * 2**(n-1) seconds, capped
+JOB_BACKOFF_BASE = 5
+JOB_BACKOFF_MAX = 3600
+# A running job whose worker has not finished it after this long is requeued
+JOB_LEASE_SECONDS = 900
+# name -> (kind, payload, every_seconds), scheduled on every shard
+RECURRING_JOBS = {
+    "analytics-rebuild": ("rebuild_analytics", {"days": ANALYTICS_REBUILD_DAYS}, 24 * 3600),
+    "prune-jobs": ("prune_jobs", {"days": 7}, 3600),
+}
+
+# Orphaned upload collection (upload_gc.py)
+UPLOAD_GC_BATCH_SIZE = 500
+# Newer files may belong to an upload that has not committed yet
+UPLOAD_GC_MIN_AGE_SECONDS = 3600
+UPLOAD_GC_QUARANTINE_DAYS = 7
+UPLOAD_GC_MAX_OPS_PER_SECOND = 200
+
+# On-demand profiling (profiling.py). Workers on one host share the settings
+# file; captures are kept in PROFILING_FOLDER, newest PROFILING_MAX_PROFILES
+PROFILING_SETTINGS_FILE = "profiles/settings.json"
+PROFILING_FOLDER = "profiles"
+PROFILING_INTERVAL = 0.005
+PROFILING_MAX_PROFILES = 200
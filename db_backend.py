@@ -0,0 +1,21 @@
+"""
+Database engine selection
+DB_BACKEND picks what sits behind every connection: "mysql" (a MySQL
+server, through mysql.connector) or "sqlite" (local files, see
+sqlite_backend.py). Both hand out mysql.connector-style connections.
+"""
+import mysql.connector
+from config import DB_BACKEND
+
+import sqlite_backend
+
+
+def connect(**config):
+    if DB_BACKEND == "sqlite":
+        return sqlite_backend.connect(**config)
+    return mysql.connector.connect(**config)
+
+
+def router_connect():
+    """`connect` for ReplicaRouter: None keeps its MySQL connection pools."""
+    return sqlite_backend.connect if DB_BACKEND == "sqlite" else None
@@ -0,0 +1,169 @@
+"""
+Read-replica routing
+Hands out primary connections for writes and pooled replica connections for
+read-only handlers, skipping replicas that lag too far behind the primary.
+
+Pools keep each connection's session between checkouts (no reset), so
+server-side prepared statements cached by repository.py stay valid; any
+transaction left open is rolled back when the connection comes back.
+"""
+import itertools
+import threading
+import time
+import weakref
+
+import mysql.connector
+from mysql.connector import pooling
+
+
+class SessionPool(pooling.MySQLConnectionPool):
+    """Connection pool that keeps sessions instead of resetting them."""
+
+    def __init__(self, **kwargs):
+        super().__init__(pool_reset_session=False, **kwargs)
+
+    def add_connection(self, cnx=None):
+        # Without a reset, an open transaction (even a read snapshot)
+        # would leak into the next checkout
+        if cnx is not None and cnx.is_connected() and cnx.in_transaction:
+            cnx.rollback()
+        super().add_connection(cnx)
+
+
+class Replica:
+    """One replica host: a connection pool plus a cached lag reading."""
+
+    def __init__(self, name, config, pool_size, connect=None):
+        self.name = name
+        self.config = config
+        self.pool_size = pool_size
+        self._connect = connect
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.lag = None
+        self.checked_at = 0.0
+
+    def connect(self):
+        if self._connect:
+            return self._connect(**self.config)
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = SessionPool(
+                        pool_name=self.name, pool_size=self.pool_size, **self.config
+                    )
+        return self._pool.get_connection()
+
+    def measure_lag(self):
+        """Seconds behind the primary, or None if replication is not running."""
+        conn = self.connect()
+        cur = conn.cursor(dictionary=True)
+        try:
+            try:
+                cur.execute("SHOW REPLICA STATUS")
+            except mysql.connector.Error:
+                # MySQL < 8.0.22 / MariaDB
+                cur.execute("SHOW SLAVE STATUS")
+            status = cur.fetchone()
+            if not status:
+                return None
+            lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+            return None if lag is None else int(lag)
+        finally:
+            cur.close()
+            conn.close()
+
+
+class ReplicaRouter:
+    """Routes connections between one primary and a set of replicas.
+
+    `connect` defaults to mysql.connector.connect for the primary (pooled
+    when `primary_pool_size` is set) and to a per-replica pool for replicas;
+    pass a different callable to point the router at stand-in servers in
+    tests.
+    """
+
+    def __init__(self, primary_config, replica_configs, pool_size=5,
+                 max_lag=5, check_interval=10, connect=None, name="main",
+                 init_statements=(), primary_pool_size=0):
+        self.name = name
+        self.primary_config = primary_config
+        self.init_statements = init_statements
+        self.primary_pool_size = 0 if connect else primary_pool_size
+        self._primary_pool = None
+        # Physical connection -> server connection id its init ran on
+        self._initialized = weakref.WeakKeyDictionary()
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._connect = connect or mysql.connector.connect
+        self.replicas = [
+            Replica(f"{name}_replica{i}", config, pool_size, connect)
+            for i, config in enumerate(replica_configs)
+        ]
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def _pooled_primary(self):
+        if self._primary_pool is None:
+            with self._lock:
+                if self._primary_pool is None:
+                    self._primary_pool = SessionPool(
+                        pool_name=f"{self.name}_primary",
+                        pool_size=self.primary_pool_size,
+                        **self.primary_config,
+                    )
+        try:
+            return self._primary_pool.get_connection()
+        except pooling.PoolError:
+            # Pool exhausted: a one-off connection beats failing the request
+            return self._connect(**self.primary_config)
+
+    def primary(self):
+        conn = self._pooled_primary() if self.primary_pool_size else self._connect(**self.primary_config)
+        if self.init_statements:
+            # Session variables survive in the pool; set them once per session
+            raw = conn._cnx if isinstance(conn, pooling.PooledMySQLConnection) else None
+            if raw is None or self._initialized.get(raw) != raw.connection_id:
+                cur = conn.cursor()
+                for statement in self.init_statements:
+                    cur.execute(statement)
+                cur.close()
+                if raw is not None:
+                    self._initialized[raw] = raw.connection_id
+        return conn
+
+    def _healthy(self, replica):
+        now = time.monotonic()
+        if now - replica.checked_at >= self.check_interval:
+            try:
+                replica.lag = replica.measure_lag()
+            except mysql.connector.Error:
+                replica.lag = None
+            replica.checked_at = now
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def replica(self):
+        """A connection to a healthy replica, falling back to the primary."""
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                candidate = next(self._cycle)
+            if not self._healthy(candidate):
+                continue
+            try:
+                return candidate.connect()
+            except mysql.connector.Error:
+                # Skip this replica until its next lag check
+                candidate.lag = None
+                candidate.checked_at = time.monotonic()
+        return self.primary()
+
+    def connection(self, read_only, last_write_at=0.0, read_your_writes=0.0):
+        """The connection for one request.
+
+        Read-only requests go to a replica, unless the session wrote within
+        the last `read_your_writes` seconds (`last_write_at` is a
+        time.time() stamp): replicas may not have that write yet.
+        """
+        if read_only and time.time() - last_write_at > read_your_writes:
+            return self.replica()
+        return self.primary()
@@ -0,0 +1,72 @@
+"""
+Built frontend serving
+Serves the Vite build in dist/ so the API server can host the app on its
+own. `npm run build` writes .br and .gz siblings next to every text asset
+(precompress.mjs); the sibling matching the browser's Accept-Encoding is
+sent as is, so nothing is compressed per request.
+
+Content-hashed files under assets/ never change, so browsers may keep them
+for a year without asking again. index.html names the current hashes and is
+revalidated on every load. Any other path under the base that is not a file
+gets index.html, leaving routing to the client.
+"""
+import mimetypes
+import os
+import re
+
+from flask import abort, request, send_from_directory  # type: ignore
+from werkzeug.security import safe_join  # type: ignore
+
+# Vite's default asset names: name-<8 char hash>.ext
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+# Tried in this order when the browser accepts them
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class Frontend:
+    def __init__(self, folder, other_max_age=3600):
+        self.folder = os.path.abspath(folder)
+        self.other_max_age = other_max_age
+
+    def cache_control(self, path):
+        if path == "index.html":
+            return REVALIDATE
+        if path.startswith("assets/") and HASHED_NAME.search(path):
+            return IMMUTABLE
+        return f"public, max-age={self.other_max_age}"
+
+    def _exists(self, path):
+        full = safe_join(self.folder, path)
+        return full is not None and os.path.isfile(full)
+
+    def send(self, path):
+        """`path` inside the build, from a precompressed sibling when possible."""
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        encoded = [(name, suffix) for name, suffix in ENCODINGS if self._exists(path + suffix)]
+        for name, suffix in encoded:
+            if request.accept_encodings[name] > 0:
+                response = send_from_directory(self.folder, path + suffix, mimetype=mimetype)
+                response.headers["Content-Encoding"] = name
+                break
+        else:
+            response = send_from_directory(self.folder, path, mimetype=mimetype)
+        if encoded:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = self.cache_control(path)
+        return response
+
+    def response(self, path):
+        if not os.path.isfile(os.path.join(self.folder, "index.html")):
+            abort(404)  # not built
+        if any(path.endswith(suffix) for _, suffix in ENCODINGS):
+            abort(404)  # siblings only go out with a Content-Encoding
+        if path and self._exists(path):
+            return self.send(path)
+        last = path.rsplit("/", 1)[-1]
+        if path.startswith("assets/") or "." in last:
+            # A missing file, not a client route: HTML here would break the page
+            abort(404)
+        return self.send("index.html")
@@ -0,0 +1,73 @@
+"""
+HTTP response layer
+Compresses large JSON responses (brotli when installed, gzip otherwise) and
+answers conditional GETs with 304 from cheap version queries, before the
+heavy queries run.
+"""
+import gzip
+import hashlib
+
+from flask import g, request  # type: ignore
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain", "text/css",
+                          "application/javascript", "text/javascript"}
+
+
+def version_etag(*parts):
+    """Weak ETag value over row versions (counts, max ids, max updated_at, ...)."""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:24]
+    return digest
+
+
+def not_modified(*parts, last_modified=None):
+    """Remember the response version; True if the client already has it.
+
+    Handlers call this right after their version query and return
+    `("", 304)` when it is True; `apply_cache_headers` adds the headers to
+    whatever response they end up sending.
+    """
+    g.etag = version_etag(request.full_path, *parts)
+    g.last_modified = last_modified
+    return request.if_none_match.contains_weak(g.etag)
+
+
+def apply_cache_headers(response):
+    etag = g.get("etag")
+    if etag and request.method == "GET" and response.status_code in (200, 304):
+        response.set_etag(etag, weak=True)
+        if g.get("last_modified"):
+            response.last_modified = g.last_modified
+        # Patient data: only the browser may keep it, and must revalidate
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _accepted(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def compress_response(response, min_size, gzip_level=6, brotli_quality=5):
+    if (response.status_code != 200
+            or response.is_streamed
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    if brotli is not None and _accepted("br"):
+        response.set_data(brotli.compress(body, quality=brotli_quality))
+        response.headers["Content-Encoding"] = "br"
+    elif _accepted("gzip"):
+        response.set_data(gzip.compress(body, compresslevel=gzip_level))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
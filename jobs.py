@@ -0,0 +1,203 @@
+"""
+Background jobs
+Handlers enqueue work into the `jobs` table on their own cursor, so a job
+exists exactly when the transaction that asked for it commits. worker.py
+claims due jobs with SELECT ... FOR UPDATE SKIP LOCKED (any number of
+workers can poll the same shard without blocking each other), runs them in
+a process pool and retries failures with exponential backoff.
+
+Higher `priority` runs first; `delay` schedules a job for later. Recurring
+jobs are ordinary rows that go back to 'queued' after each run.
+"""
+import json
+import random
+
+from config import JOB_MAX_ATTEMPTS, JOB_BACKOFF_BASE, JOB_BACKOFF_MAX
+
+
+def enqueue(cur, kind, payload=None, priority=0, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """Add a job; commits with the caller's transaction."""
+    cur.execute(
+        """
+        INSERT INTO jobs (kind, payload, priority, run_at, max_attempts)
+        VALUES (%s, %s, %s, NOW(3) + INTERVAL %s SECOND, %s)
+        """,
+        (kind, json.dumps(payload or {}), priority, delay, max_attempts),
+    )
+    return cur.lastrowid
+
+
+def schedule_recurring(conn, recurring):
+    """Make sure each {name: (kind, payload, every_seconds)} has its row."""
+    cur = conn.cursor()
+    try:
+        for name, (kind, payload, every) in recurring.items():
+            cur.execute(
+                """
+                INSERT INTO jobs (kind, payload, recurring_key, repeat_seconds, max_attempts)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE kind = VALUES(kind), payload = VALUES(payload),
+                  repeat_seconds = VALUES(repeat_seconds)
+                """,
+                (kind, json.dumps(payload), name, every, JOB_MAX_ATTEMPTS),
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def claim(conn, worker_id, limit):
+    """Lock up to `limit` due jobs for this worker and mark them running."""
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(
+            """
+            SELECT id, kind, payload, attempts, max_attempts, repeat_seconds
+            FROM jobs
+            WHERE state = 'queued' AND run_at <= NOW(3)
+            ORDER BY priority DESC, run_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (limit,),
+        )
+        jobs = cur.fetchall()
+        if jobs:
+            cur.execute(
+                f"""
+                UPDATE jobs SET state = 'running', attempts = attempts + 1,
+                  locked_by = %s, locked_at = NOW(3)
+                WHERE id IN ({', '.join(['%s'] * len(jobs))})
+                """,
+                (worker_id, *[job["id"] for job in jobs]),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    for job in jobs:
+        job["attempts"] += 1
+        job["payload"] = json.loads(job["payload"])
+    return jobs
+
+
+def complete(conn, job):
+    cur = conn.cursor()
+    try:
+        if job["repeat_seconds"]:
+            cur.execute(
+                """
+                UPDATE jobs SET state = 'queued', attempts = 0, last_error = NULL,
+                  locked_by = NULL, locked_at = NULL,
+                  run_at = NOW(3) + INTERVAL repeat_seconds SECOND
+                WHERE id = %s
+                """,
+                (job["id"],),
+            )
+        else:
+            cur.execute(
+                """
+                UPDATE jobs SET state = 'done', locked_by = NULL, finished_at = NOW(3)
+                WHERE id = %s
+                """,
+                (job["id"],),
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`, with jitter so failures spread out."""
+    delay = min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** (attempts - 1))
+    return round(delay * random.uniform(0.5, 1.5), 3)
+
+
+def fail(conn, job, error):
+    """Retry later, or give up once the job is out of attempts."""
+    cur = conn.cursor()
+    try:
+        if job["attempts"] < job["max_attempts"] or job["repeat_seconds"]:
+            cur.execute(
+                """
+                UPDATE jobs SET state = 'queued', last_error = %s, locked_by = NULL,
+                  locked_at = NULL, run_at = NOW(3) + INTERVAL %s SECOND
+                WHERE id = %s
+                """,
+                (error, backoff(min(job["attempts"], job["max_attempts"])), job["id"]),
+            )
+        else:
+            cur.execute(
+                """
+                UPDATE jobs SET state = 'failed', last_error = %s, locked_by = NULL,
+                  finished_at = NOW(3)
+                WHERE id = %s
+                """,
+                (error, job["id"]),
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def requeue_stale(conn, lease_seconds):
+    """Release jobs whose worker died mid-run; returns (requeued, failed).
+
+    A job that kills its worker never reaches `fail`, so its attempts are
+    counted here: one-off jobs out of attempts fail instead of taking down
+    worker after worker. Recurring jobs always go back to the queue.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            UPDATE jobs SET state = 'failed', last_error = 'worker died while running',
+              locked_by = NULL, finished_at = NOW(3)
+            WHERE state = 'running' AND locked_at < NOW(3) - INTERVAL %s SECOND
+              AND attempts >= max_attempts AND repeat_seconds IS NULL
+            """,
+            (lease_seconds,),
+        )
+        failed = cur.rowcount
+        cur.execute(
+            """
+            UPDATE jobs SET state = 'queued', last_error = 'worker died while running',
+              locked_by = NULL, locked_at = NULL
+            WHERE state = 'running' AND locked_at < NOW(3) - INTERVAL %s SECOND
+            """,
+            (lease_seconds,),
+        )
+        requeued = cur.rowcount
+        conn.commit()
+        return requeued, failed
+    finally:
+        cur.close()
+
+
+def prune(conn, days):
+    """Delete finished one-off jobs older than `days`."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            DELETE FROM jobs
+            WHERE state IN ('done', 'failed') AND finished_at < NOW() - INTERVAL %s DAY
+            """,
+            (days,),
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+
+
+def counts(conn):
+    """{state: number of jobs}"""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        return dict(cur.fetchall())
+    finally:
+        cur.close()
@@ -0,0 +1,153 @@
+"""
+JSON provider for the API
+Serializes MySQL rows directly: dates/datetimes as str() (same format the
+handlers used to produce by hand), Decimals as strings (as Flask's default
+provider does, without losing precision), and RawJSON values spliced in
+verbatim. Uses orjson when it is installed.
+"""
+import datetime
+import decimal
+import json
+import re
+import uuid
+
+from flask.json.provider import JSONProvider  # type: ignore
+
+from profiling import span
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+# orjson.Fragment needs orjson >= 3.9
+HAS_FRAGMENT = orjson is not None and hasattr(orjson, "Fragment")
+
+
+def _validate(text):
+    (orjson or json).loads(text)
+
+
+class RawJSON:
+    """Already-serialized JSON text (e.g. sheet_entries.data_json).
+
+    Written into the response as-is instead of being parsed and dumped again.
+    The text is still checked once (a parse, no dump): a stored value that is
+    not valid JSON goes out as `fallback` rather than breaking the response.
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text, fallback="{}"):
+        if isinstance(text, (bytearray, memoryview)):
+            text = bytes(text)
+        try:
+            _validate(text)
+        except ValueError:
+            text = fallback
+        self.text = text
+
+
+def _default(o):
+    if isinstance(o, (datetime.date, datetime.time, datetime.timedelta)):
+        # datetime is a date subclass; str() gives "YYYY-MM-DD HH:MM:SS"
+        return str(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, (bytes, bytearray)):
+        return o.decode("utf-8")
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+# Placeholder tokens: a random per-process prefix no client can guess
+_TOKEN_PREFIX = uuid.uuid4().hex
+_TOKEN = re.compile(f'"{_TOKEN_PREFIX}:' + r'(\d+)"')
+_TOKEN_BYTES = re.compile(_TOKEN.pattern.encode())
+
+
+class _Placeholders:
+    """RawJSON support for serializers without Fragment.
+
+    Each RawJSON is dumped as a unique string token; `splice` then swaps the
+    quoted tokens for the raw text in one pass over the output.
+    """
+
+    def __init__(self):
+        self.texts = []
+
+    def token(self, raw):
+        self.texts.append(raw.text)
+        return f"{_TOKEN_PREFIX}:{len(self.texts) - 1}"
+
+    def splice(self, text):
+        if not self.texts:
+            return text
+        if isinstance(text, bytes):
+            texts = [t.encode("utf-8") if isinstance(t, str) else bytes(t) for t in self.texts]
+            return _TOKEN_BYTES.sub(lambda m: texts[int(m[1])], text)
+        texts = [t if isinstance(t, str) else bytes(t).decode("utf-8") for t in self.texts]
+        return _TOKEN.sub(lambda m: texts[int(m[1])], text)
+
+
+def _orjson_default(o):
+    if isinstance(o, RawJSON):
+        return orjson.Fragment(o.text)
+    return _default(o)
+
+
+def dumps_orjson(obj, option=0):
+    """orjson.dumps with RawJSON support; placeholders before orjson 3.9."""
+    if HAS_FRAGMENT:
+        return orjson.dumps(obj, default=_orjson_default, option=option)
+    slots = _Placeholders()
+
+    def default(o):
+        if isinstance(o, RawJSON):
+            return slots.token(o)
+        return _default(o)
+
+    return slots.splice(orjson.dumps(obj, default=default, option=option))
+
+
+def dumps_stdlib(obj, **kwargs):
+    """json.dumps with RawJSON support via placeholder tokens."""
+    slots = _Placeholders()
+
+    def default(o):
+        if isinstance(o, RawJSON):
+            return slots.token(o)
+        return _default(o)
+
+    kwargs.setdefault("ensure_ascii", False)
+    return slots.splice(json.dumps(obj, default=default, **kwargs))
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider: orjson when available, stdlib json otherwise."""
+
+    mimetype = "application/json"
+    # Hand dates to _orjson_default so they keep the str() format
+    option = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+    def dumps_bytes(self, obj):
+        with span("json", "dumps"):
+            if orjson is not None:
+                return dumps_orjson(obj, self.option)
+            return dumps_stdlib(obj).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode("utf-8")
+        return dumps_stdlib(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        with span("json", "loads"):
+            if orjson is not None and not kwargs:
+                return orjson.loads(s)
+            return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
@@ -1,6 +1,10 @@
 """
 Database migration script
-Adds insurance_number, visits, documents, and ehr_data tables
+Adds insurance_number, visits, documents, ehr_data, doctor_shards, audit_log and change_log tables,
+the covering index behind the vitals time-series endpoint, the
+daily_stats analytics rollups, the background jobs queue and the
+documents.file_path index used by upload_gc.py and the full-text
+search_documents table
 """
 import mysql.connector
 from config import DB_CONFIG
@@ -114,6 +118,134 @@ def migrate():
           INDEX idx_visit_ehr (visit_id),
           INDEX idx_patient_ehr (patient_id)
         )
+        """,
+        
+        # Create doctor_shards table (directory database only)
+        """
+        CREATE TABLE IF NOT EXISTS doctor_shards (
+          doctor_id INT PRIMARY KEY,
+          shard VARCHAR(50) NOT NULL,
+          state VARCHAR(20) NOT NULL DEFAULT 'active',
+          updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
+          INDEX idx_shard (shard)
+        )
+        """,
+        
+        # Create audit_log table (directory database, append-only)
+        """
+        CREATE TABLE IF NOT EXISTS audit_log (
+          id BIGINT AUTO_INCREMENT PRIMARY KEY,
+          created_at DATETIME NOT NULL,
+          doctor_id INT NOT NULL,
+          action VARCHAR(20) NOT NULL,
+          entity VARCHAR(20) NOT NULL,
+          entity_id INT,
+          patient_id INT,
+          ip VARCHAR(45),
+          INDEX idx_audit_patient (patient_id, created_at),
+          INDEX idx_audit_doctor (doctor_id, created_at)
+        )
+        """,
+        
+        # Create change_log table (outbox behind /api/changes, every shard)
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+          id BIGINT AUTO_INCREMENT PRIMARY KEY,
+          doctor_id INT NOT NULL,
+          patient_id INT NOT NULL,
+          entity VARCHAR(20) NOT NULL,
+          entity_id INT,
+          action VARCHAR(20) NOT NULL,
+          created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+          INDEX idx_doctor_change (doctor_id, id)
+        )
+        """,
+        
+        # Check for the vitals covering index
+        """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'ehr_data'
+        AND INDEX_NAME = 'idx_patient_vitals'
+        """,
+        
+        # Covering index for /api/patients/<id>/vitals: range scans on
+        # (patient_id, created_at) never touch the wide ehr_data rows
+        """
+        CREATE INDEX idx_patient_vitals ON ehr_data (
+          patient_id, created_at,
+          blood_pressure_systolic, blood_pressure_diastolic, temperature,
+          heart_rate, weight, oxygen_saturation
+        )
+        """,
+        
+        # Create daily_stats table (analytics rollups, every shard)
+        """
+        CREATE TABLE IF NOT EXISTS daily_stats (
+          doctor_id INT NOT NULL,
+          day DATE NOT NULL,
+          metric VARCHAR(20) NOT NULL,
+          dimension VARCHAR(100) NOT NULL DEFAULT '',
+          value BIGINT NOT NULL DEFAULT 0,
+          PRIMARY KEY (doctor_id, day, metric, dimension),
+          INDEX idx_stats_day (day)
+        )
+        """,
+        
+        # Create jobs table (background job queue, every shard)
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+          id BIGINT AUTO_INCREMENT PRIMARY KEY,
+          kind VARCHAR(50) NOT NULL,
+          payload TEXT NOT NULL,
+          priority INT NOT NULL DEFAULT 0,
+          state VARCHAR(20) NOT NULL DEFAULT 'queued',
+          run_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+          attempts INT NOT NULL DEFAULT 0,
+          max_attempts INT NOT NULL DEFAULT 5,
+          last_error TEXT,
+          locked_by VARCHAR(100),
+          locked_at DATETIME(3),
+          recurring_key VARCHAR(50) UNIQUE,
+          repeat_seconds INT,
+          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+          finished_at DATETIME(3),
+          INDEX idx_jobs_due (state, priority, run_at),
+          INDEX idx_jobs_finished (state, finished_at)
+        )
+        """,
+        
+        # Check for the documents.file_path index
+        """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'documents'
+        AND INDEX_NAME = 'idx_document_path'
+        """,
+        
+        # Lets upload_gc.py look up batches of file names
+        """
+        CREATE INDEX idx_document_path ON documents (file_path)
+        """,
+        
+        # Create search_documents table (full-text search, every shard)
+        """
+        CREATE TABLE IF NOT EXISTS search_documents (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          doctor_id INT NOT NULL,
+          patient_id INT NOT NULL,
+          visit_id INT,
+          source VARCHAR(20) NOT NULL,
+          source_id INT NOT NULL,
+          label VARCHAR(100),
+          body MEDIUMTEXT NOT NULL,
+          updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          UNIQUE KEY uq_search_source (source, source_id),
+          INDEX idx_search_doctor (doctor_id),
+          INDEX idx_search_patient (patient_id),
+          FULLTEXT INDEX ft_search_body (body)
+        ) ENGINE=InnoDB
         """
     ]
     
@@ -152,6 +284,54 @@ def migrate():
         cur.execute(migrations[6])
         print("[OK] Created ehr_data table")
         
+        # Create doctor_shards table
+        print("Creating doctor_shards table...")
+        cur.execute(migrations[7])
+        print("[OK] Created doctor_shards table")
+        
+        # Create audit_log table
+        print("Creating audit_log table...")
+        cur.execute(migrations[8])
+        print("[OK] Created audit_log table")
+        
+        # Create change_log table
+        print("Creating change_log table...")
+        cur.execute(migrations[9])
+        print("[OK] Created change_log table")
+        
+        # Create vitals covering index if not exists
+        cur.execute(migrations[10])
+        if cur.fetchone()[0] == 0:
+            print("Creating vitals index on ehr_data...")
+            cur.execute(migrations[11])
+            print("[OK] Created idx_patient_vitals")
+        else:
+            print("[OK] idx_patient_vitals already exists")
+        
+        # Create daily_stats table
+        print("Creating daily_stats table...")
+        cur.execute(migrations[12])
+        print("[OK] Created daily_stats table")
+        
+        # Create jobs table
+        print("Creating jobs table...")
+        cur.execute(migrations[13])
+        print("[OK] Created jobs table")
+        
+        # Create documents.file_path index if not exists
+        cur.execute(migrations[14])
+        if cur.fetchone()[0] == 0:
+            print("Creating file path index on documents...")
+            cur.execute(migrations[15])
+            print("[OK] Created idx_document_path")
+        else:
+            print("[OK] idx_document_path already exists")
+        
+        # Create search_documents table
+        print("Creating search_documents table...")
+        cur.execute(migrations[16])
+        print("[OK] Created search_documents table (run `python search.py rebuild` to fill it)")
+        
         conn.commit()
         print("\n[SUCCESS] Migration completed successfully!")
         
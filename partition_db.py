@@ -0,0 +1,276 @@
+"""
+Table partitioning script
+Converts sheet_entries to a RANGE partitioned table (monthly, on
+created_at) and keeps future partitions ahead of the clock.
+
+Usage:
+    python partition_db.py apply              # one-off conversion
+    python partition_db.py maintain           # run from cron / scheduler
+    python partition_db.py explain <patient>  # show partition pruning
+
+The key follows the queries: get_latest_sheet and get_sheet_history filter
+on patient_id, sheet_type and a created_at range, so they only read the
+partitions of that range. Lookups by id alone probe the primary key of
+every partition instead of one. `visits` is not partitioned: it is read by
+id and patient_id, never by a visit_date range, so nothing would be
+pruned and its documents/ehr_data foreign keys would have to go.
+
+MySQL does not allow foreign keys on partitioned tables, so `apply` drops
+the FKs of sheet_entries. Nothing references sheet_entries, and
+`delete_patient` in app.py deletes a patient's sheet entries explicitly
+instead of relying on ON DELETE CASCADE.
+"""
+import sys
+from datetime import date, datetime
+
+import mysql.connector
+from config import DB_CONFIG, PARTITIONED_TABLES, PARTITION_PERIODS_AHEAD
+
+
+def _period_start(day, granularity):
+    if granularity == "year":
+        return date(day.year, 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def _next_period(day, granularity):
+    if granularity == "year":
+        return date(day.year + 1, 1, 1)
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def _partition_name(start, granularity):
+    if granularity == "year":
+        return f"p{start:%Y}"
+    return f"p{start:%Y%m}"
+
+
+def _bound(table, upper):
+    """VALUES LESS THAN expression for the partition ending at `upper`."""
+    if _column_type(table) == "timestamp":
+        return f"UNIX_TIMESTAMP('{upper:%Y-%m-%d} 00:00:00')"
+    return f"'{upper:%Y-%m-%d}'"
+
+
+_COLUMN_TYPES = {}
+
+
+def _column_type(table):
+    return _COLUMN_TYPES.get(table, "date")
+
+
+def _load_column_type(cur, table):
+    column, _ = PARTITIONED_TABLES[table]
+    cur.execute(
+        """
+        SELECT DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (table, column),
+    )
+    _COLUMN_TYPES[table] = cur.fetchone()[0].lower()
+
+
+def _partition_expr(table):
+    column, _ = PARTITIONED_TABLES[table]
+    if _column_type(table) == "timestamp":
+        return f"RANGE (UNIX_TIMESTAMP({column}))"
+    return f"RANGE COLUMNS ({column})"
+
+
+def _partition_defs(table, first, last):
+    """Partition definitions covering [first, last) plus the MAXVALUE catch-all."""
+    _, granularity = PARTITIONED_TABLES[table]
+    defs = []
+    start = _period_start(first, granularity)
+    while start < last:
+        upper = _next_period(start, granularity)
+        defs.append(
+            f"PARTITION {_partition_name(start, granularity)} "
+            f"VALUES LESS THAN ({_bound(table, upper)})"
+        )
+        start = upper
+    defs.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return defs
+
+
+def _horizon(table, today):
+    _, granularity = PARTITIONED_TABLES[table]
+    end = _period_start(today, granularity)
+    for _ in range(PARTITION_PERIODS_AHEAD + 1):
+        end = _next_period(end, granularity)
+    return end
+
+
+def _existing_partitions(cur, table):
+    cur.execute(
+        """
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+          AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (table,),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def _drop_foreign_keys(cur, table):
+    """Drop FKs declared on `table` and FKs in other tables referencing it."""
+    cur.execute(
+        """
+        SELECT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE()
+          AND (TABLE_NAME = %s OR REFERENCED_TABLE_NAME = %s)
+        """,
+        (table, table),
+    )
+    for owner, constraint in cur.fetchall():
+        cur.execute(f"ALTER TABLE {owner} DROP FOREIGN KEY {constraint}")
+        print(f"[OK] Dropped foreign key {owner}.{constraint}")
+
+
+def apply():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    today = date.today()
+
+    try:
+        for table, (column, granularity) in PARTITIONED_TABLES.items():
+            _load_column_type(cur, table)
+            if _existing_partitions(cur, table):
+                print(f"[OK] {table} already partitioned")
+                continue
+
+            print(f"Partitioning {table} by {granularity} on {column}...")
+            _drop_foreign_keys(cur, table)
+
+            # The partitioning column has to be part of every unique key
+            cur.execute(
+                f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, {column})"
+            )
+
+            cur.execute(f"SELECT MIN({column}) FROM {table}")
+            first = cur.fetchone()[0] or today
+            if isinstance(first, datetime):
+                first = first.date()
+
+            defs = _partition_defs(table, first, _horizon(table, today))
+            cur.execute(
+                f"ALTER TABLE {table} PARTITION BY {_partition_expr(table)} "
+                f"({', '.join(defs)})"
+            )
+            print(f"[OK] Created {len(defs)} partitions on {table}")
+
+        # Per-patient lookups stay index-only inside each partition
+        try:
+            cur.execute(
+                "CREATE INDEX idx_patient_sheet_created ON sheet_entries(patient_id, sheet_type, created_at)"
+            )
+            print("[OK] Created idx_patient_sheet_created")
+        except mysql.connector.Error:
+            pass
+
+        conn.commit()
+        print("\n[SUCCESS] Partitioning completed successfully!")
+    except mysql.connector.Error as e:
+        conn.rollback()
+        print(f"[ERROR] Error during partitioning: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def maintain():
+    """Split pmax so that PARTITION_PERIODS_AHEAD future partitions exist."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    today = date.today()
+
+    try:
+        for table, (_, granularity) in PARTITIONED_TABLES.items():
+            _load_column_type(cur, table)
+            existing = _existing_partitions(cur, table)
+            if not existing:
+                print(f"[SKIP] {table} is not partitioned, run `apply` first")
+                continue
+
+            dated = [p for p in existing if p != "pmax"]
+            if dated:
+                last = dated[-1]
+                if granularity == "year":
+                    last_start = date(int(last[1:5]), 1, 1)
+                else:
+                    last_start = date(int(last[1:5]), int(last[5:7]), 1)
+                first = _next_period(last_start, granularity)
+            else:
+                # Only pmax: the first new partition takes every older row
+                first = _period_start(today, granularity)
+            horizon = _horizon(table, today)
+            if first >= horizon:
+                print(f"[OK] {table} has partitions up to {first}")
+                continue
+
+            # pmax is empty as long as maintenance runs ahead of time, so
+            # reorganizing it does not copy any rows
+            defs = _partition_defs(table, first, horizon)
+            cur.execute(
+                f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({', '.join(defs)})"
+            )
+            print(f"[OK] Added {len(defs) - 1} partitions to {table} (up to {horizon})")
+    except mysql.connector.Error as e:
+        print(f"[ERROR] Error during partition maintenance: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def explain(patient_id):
+    """Print the partitions MySQL reads for the sheet query shapes in app.py."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cur = conn.cursor(dictionary=True)
+
+    queries = {
+        "latest (recent window)": (
+            """
+            SELECT * FROM sheet_entries
+            WHERE patient_id = %s AND sheet_type = %s
+              AND created_at >= NOW() - INTERVAL %s MONTH
+            ORDER BY created_at DESC LIMIT 1
+            """,
+            (patient_id, "digestive", 12),
+        ),
+        "history (bounded)": (
+            """
+            SELECT se.id, se.created_at FROM sheet_entries se
+            WHERE se.patient_id = %s AND se.sheet_type = %s
+              AND se.created_at >= %s AND se.created_at < %s
+            ORDER BY se.created_at DESC
+            """,
+            (patient_id, "digestive", f"{date.today().year}-01-01", f"{date.today().year + 1}-01-01"),
+        ),
+    }
+
+    try:
+        for label, (query, params) in queries.items():
+            cur.execute("EXPLAIN " + query, params)
+            for row in cur.fetchall():
+                print(f"{label}: table={row['table']} partitions={row['partitions']} "
+                      f"key={row['key']} rows={row['rows']}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "apply"
+    if command == "apply":
+        apply()
+    elif command == "maintain":
+        maintain()
+    elif command == "explain" and len(sys.argv) > 2:
+        explain(int(sys.argv[2]))
+    else:
+        print(__doc__)
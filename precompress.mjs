@@ -0,0 +1,42 @@
+// Writes .br and .gz siblings next to the text files of the Vite build, so
+// Flask (frontend.py) can send them without compressing per request.
+// Runs after `vite build`; see the "build" script in package.json.
+import { readdirSync, readFileSync, statSync, writeFileSync } from 'node:fs'
+import { extname, join } from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+const DIST = 'dist'
+const EXTENSIONS = new Set(['.html', '.js', '.mjs', '.css', '.svg', '.json', '.txt', '.map', '.xml'])
+const MIN_SIZE = 1024
+
+function* files(dir) {
+  for (const name of readdirSync(dir)) {
+    const path = join(dir, name)
+    if (statSync(path).isDirectory()) yield* files(path)
+    else yield path
+  }
+}
+
+let written = 0
+for (const path of files(DIST)) {
+  if (!EXTENSIONS.has(extname(path))) continue
+  const body = readFileSync(path)
+  if (body.length < MIN_SIZE) continue
+  const variants = {
+    '.br': brotliCompressSync(body, {
+      params: {
+        [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+        [constants.BROTLI_PARAM_SIZE_HINT]: body.length,
+      },
+    }),
+    '.gz': gzipSync(body, { level: 9 }),
+  }
+  for (const [suffix, compressed] of Object.entries(variants)) {
+    // Not worth a Content-Encoding if it barely shrinks
+    if (compressed.length < body.length * 0.9) {
+      writeFileSync(path + suffix, compressed)
+      written++
+    }
+  }
+}
+console.log(`precompress: wrote ${written} files in ${DIST}/`)
@@ -0,0 +1,334 @@
+"""
+On-demand request profiling
+An admin switches profiling on through /api/admin/profiling, for a sampled
+fraction of requests and optionally one doctor or endpoint. The switches
+live in a small JSON file that every worker re-reads when it changes, so no
+restart is needed.
+
+A profiled request gets
+- a sampling profile: a background thread records the request thread's
+  stack every PROFILING_INTERVAL seconds (nothing runs while no request is
+  being profiled), saved as folded stacks for flamegraph.pl / speedscope;
+- a span tree of the SQL, JSON, password hashing and file I/O it did.
+Both are written to PROFILING_FOLDER by a background writer thread after
+the response has gone out.
+
+Code marks spans with `with span("sql", "..."):`, which costs nothing
+outside a profiled request.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from flask import has_request_context, request  # type: ignore
+
+from audit import BackgroundWriter
+
+ENVIRON_KEY = "ehr.profile"
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "sample_rate": 0.01,
+    "doctor_id": None,
+    "endpoint": None,
+    "until": None,
+}
+_NO_SPAN = nullcontext()
+
+
+def current():
+    """The profile of the request being handled, if it is profiled."""
+    if has_request_context():
+        return request.environ.get(ENVIRON_KEY)
+    return None
+
+
+def span(kind, label):
+    profile = current()
+    return profile.span(kind, label) if profile is not None else _NO_SPAN
+
+
+def _fold(frame, limit=128):
+    names = []
+    while frame is not None and len(names) < limit:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profile:
+    def __init__(self, endpoint, method, path, doctor_id):
+        self.meta = {
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "doctor_id": doctor_id,
+            "started_at": time.time(),
+        }
+        self.thread = threading.get_ident()
+        self.samples = Counter()
+        self.root = {"kind": "request", "label": f"{method} {path}", "start_ms": 0.0,
+                     "ms": None, "children": []}
+        self._started = time.perf_counter()
+        self._stack = []  # open spans
+
+    @contextmanager
+    def span(self, kind, label):
+        started = time.perf_counter()
+        node = {"kind": kind, "label": label,
+                "start_ms": round((started - self._started) * 1000, 3),
+                "ms": None, "children": []}
+        (self._stack[-1] if self._stack else self.root)["children"].append(node)
+        self._stack.append(node)
+        try:
+            yield node
+        finally:
+            node["ms"] = round((time.perf_counter() - started) * 1000, 3)
+            self._stack.pop()
+
+    def add_sample(self, folded):
+        self.samples[folded] += 1
+
+    def _totals(self):
+        totals = {}
+        pending = list(self.root["children"])
+        while pending:
+            node = pending.pop()
+            total = totals.setdefault(node["kind"], {"count": 0, "ms": 0.0})
+            total["count"] += 1
+            total["ms"] = round(total["ms"] + (node["ms"] or 0.0), 3)
+            pending.extend(node["children"])
+        return totals
+
+    def finish(self, status=None):
+        self.root["ms"] = round((time.perf_counter() - self._started) * 1000, 3)
+        self.meta.update(status=status, ms=self.root["ms"],
+                         samples=sum(self.samples.values()), totals=self._totals())
+
+    def save(self, folder):
+        """Write <name>.json (meta + span tree) and <name>.folded; returns name."""
+        started = self.meta["started_at"]
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started)) + f"{int(started * 1000) % 1000:03d}"
+        name = f"{stamp}-{self.meta['endpoint']}-{uuid.uuid4().hex[:8]}"
+        with open(os.path.join(folder, name + ".folded"), "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self.samples.items())
+        with open(os.path.join(folder, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump({**self.meta, "name": name, "spans": self.root}, f, default=str)
+        return name
+
+
+class Sampler:
+    """One thread per process sampling the stacks of profiled requests."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}  # thread ident -> Profile
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, profile):
+        with self._lock:
+            self._active[profile.thread] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, profile):
+        """Stop sampling `profile`; no sample is added to it once this returns."""
+        with self._lock:
+            self._active.pop(profile.thread, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                # Under the lock: a removed profile may be saving already
+                for ident, profile in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        profile.add_sample(_fold(frame))
+            del frames
+            time.sleep(self.interval)
+
+
+class Settings:
+    """Profiling switches shared by all workers through a JSON file."""
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._values = dict(DEFAULT_SETTINGS)
+        self._mtime = None
+        self._next_check = 0.0
+
+    def current(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self._mtime:
+                self._mtime = mtime
+                values = dict(DEFAULT_SETTINGS)
+                if mtime is not None:
+                    with open(self.path, encoding="utf-8") as f:
+                        values.update(json.load(f))
+                self._values = values
+        return self._values
+
+    def update(self, values):
+        merged = {**self.current(), **values}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(merged, f)
+        os.replace(tmp, self.path)
+        self._next_check = 0.0
+        return self.current()
+
+
+class Profiler:
+    def __init__(self, settings_path, folder, interval=0.005, max_profiles=200):
+        self.folder = folder
+        self.max_profiles = max_profiles
+        os.makedirs(folder, exist_ok=True)
+        self.settings = Settings(settings_path)
+        self.sampler = Sampler(interval)
+        self.writer = BackgroundWriter(self, max_queue=max_profiles, batch_size=50,
+                                       name="profile-writer")
+
+    def wanted(self, doctor_id, endpoint):
+        settings = self.settings.current()
+        if not settings["enabled"]:
+            return False
+        if settings["until"] is not None and time.time() > settings["until"]:
+            return False
+        if settings["doctor_id"] is not None and settings["doctor_id"] != doctor_id:
+            return False
+        if settings["endpoint"] and settings["endpoint"] != endpoint:
+            return False
+        return random.random() < settings["sample_rate"]
+
+    def start(self, doctor_id, endpoint):
+        """Profile the current request if the settings select it."""
+        if not self.wanted(doctor_id, endpoint):
+            return None
+        profile = Profile(endpoint, request.method, request.path, doctor_id)
+        request.environ[ENVIRON_KEY] = profile
+        self.sampler.add(profile)
+        return profile
+
+    def finish(self, status=None):
+        profile = request.environ.pop(ENVIRON_KEY, None)
+        if profile is None:
+            return
+        self.sampler.remove(profile)
+        profile.finish(status)
+        self.writer.put(profile)
+
+    def write(self, profiles):
+        """Sink for the writer thread: save a batch of finished profiles."""
+        for profile in profiles:
+            profile.save(self.folder)
+        self._prune()
+
+    def _saved(self):
+        # Captures start with their timestamp; skips the settings file
+        return sorted(n for n in os.listdir(self.folder) if n.endswith(".json") and n[:8].isdigit())
+
+    def _prune(self):
+        saved = self._saved()
+        for name in saved[:max(0, len(saved) - self.max_profiles)]:
+            for suffix in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.folder, name[:-len(".json")] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def profiles(self, limit=50):
+        """Metadata of the newest saved profiles, newest first."""
+        names = self._saved()[::-1]
+        result = []
+        for name in names[:limit]:
+            try:
+                with open(os.path.join(self.folder, name), encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # pruned or being written by another worker
+            data.pop("spans", None)
+            result.append(data)
+        return result
+
+
+# ---------- traced database connections ----------
+
+def _statement(operation):
+    return re.sub(r"\s+", " ", operation).strip()[:200]
+
+
+class TracedCursor:
+    """Cursor wrapper recording execute/fetch spans; everything else passes through."""
+
+    def __init__(self, cursor, profile):
+        self._cursor = cursor
+        self._profile = profile
+
+    def execute(self, operation, *args, **kwargs):
+        with self._profile.span("sql", _statement(operation)):
+            return self._cursor.execute(operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        with self._profile.span("sql", _statement(operation)):
+            return self._cursor.executemany(operation, *args, **kwargs)
+
+    def fetchall(self):
+        with self._profile.span("sql", "fetchall"):
+            return self._cursor.fetchall()
+
+    def fetchmany(self, *args, **kwargs):
+        with self._profile.span("sql", "fetchmany"):
+            return self._cursor.fetchmany(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TracedConnection:
+    def __init__(self, conn, profile):
+        self._conn = conn
+        self._profile = profile
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._conn.cursor(*args, **kwargs), self._profile)
+
+    def commit(self):
+        with self._profile.span("sql", "COMMIT"):
+            return self._conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def trace_connection(conn):
+    """`conn`, wrapped to record SQL spans when this request is profiled."""
+    profile = current()
+    return TracedConnection(conn, profile) if profile is not None else conn
@@ -0,0 +1,118 @@
+"""
+Publish/subscribe for live chart updates
+LocalBroker fans messages out to subscribers in this process. RedisBroker
+relays them through Redis so that a commit on one worker reaches clients
+connected to any other; each process keeps a single Redis subscription
+however many clients it serves.
+
+Subscribers block in `Subscription.get`, which is gevent-friendly: run the
+app under a gevent worker (`gunicorn -k gevent app:app`) so thousands of idle
+event streams cost a greenlet each instead of a thread. `check_gevent`
+refuses to start gunicorn workers that would hold a thread per stream.
+"""
+import json
+import queue
+import sys
+import threading
+
+
+def gevent_active():
+    """True when gevent has monkey-patched this process."""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def check_gevent():
+    """Raise under gunicorn without gevent: each event stream would pin a thread."""
+    if "gunicorn" in sys.modules and not gevent_active():
+        raise RuntimeError(
+            "Live patient events need gevent workers: run `gunicorn -k gevent app:app` "
+            "(pip install gevent), or set EVENT_STREAMS_REQUIRE_GEVENT = False"
+        )
+
+
+class Subscription:
+    def __init__(self, broker, channel, max_pending):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def deliver(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # Slow client: drop and tell it to reload instead of buffering
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next message, or None after `timeout` seconds without one."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def _fan_out(self, channel, message):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def publish(self, channel, message):
+        self._fan_out(channel, message)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._channels.values())
+
+
+class RedisBroker(LocalBroker):
+    def __init__(self, url, prefix="ehr:events:", max_pending=100):
+        import redis  # type: ignore
+
+        super().__init__(max_pending)
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._thread = threading.Thread(target=self._listen, name="pubsub-listener", daemon=True)
+        self._thread.start()
+
+    def publish(self, channel, message):
+        self._redis.publish(self._prefix + channel, json.dumps(message, default=str))
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self._prefix + "*")
+        for item in pubsub.listen():
+            channel = item["channel"].decode("utf-8")[len(self._prefix):]
+            self._fan_out(channel, json.loads(item["data"]))
+
+
+def make_broker(url, max_pending=100):
+    """'memory' or a redis:// URL."""
+    if url == "memory":
+        return LocalBroker(max_pending)
+    return RedisBroker(url, max_pending=max_pending)
@@ -0,0 +1,122 @@
+"""
+Rate limiting and admission control
+Token buckets per (doctor or client IP, route class) turn away clients that
+send too much (429), and per-class concurrency limits shed load before it
+reaches MySQL (503).
+"""
+import math
+import threading
+import time
+
+
+class MemoryRateBackend:
+    """Token buckets kept in this process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def take(self, key, rate, burst):
+        """Take one token; returns seconds to wait, 0 if allowed."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            if now >= self._next_purge:
+                self._purge(now)
+                self._next_purge = now + 60
+        return wait
+
+    def _purge(self, now):
+        # A bucket idle for longer than 10 minutes is full again in any
+        # sane configuration; forget it
+        stale = [key for key, (_, last) in self._buckets.items() if now - last > 600]
+        for key in stale:
+            del self._buckets[key]
+
+
+class RedisRateBackend:
+    """Token buckets shared by all workers, updated atomically in Lua."""
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+    local tokens = tonumber(state[1]) or burst
+    local last = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - last) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix="ehr:rl:"):
+        import redis  # type: ignore
+
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key, rate, burst):
+        return float(self._script(keys=[self._prefix + key], args=[rate, burst, time.time()]))
+
+
+def make_rate_backend(url):
+    """'memory' or a redis:// URL."""
+    if url == "memory":
+        return MemoryRateBackend()
+    return RedisRateBackend(url)
+
+
+class AdmissionController:
+    """Caps in-flight requests per route class in this process."""
+
+    def __init__(self, limits):
+        self._slots = {name: threading.BoundedSemaphore(n) for name, n in limits.items()}
+
+    def enter(self, route_class):
+        slots = self._slots.get(route_class)
+        return slots is None or slots.acquire(blocking=False)
+
+    def leave(self, route_class):
+        slots = self._slots.get(route_class)
+        if slots is not None:
+            slots.release()
+
+
+class RateLimiter:
+    def __init__(self, backend, rates, concurrency):
+        self.backend = backend
+        self.rates = rates
+        self.admission = AdmissionController(concurrency)
+
+    def check(self, client, route_class):
+        """Returns (status, retry_after) if the request must be refused, else None.
+
+        On None the caller holds an admission slot and must call `done`.
+        """
+        rate, burst = self.rates.get(route_class, (None, None))
+        if rate:
+            wait = self.backend.take(f"{client}:{route_class}", rate, burst)
+            if wait > 0:
+                return 429, max(1, math.ceil(wait))
+        if not self.admission.enter(route_class):
+            return 503, 1
+        return None
+
+    def done(self, route_class):
+        self.admission.leave(route_class)
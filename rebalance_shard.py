@@ -0,0 +1,300 @@
+"""
+Shard rebalancing script
+Moves one doctor's patients (and all rows hanging off them) to another shard
+while the app keeps serving.
+
+Usage:
+    python rebalance_shard.py <doctor_id> <target_shard>
+
+1. Bulk copy while reads and writes continue on the source shard.
+2. Mark the doctor 'moving' (writes get 503 + Retry-After, reads continue)
+   and reconcile every table with the source, which no longer changes:
+   rows missing on the target are copied and rows gone from the source are
+   deleted, by comparing id sets, so late commits and deletes during step 1
+   cannot be missed. Rows updated since step 1 began (updated_at, less
+   MAX_TRANSACTION_SECONDS for transactions that committed late) are copied
+   again; tables without updated_at that are updated in place are copied
+   again in full.
+3. Point the shard map at the target and delete the rows from the source.
+
+Jobs stay where they are: none reads the doctor's rows from the shard it
+was queued on (delete_files only carries file paths, the recurring jobs are
+per shard), so they drain on the source.
+"""
+import sys
+import time
+
+from config import (
+    DB_CONFIG, REPLICA_CONFIGS, SHARDS, DEFAULT_SHARD, SHARD_ID_STRIDE,
+    SHARD_MAP_CACHE_SECONDS,
+)
+from db_router import ReplicaRouter
+from sharding import ShardMap, SHARDED_TABLES, DOCTOR_SCOPED_TABLES
+import analytics
+
+BATCH_SIZE = 1000
+# Extra wait on top of the shard map cache for requests already in flight
+GRACE_SECONDS = 2
+# Upper bound on an app write transaction: an UPDATE stamped this long
+# before the copy started may still have committed after it
+MAX_TRANSACTION_SECONDS = 300
+# Updated in place without an updated_at column
+UNSTAMPED_TABLES = ("patients", "digestive_visit")
+
+
+def _chunks(values, size=BATCH_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _has_column(cur, table, column):
+    cur.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (table, column),
+    )
+    return cur.fetchone()[0] > 0
+
+
+def _patient_ids(cur, doctor_id):
+    cur.execute("SELECT id FROM patients WHERE doctor_id = %s", (doctor_id,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _select(cur, table, doctor_id, patient_ids, extra="", params=(), columns="*"):
+    """Yield (columns, rows) batches of a doctor's rows in `table`."""
+    if table in DOCTOR_SCOPED_TABLES:
+        scopes = [("doctor_id = %s", (doctor_id,))]
+    else:
+        scopes = [
+            (f"patient_id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+            for chunk in _chunks(patient_ids)
+        ]
+    for scope, scope_params in scopes:
+        cur.execute(f"SELECT {columns} FROM {table} WHERE {scope} {extra}", scope_params + params)
+        names = cur.column_names
+        while True:
+            rows = cur.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            yield names, rows
+
+
+def _upsert(cur, table, columns, rows):
+    # ON DUPLICATE KEY UPDATE rather than REPLACE: REPLACE deletes first,
+    # which would fire ON DELETE CASCADE on the target
+    names = ", ".join(columns)
+    placeholders = ", ".join(["%s"] * len(columns))
+    updates = ", ".join(f"{c} = VALUES({c})" for c in columns if c != "id")
+    cur.executemany(
+        f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+        f"ON DUPLICATE KEY UPDATE {updates}",
+        rows,
+    )
+
+
+def _copy(src_cur, dst_conn, table, doctor_id, patient_ids, extra="", params=()):
+    dst_cur = dst_conn.cursor()
+    copied = 0
+    try:
+        for columns, rows in _select(src_cur, table, doctor_id, patient_ids, extra, params):
+            _upsert(dst_cur, table, columns, rows)
+            dst_conn.commit()
+            copied += len(rows)
+    finally:
+        dst_cur.close()
+    return copied
+
+
+def _ids(cur, table, doctor_id, patient_ids):
+    ids = set()
+    for _, rows in _select(cur, table, doctor_id, patient_ids, columns="id"):
+        ids.update(row[0] for row in rows)
+    return ids
+
+
+def _copy_ids(src_cur, dst_conn, table, ids):
+    dst_cur = dst_conn.cursor()
+    try:
+        for chunk in _chunks(sorted(ids)):
+            src_cur.execute(
+                f"SELECT * FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                tuple(chunk),
+            )
+            rows = src_cur.fetchall()
+            if rows:
+                _upsert(dst_cur, table, src_cur.column_names, rows)
+                dst_conn.commit()
+    finally:
+        dst_cur.close()
+
+
+def _delete_ids(conn, table, ids):
+    cur = conn.cursor()
+    try:
+        for chunk in _chunks(sorted(ids)):
+            cur.execute(
+                f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                tuple(chunk),
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def reconcile(src_cur, dst_conn, doctor_id, since):
+    """Make the target's copy of the doctor's rows match the (frozen) source.
+
+    Returns {table: (copied, deleted)}.
+    """
+    patient_ids = _patient_ids(src_cur, doctor_id)
+    dst_cur = dst_conn.cursor()
+    try:
+        # Rows of patients that only exist on the target count too
+        target_patient_ids = sorted(set(patient_ids) | set(_patient_ids(dst_cur, doctor_id)))
+        result = {}
+        extra = {}
+        for table in SHARDED_TABLES:
+            source_ids = _ids(src_cur, table, doctor_id, patient_ids)
+            target_ids = _ids(dst_cur, table, doctor_id, target_patient_ids)
+            missing = source_ids - target_ids
+            extra[table] = target_ids - source_ids
+            if table in UNSTAMPED_TABLES:
+                copied = _copy(src_cur, dst_conn, table, doctor_id, patient_ids)
+            else:
+                _copy_ids(src_cur, dst_conn, table, missing)
+                copied = len(missing)
+                if _has_column(src_cur, table, "updated_at"):
+                    copied += _copy(src_cur, dst_conn, table, doctor_id, patient_ids,
+                                    "AND updated_at >= %s", (since,))
+            result[table] = (copied, len(extra[table]))
+        # Children before parents
+        for table in reversed(SHARDED_TABLES):
+            _delete_ids(dst_conn, table, extra[table])
+        return result
+    finally:
+        dst_cur.close()
+
+
+def _delete(conn, doctor_id, patient_ids, include_doctor_rows=True):
+    cur = conn.cursor()
+    try:
+        if include_doctor_rows:
+            cur.execute("DELETE FROM change_log WHERE doctor_id = %s", (doctor_id,))
+            cur.execute("DELETE FROM daily_stats WHERE doctor_id = %s", (doctor_id,))
+        for table in reversed(SHARDED_TABLES[1:]):
+            if table in DOCTOR_SCOPED_TABLES:
+                continue
+            for chunk in _chunks(patient_ids):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE patient_id IN ({', '.join(['%s'] * len(chunk))})",
+                    tuple(chunk),
+                )
+        for chunk in _chunks(patient_ids):
+            cur.execute(
+                f"DELETE FROM patients WHERE doctor_id = %s AND id IN ({', '.join(['%s'] * len(chunk))})",
+                (doctor_id,) + tuple(chunk),
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _set_shard(directory, doctor_id, shard, state):
+    conn = directory.primary()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            INSERT INTO doctor_shards (doctor_id, shard, state) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE shard = VALUES(shard), state = VALUES(state)
+            """,
+            (doctor_id, shard, state),
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def rebalance(doctor_id, target):
+    directory = ReplicaRouter(DB_CONFIG, REPLICA_CONFIGS, name="directory")
+    shard_map = ShardMap(directory, SHARDS, DEFAULT_SHARD, SHARD_ID_STRIDE, cache_seconds=0)
+    if target not in shard_map.routers:
+        print(f"[ERROR] Unknown shard {target}")
+        return
+
+    source, state = shard_map.lookup(doctor_id)
+    if source == target:
+        print(f"[OK] Doctor {doctor_id} already on {target}")
+        return
+    if state != "active":
+        print(f"[ERROR] Doctor {doctor_id} is already being moved")
+        return
+
+    dir_conn = directory.primary()
+    dir_cur = dir_conn.cursor(dictionary=True)
+    dir_cur.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
+    doctor = dir_cur.fetchone()
+    dir_cur.close()
+    dir_conn.close()
+    if not doctor:
+        print(f"[ERROR] Doctor {doctor_id} not found")
+        return
+    shard_map.mirror_doctor(target, doctor)
+
+    src_conn = shard_map.routers[source].primary()
+    dst_conn = shard_map.routers[target].primary()
+    src_cur = src_conn.cursor()
+    flipped = False
+    try:
+        # Phase 1: bulk copy, app still writing to the source
+        src_cur.execute("SELECT NOW() - INTERVAL %s SECOND", (MAX_TRANSACTION_SECONDS,))
+        since = src_cur.fetchone()[0]
+        patient_ids = _patient_ids(src_cur, doctor_id)
+        for table in SHARDED_TABLES:
+            copied = _copy(src_cur, dst_conn, table, doctor_id, patient_ids)
+            print(f"[OK] Copied {copied} rows from {table}")
+
+        # Phase 2: freeze writes, reconcile with the source
+        _set_shard(directory, doctor_id, source, "moving")
+        print(f"Doctor {doctor_id} marked moving, waiting for workers...")
+        time.sleep(SHARD_MAP_CACHE_SECONDS + GRACE_SECONDS)
+
+        src_conn.commit()  # fresh snapshot
+        for table, (copied, deleted) in reconcile(src_cur, dst_conn, doctor_id, since).items():
+            print(f"[OK] {table}: copied {copied} changed rows, deleted {deleted}")
+        patient_ids = _patient_ids(src_cur, doctor_id)
+
+        # Rollups are derived data: recompute them from the copied rows
+        analytics.rebuild(dst_conn, doctor_id=doctor_id)
+        print("[OK] Rebuilt analytics rollups on the target")
+
+        # Phase 3: flip and clean up the source
+        _set_shard(directory, doctor_id, target, "active")
+        flipped = True
+        print(f"[OK] Doctor {doctor_id} now served from {target}")
+        time.sleep(SHARD_MAP_CACHE_SECONDS + GRACE_SECONDS)
+        _delete(src_conn, doctor_id, patient_ids)
+        print(f"[OK] Deleted doctor {doctor_id}'s rows from {source}")
+        print("\n[SUCCESS] Rebalance completed successfully!")
+    except Exception as e:
+        if flipped:
+            print(f"[ERROR] Doctor moved to {target} but cleaning up {source} failed: {e}")
+        else:
+            # Leave the data on the source and reopen it for writes
+            _set_shard(directory, doctor_id, source, "active")
+            print(f"[ERROR] Error during rebalance, doctor stays on {source}: {e}")
+    finally:
+        src_cur.close()
+        src_conn.close()
+        dst_conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+    else:
+        rebalance(int(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,103 @@
+"""
+Prepared statements for the hottest queries
+Each statement is declared once in QUERIES and runs as a server-side
+prepared statement: MySQL parses it once per connection, and rows come
+back over the binary protocol already typed. Prepared cursors are cached
+per physical connection, which the pools in db_router.py keep alive across
+requests. mysql.connector uses its C extension for all of this when it is
+installed.
+
+Rows are tuples unless the caller asks for dictionaries.
+"""
+import weakref
+
+import mysql.connector
+from mysql.connector import pooling
+
+from profiling import TracedConnection, span
+
+QUERIES = {
+    "doctor_by_number": "SELECT * FROM doctors WHERE doctor_number = %s",
+    "patient_owned": "SELECT id FROM patients WHERE id = %s AND doctor_id = %s",
+    "patient": "SELECT * FROM patients WHERE id = %s AND doctor_id = %s",
+    "visit_patient": """
+        SELECT v.patient_id FROM visits v
+        JOIN patients p ON v.patient_id = p.id
+        WHERE v.id = %s AND p.doctor_id = %s
+    """,
+    "patient_version": """
+        SELECT (SELECT COUNT(*) FROM visits WHERE patient_id = %s) AS visits,
+               (SELECT MAX(updated_at) FROM visits WHERE patient_id = %s) AS visits_updated,
+               (SELECT COUNT(*) FROM documents WHERE patient_id = %s) AS documents,
+               (SELECT MAX(id) FROM documents WHERE patient_id = %s) AS documents_max
+    """,
+    "patient_visits": """
+        SELECT v.*, COUNT(d.id) as document_count
+        FROM visits v
+        LEFT JOIN documents d ON v.id = d.visit_id
+        WHERE v.patient_id = %s
+        GROUP BY v.id
+        ORDER BY v.visit_date DESC
+    """,
+    # Recent partitions first; see get_latest_sheet
+    "latest_sheet_recent": """
+        SELECT * FROM sheet_entries
+        WHERE patient_id = %s AND sheet_type = %s
+          AND created_at >= NOW() - INTERVAL %s MONTH
+        ORDER BY created_at DESC LIMIT 1
+    """,
+    "latest_sheet": """
+        SELECT * FROM sheet_entries
+        WHERE patient_id = %s AND sheet_type = %s
+        ORDER BY created_at DESC LIMIT 1
+    """,
+    "latest_digestive": "SELECT * FROM digestive_visit WHERE patient_id = %s ORDER BY id DESC LIMIT 1",
+}
+
+# The server dropped the statement (the session was reconnected)
+ER_UNKNOWN_STMT_HANDLER = 1243
+
+# Physical connection -> {(query name, dictionary): prepared cursor}
+_statements = weakref.WeakKeyDictionary()
+
+
+def _physical(conn):
+    if isinstance(conn, TracedConnection):
+        conn = conn._conn
+    if isinstance(conn, pooling.PooledMySQLConnection):
+        conn = conn._cnx
+    return conn
+
+
+def _cursor(raw, name, dictionary):
+    cache = _statements.get(raw)
+    if cache is None:
+        cache = _statements[raw] = {}
+    cursor = cache.get((name, dictionary))
+    if cursor is None:
+        cursor = cache[(name, dictionary)] = raw.cursor(prepared=True, dictionary=dictionary)
+    return cursor
+
+
+def _execute(conn, name, params, dictionary):
+    raw = _physical(conn)
+    for attempt in (1, 2):
+        cursor = _cursor(raw, name, dictionary)
+        try:
+            with span("sql", f"prepared {name}"):
+                # The same str object every time, so the cursor reuses its statement
+                cursor.execute(QUERIES[name], params)
+            return cursor
+        except mysql.connector.Error as e:
+            if e.errno != ER_UNKNOWN_STMT_HANDLER or attempt == 2:
+                raise
+            _statements.pop(raw, None)
+
+
+def fetch_one(conn, name, params, dictionary=False):
+    rows = _execute(conn, name, params, dictionary).fetchall()
+    return rows[0] if rows else None
+
+
+def fetch_all(conn, name, params, dictionary=False):
+    return _execute(conn, name, params, dictionary).fetchall()
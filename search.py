@@ -0,0 +1,245 @@
+"""
+Full-text search over clinical notes
+Visit chief complaints and notes, digestive exam notes and sheet contents
+are copied into `search_documents` (one row per source row, FULLTEXT
+indexed) by the handlers that write them, in the same transaction. The
+/api/search endpoint ranks matches with MATCH ... AGAINST, so a query reads
+the full-text index instead of LIKE-scanning every note.
+
+Usage:
+    python search.py rebuild     # every shard, reindex all existing rows
+
+Every query word must appear, as a word or word prefix ("abdo pain" finds
+"abdominal pain"). InnoDB skips words shorter than innodb_ft_min_token_size
+(3 by default) and its stopword list.
+"""
+import json
+import re
+import sys
+
+import mysql.connector
+from config import SHARDS, SEARCH_MAX_TERMS, SEARCH_SNIPPET_CHARS
+
+import db_backend
+
+# Rows read per batch by rebuild
+BATCH_SIZE = 1000
+LABEL_LENGTH = 100
+
+
+def sheet_text(data, prefix=""):
+    """Searchable lines of a sheet: "field: value" for every filled field."""
+    lines = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            name = str(key).replace("_", " ")
+            lines.extend(sheet_text(value, f"{prefix} {name}".strip()))
+    elif isinstance(data, list):
+        for value in data:
+            lines.extend(sheet_text(value, prefix))
+    elif data is True:
+        lines.append(prefix)
+    elif data not in (None, False, "") and str(data).strip():
+        lines.append(f"{prefix}: {data}" if prefix else str(data))
+    return lines
+
+
+def index(cur, doctor_id, patient_id, source, source_id, body, visit_id=None, label=None):
+    """Insert or refresh the search row of one source row."""
+    body = body.strip()
+    if not body:
+        cur.execute(
+            "DELETE FROM search_documents WHERE source = %s AND source_id = %s",
+            (source, source_id),
+        )
+        return
+    cur.execute(
+        """
+        INSERT INTO search_documents
+            (doctor_id, patient_id, visit_id, source, source_id, label, body)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE doctor_id = VALUES(doctor_id), patient_id = VALUES(patient_id),
+            visit_id = VALUES(visit_id), label = VALUES(label), body = VALUES(body)
+        """,
+        (doctor_id, patient_id, visit_id, source, source_id,
+         (label or "")[:LABEL_LENGTH], body),
+    )
+
+
+def index_visit(cur, doctor_id, patient_id, visit_id, visit_type, chief_complaint, notes):
+    body = "\n".join(text for text in (chief_complaint, notes) if text)
+    index(cur, doctor_id, patient_id, "visit", visit_id, body, visit_id, visit_type)
+
+
+def index_digestive(cur, doctor_id, patient_id, digestive_id, notes):
+    index(cur, doctor_id, patient_id, "digestive", digestive_id, notes or "", label="digestive")
+
+
+def index_sheet(cur, doctor_id, patient_id, entry_id, visit_id, sheet_type, data):
+    index(cur, doctor_id, patient_id, "sheet", entry_id, "\n".join(sheet_text(data)),
+          visit_id, sheet_type)
+
+
+def retract_patient(cur, patient_id):
+    cur.execute("DELETE FROM search_documents WHERE patient_id = %s", (patient_id,))
+
+
+# ---------- querying ----------
+
+def terms(text):
+    """Lower-cased query words, without duplicates or boolean operators."""
+    words = []
+    for word in re.findall(r"\w+", text.lower()):
+        if word not in words:
+            words.append(word)
+    return words[:SEARCH_MAX_TERMS]
+
+
+def snippet(body, words, width=SEARCH_SNIPPET_CHARS):
+    """About `width` characters of `body` around the first match.
+
+    Returns (text, highlights) with highlights as [start, end) offsets into
+    text of every word-prefix match.
+    """
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")\w*", re.IGNORECASE)
+    first = pattern.search(body)
+    start = max(0, (first.start() if first else 0) - width // 4)
+    if start:
+        # Begin on a word boundary
+        space = body.find(" ", start, start + 20)
+        start = space + 1 if space != -1 else start
+    end = min(len(body), start + width)
+    text = " ".join(body[start:end].split())
+    highlights = [[m.start(), m.end()] for m in pattern.finditer(text)]
+    prefix = "…" if start else ""
+    if prefix:
+        highlights = [[a + 1, b + 1] for a, b in highlights]
+    return prefix + text + ("…" if end < len(body) else ""), highlights
+
+
+def search(cur, doctor_id, words, limit, offset):
+    """Ranked hits for `words` among the doctor's patients.
+
+    Returns up to `limit` hits and whether more follow.
+    """
+    query = " ".join(f"+{word}*" for word in words)
+    cur.execute(
+        """
+        SELECT s.source, s.source_id, s.patient_id, s.visit_id, s.label, s.body, s.updated_at,
+               p.first_name, p.last_name,
+               MATCH(s.body) AGAINST (%s IN BOOLEAN MODE) AS score
+        FROM search_documents s
+        JOIN patients p ON p.id = s.patient_id
+        WHERE MATCH(s.body) AGAINST (%s IN BOOLEAN MODE)
+          AND s.doctor_id = %s AND p.doctor_id = %s
+        ORDER BY score DESC, s.id DESC
+        LIMIT %s OFFSET %s
+        """,
+        (query, query, doctor_id, doctor_id, limit + 1, offset),
+    )
+    rows = cur.fetchall()
+    hits = []
+    for (source, source_id, patient_id, visit_id, label, body, updated_at,
+         first_name, last_name, score) in rows[:limit]:
+        text, highlights = snippet(body, words)
+        hits.append({
+            "source": source,
+            "id": source_id,
+            "patient_id": patient_id,
+            "patient_name": f"{first_name} {last_name}",
+            "visit_id": visit_id,
+            "label": label,
+            "updated_at": updated_at,
+            "score": round(float(score), 4),
+            "snippet": text,
+            "highlights": highlights,
+        })
+    return hits, len(rows) > limit
+
+
+# ---------- rebuilding ----------
+
+# source -> query of (id, doctor_id, patient_id, visit_id, label, fields...) after id %s
+REBUILD_QUERIES = {
+    "visit": """
+        SELECT v.id, p.doctor_id, v.patient_id, v.id, v.visit_type, v.chief_complaint, v.notes
+        FROM visits v JOIN patients p ON p.id = v.patient_id
+        WHERE v.id > %s ORDER BY v.id LIMIT %s
+    """,
+    "digestive": """
+        SELECT d.id, p.doctor_id, d.patient_id, NULL, 'digestive', d.notes
+        FROM digestive_visit d JOIN patients p ON p.id = d.patient_id
+        WHERE d.id > %s ORDER BY d.id LIMIT %s
+    """,
+    "sheet": """
+        SELECT s.id, p.doctor_id, s.patient_id, s.visit_id, s.sheet_type, s.data_json
+        FROM sheet_entries s JOIN patients p ON p.id = s.patient_id
+        WHERE s.id > %s ORDER BY s.id LIMIT %s
+    """,
+}
+
+
+def _body(source, fields):
+    if source == "sheet":
+        try:
+            return "\n".join(sheet_text(json.loads(fields[0] or "{}")))
+        except ValueError:
+            return fields[0] or ""
+    return "\n".join(text for text in fields if text)
+
+
+def rebuild(conn):
+    """Reindex every visit, digestive exam and sheet entry on one shard."""
+    read_cur = conn.cursor()
+    write_cur = conn.cursor()
+    counts = {}
+    try:
+        for source, sql in REBUILD_QUERIES.items():
+            counts[source] = 0
+            last_id = 0
+            while True:
+                read_cur.execute(sql, (last_id, BATCH_SIZE))
+                rows = read_cur.fetchall()
+                if not rows:
+                    break
+                for source_id, doctor_id, patient_id, visit_id, label, *fields in rows:
+                    index(write_cur, doctor_id, patient_id, source, source_id,
+                          _body(source, fields), visit_id, label)
+                conn.commit()
+                counts[source] += len(rows)
+                last_id = rows[-1][0]
+        # Rows whose source row is gone
+        for source, table in (("visit", "visits"), ("digestive", "digestive_visit"),
+                              ("sheet", "sheet_entries")):
+            write_cur.execute(
+                f"""
+                DELETE FROM search_documents
+                WHERE source = %s AND source_id NOT IN (SELECT id FROM {table})
+                """,
+                (source,),
+            )
+        conn.commit()
+    finally:
+        read_cur.close()
+        write_cur.close()
+    return counts
+
+
+def rebuild_all():
+    for name, shard in SHARDS.items():
+        conn = db_backend.connect(**shard["primary"])
+        try:
+            counts = rebuild(conn)
+            print(f"[OK] {name}: indexed " + ", ".join(f"{n} {s}" for s, n in counts.items()))
+        except mysql.connector.Error as e:
+            conn.rollback()
+            print(f"[ERROR] {name}: {e}")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print(__doc__)
+    else:
+        rebuild_all()
@@ -0,0 +1,226 @@
+"""
+Server-side sessions
+With a session backend, the `ehr_session` cookie only carries a signed
+session id; the session data and each doctor's cached context (recently
+verified patients and visits) live in the backend: in-process memory (one
+worker process only) or Redis shared by all workers/hosts.
+
+Without one ("cookie"), sessions are Flask's signed cookies, which work with
+any number of workers, and ownership checks are not cached.
+"""
+import json
+import secrets
+import threading
+import time
+
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin  # type: ignore
+from itsdangerous import BadSignature, Signer  # type: ignore
+from werkzeug.datastructures import CallbackDict  # type: ignore
+
+
+class MemoryBackend:
+    """Process-local key/value store with per-key expiry."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, now + ttl)
+            if now >= self._next_purge:
+                self._purge(now)
+                self._next_purge = now + 60
+
+    def touch(self, key, ttl):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data[key] = (item[0], time.monotonic() + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def _purge(self, now):
+        expired = [key for key, (_, expires) in self._data.items() if expires < now]
+        for key in expired:
+            del self._data[key]
+
+
+class RedisBackend:
+    """Shared backend; values are stored as JSON."""
+
+    def __init__(self, url, prefix="ehr:"):
+        import redis  # type: ignore
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._redis.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._redis.set(self._prefix + key, json.dumps(value), ex=int(ttl))
+
+    def touch(self, key, ttl):
+        self._redis.expire(self._prefix + key, int(ttl))
+
+    def delete(self, key):
+        self._redis.delete(self._prefix + key)
+
+    def delete_prefix(self, prefix):
+        # SCAN, not KEYS: only used on rare events such as logout
+        keys = list(self._redis.scan_iter(match=self._prefix + prefix + "*", count=500))
+        if keys:
+            self._redis.delete(*keys)
+
+
+def make_backend(url):
+    """'cookie' (no backend, returns None), 'memory' or a redis:// URL."""
+    if url == "cookie":
+        return None
+    if url == "memory":
+        return MemoryBackend()
+    return RedisBackend(url)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class CookieSessionInterface(SecureCookieSessionInterface):
+    """Flask's signed cookie sessions, with the `regenerate` of ServerSessionInterface."""
+
+    def regenerate(self, session):
+        # The cookie is the whole session: starting from empty data is enough
+        session.clear()
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface keeping session data in `backend`."""
+
+    salt = "ehr-session"
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _ttl(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("utf-8")
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.backend.get("session:" + sid)
+                if data is not None:
+                    return ServerSession(data, sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def regenerate(self, session):
+        """New session id for the same data (call on login)."""
+        self.backend.delete("session:" + session.sid)
+        session.sid = secrets.token_urlsafe(32)
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        key = "session:" + session.sid
+
+        if not session:
+            if session.modified:
+                self.backend.delete(key)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.backend.set(key, dict(session), self._ttl(app))
+        elif self.should_set_cookie(app, session):
+            self.backend.touch(key, self._ttl(app))
+
+        if session.modified or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid.encode("utf-8")).decode("utf-8"),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def make_session_interface(backend):
+    """Server-side sessions in `backend`, or signed cookies without one."""
+    if backend is None:
+        return CookieSessionInterface()
+    return ServerSessionInterface(backend)
+
+
+class DoctorContextCache:
+    """Per-doctor cache of ownership checks that already hit the database.
+
+    One backend key per verified entry, each with its own TTL:
+    "doctor:<id>:p:<patient_id>" (value: patient id) and
+    "doctor:<id>:v:<visit_id>" (value: the visit's patient id), so a check
+    is a single small read. With no backend nothing is cached.
+    """
+
+    def __init__(self, backend, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+
+    def lookup(self, doctor_id, key):
+        """Cached value for `key`, or None if it was not verified recently."""
+        if self.backend is None:
+            return None
+        return self.backend.get(f"doctor:{doctor_id}:{key}")
+
+    def remember(self, doctor_id, key, patient_id):
+        if self.backend is not None:
+            self.backend.set(f"doctor:{doctor_id}:{key}", patient_id, self.ttl)
+
+    def forget_patient(self, doctor_id, patient_id):
+        """Drop the patient; its visit entries are only trusted with it."""
+        if self.backend is not None:
+            self.backend.delete(f"doctor:{doctor_id}:p:{patient_id}")
+
+    def clear(self, doctor_id):
+        if self.backend is not None:
+            self.backend.delete_prefix(f"doctor:{doctor_id}:")
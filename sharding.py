@@ -0,0 +1,132 @@
+"""
+Doctor-scoped sharding
+Every patient row (and everything hanging off it) lives on the shard of the
+doctor that owns it. The shard map itself is stored in the directory
+database next to the `doctors` table.
+"""
+import threading
+import time
+
+from db_router import ReplicaRouter
+
+# Tables that hold a doctor's data, in foreign key order
+SHARDED_TABLES = [
+    "patients",
+    "visits",
+    "digestive_visit",
+    "sheet_entries",
+    "documents",
+    "ehr_data",
+    "search_documents",
+    "change_log",
+]
+# Tables scoped by doctor_id directly rather than through patient_id
+DOCTOR_SCOPED_TABLES = ("patients", "change_log")
+
+
+class ShardMoving(Exception):
+    """Raised when a doctor's data is being moved and writes must wait."""
+
+
+class ShardMap:
+    """Resolves doctor ids to shard routers.
+
+    Lookups are cached for `cache_seconds` per worker; rebalance_shard.py
+    waits at least that long between state changes so every worker sees them.
+    Doctors without a row in `doctor_shards` live on `default_shard`.
+    """
+
+    def __init__(self, directory, shards, default_shard, id_stride,
+                 cache_seconds=5, **router_options):
+        self.directory = directory
+        self.default_shard = default_shard
+        self.cache_seconds = cache_seconds
+        self.routers = {}
+        for name, shard in shards.items():
+            # Interleaved AUTO_INCREMENT values keep ids unique across
+            # shards, so rows can be moved without renumbering
+            init = (
+                f"SET SESSION auto_increment_increment = {id_stride}, "
+                f"auto_increment_offset = {shard['id_offset']}",
+            )
+            self.routers[name] = ReplicaRouter(
+                shard["primary"],
+                shard.get("replicas", []),
+                name=name,
+                init_statements=init,
+                **router_options,
+            )
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, doctor_id):
+        """Return (shard_name, state) for a doctor."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(doctor_id)
+        if cached and now - cached[2] < self.cache_seconds:
+            return cached[0], cached[1]
+
+        conn = self.directory.primary()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT shard, state FROM doctor_shards WHERE doctor_id = %s",
+                (doctor_id,),
+            )
+            row = cur.fetchone()
+        finally:
+            cur.close()
+            conn.close()
+
+        shard, state = row if row else (self.default_shard, "active")
+        with self._lock:
+            self._cache[doctor_id] = (shard, state, now)
+        return shard, state
+
+    def router_for(self, doctor_id, write=True):
+        shard, state = self.lookup(doctor_id)
+        if write and state == "moving":
+            raise ShardMoving(doctor_id)
+        return self.routers[shard]
+
+    def assign(self, cur, doctor_id):
+        """Place a new doctor on the shard with the fewest doctors.
+
+        Runs on the caller's directory cursor so it commits with the
+        doctor's INSERT.
+        """
+        cur.execute("SELECT shard, COUNT(*) FROM doctor_shards GROUP BY shard")
+        counts = {name: 0 for name in self.routers}
+        for shard, count in cur.fetchall():
+            if shard in counts:
+                counts[shard] = count
+        shard = min(counts, key=lambda name: (counts[name], name))
+        cur.execute(
+            "INSERT INTO doctor_shards (doctor_id, shard, state) VALUES (%s, %s, 'active')",
+            (doctor_id, shard),
+        )
+        return shard
+
+    def mirror_doctor(self, shard, doctor):
+        """Copy a `doctors` row to a shard so its foreign keys resolve there."""
+        conn = self.routers[shard].primary()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO doctors (id, doctor_number, name, email, password_hash)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = id
+                """,
+                (doctor["id"], doctor["doctor_number"], doctor["name"],
+                 doctor["email"], doctor["password_hash"]),
+            )
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
+    def invalidate(self, doctor_id):
+        with self._lock:
+            self._cache.pop(doctor_id, None)
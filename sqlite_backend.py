@@ -0,0 +1,684 @@
+"""
+Embedded SQLite backend
+For single-clinic installs and test runs: with DB_BACKEND = "sqlite" every
+connection the app, worker and tools ask for goes to a local SQLite file
+instead of a MySQL server, one file per database name in SQLITE_FOLDER.
+
+Usage:
+    python sqlite_backend.py init    # create the files and the schema
+
+`connect` hands out a connection shaped like mysql.connector's (dictionary
+and prepared cursors, column_names, lastrowid, is_connected, ...) so the
+handlers run unchanged:
+- every connect() gets its own SQLite connection (in WAL mode) and so its
+  own transaction, like a MySQL session; close() rolls back whatever was
+  left uncommitted and keeps the connection for the thread's next
+  connect(). As on MySQL, a handle that writes while another one holds
+  uncommitted writes waits for the lock and then fails with errno 1205,
+  only here the lock covers the whole file;
+- statements are translated once each (%s placeholders, ON DUPLICATE KEY
+  UPDATE, NOW(3), +/- INTERVAL, FOR UPDATE, MATCH ... AGAINST) and reuse
+  sqlite3's statement cache;
+- DATE/DATETIME/TIMESTAMP columns come back as date and datetime objects,
+  and so do aliased MIN()/MAX() of such columns (MySQL keeps the type,
+  SQLite does not);
+- sqlite3 errors are re-raised as the matching mysql.connector errors with
+  MySQL errnos (1062 for duplicate keys), so `except mysql.connector.Error`
+  keeps working.
+
+MySQL-only operations (replicas, partition_db.py, rebalance_shard.py,
+migrate_db.py) do not apply. Full-text search scans the doctor's rows
+instead of using an index, which is fine at a single clinic's size.
+"""
+import calendar
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+import mysql.connector
+from config import SQLITE_FOLDER, DB_CONFIG, SHARDS
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    # Durable at checkpoints; a power cut loses at most the last commits
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536",  # 64 MB
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+STATEMENT_CACHE_SIZE = 512
+# Closed connections each thread keeps per file for its next connect()
+IDLE_CONNECTIONS = 4
+
+ER_DUP_ENTRY = 1062
+ER_BAD_NULL_ERROR = 1048
+ER_NO_REFERENCED_ROW = 1452
+ER_LOCK_WAIT_TIMEOUT = 1205
+
+NOW_SQL = "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))"
+
+
+def _updated_at_trigger(table):
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_updated_at AFTER UPDATE ON {table}
+    FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+    BEGIN
+      UPDATE {table} SET updated_at = {NOW_SQL} WHERE id = NEW.id;
+    END
+    """
+
+
+# The schema of db_setup.sql and migrate_db.py in SQLite terms. Every
+# database gets every table, as with MySQL shards.
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS doctors (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      doctor_number VARCHAR(50) NOT NULL UNIQUE,
+      name VARCHAR(100) NOT NULL,
+      email VARCHAR(120) NOT NULL UNIQUE,
+      password_hash VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS patients (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      doctor_id INT NOT NULL REFERENCES doctors(id),
+      first_name VARCHAR(50),
+      last_name VARCHAR(50),
+      birth_date DATE,
+      insurance_number VARCHAR(50) UNIQUE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_insurance_dob ON patients (insurance_number, birth_date)",
+    "CREATE INDEX IF NOT EXISTS idx_patients_doctor ON patients (doctor_id)",
+    """
+    CREATE TABLE IF NOT EXISTS visits (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      patient_id INT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+      visit_date DATE NOT NULL,
+      visit_type VARCHAR(50) DEFAULT 'general',
+      chief_complaint TEXT,
+      notes TEXT,
+      created_at TIMESTAMP DEFAULT {now},
+      updated_at TIMESTAMP DEFAULT {now}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_patient_visit_date ON visits (patient_id, visit_date)",
+    _updated_at_trigger("visits"),
+    """
+    CREATE TABLE IF NOT EXISTS digestive_visit (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      patient_id INT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+      visit_date DATE,
+      digestive_inspection VARCHAR(255),
+      digestive_auscultation VARCHAR(255),
+      digestive_palpation VARCHAR(255),
+      liver VARCHAR(255),
+      rectal VARCHAR(255),
+      smoker TINYINT DEFAULT 0,
+      insurance_type VARCHAR(20),
+      notes TEXT,
+      image_path VARCHAR(255)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_digestive_patient ON digestive_visit (patient_id)",
+    """
+    CREATE TABLE IF NOT EXISTS sheet_entries (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      patient_id INT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+      visit_id INT REFERENCES visits(id) ON DELETE SET NULL,
+      sheet_type VARCHAR(50) NOT NULL,
+      data_json TEXT,
+      doctor_id INT NOT NULL,
+      created_at TIMESTAMP DEFAULT {now},
+      updated_at TIMESTAMP DEFAULT {now}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sheet_latest ON sheet_entries (patient_id, sheet_type, created_at)",
+    _updated_at_trigger("sheet_entries"),
+    """
+    CREATE TABLE IF NOT EXISTS documents (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      visit_id INT NOT NULL REFERENCES visits(id) ON DELETE CASCADE,
+      patient_id INT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+      file_name VARCHAR(255) NOT NULL,
+      file_path VARCHAR(500) NOT NULL,
+      file_type VARCHAR(50),
+      file_size INT,
+      description TEXT,
+      uploaded_at TIMESTAMP DEFAULT {now}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_visit_documents ON documents (visit_id)",
+    "CREATE INDEX IF NOT EXISTS idx_patient_documents ON documents (patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_document_path ON documents (file_path)",
+    """
+    CREATE TABLE IF NOT EXISTS ehr_data (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      visit_id INT NOT NULL REFERENCES visits(id) ON DELETE CASCADE,
+      patient_id INT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+      first_name VARCHAR(50),
+      last_name VARCHAR(50),
+      birth_date DATE,
+      gender VARCHAR(20),
+      phone VARCHAR(20),
+      email VARCHAR(120),
+      address TEXT,
+      emergency_contact_name VARCHAR(100),
+      emergency_contact_phone VARCHAR(20),
+      blood_pressure_systolic INT,
+      blood_pressure_diastolic INT,
+      temperature DECIMAL(4,2),
+      heart_rate INT,
+      weight DECIMAL(5,2),
+      height DECIMAL(5,2),
+      oxygen_saturation INT,
+      past_illnesses TEXT,
+      surgeries TEXT,
+      family_history TEXT,
+      chronic_conditions TEXT,
+      current_medications TEXT,
+      allergies TEXT,
+      has_allergies TINYINT DEFAULT 0,
+      immunizations TEXT,
+      lab_tests TEXT,
+      lab_results TEXT,
+      diagnosis TEXT,
+      treatment_plan TEXT,
+      follow_up_date DATE,
+      smoker TINYINT DEFAULT 0,
+      insurance_type VARCHAR(20),
+      notes TEXT,
+      created_at TIMESTAMP DEFAULT {now},
+      updated_at TIMESTAMP DEFAULT {now}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_visit_ehr ON ehr_data (visit_id)",
+    """
+    CREATE INDEX IF NOT EXISTS idx_patient_vitals ON ehr_data (
+      patient_id, created_at,
+      blood_pressure_systolic, blood_pressure_diastolic, temperature,
+      heart_rate, weight, oxygen_saturation
+    )
+    """,
+    _updated_at_trigger("ehr_data"),
+    """
+    CREATE TABLE IF NOT EXISTS doctor_shards (
+      doctor_id INTEGER PRIMARY KEY REFERENCES doctors(id) ON DELETE CASCADE,
+      shard VARCHAR(50) NOT NULL,
+      state VARCHAR(20) NOT NULL DEFAULT 'active',
+      updated_at TIMESTAMP DEFAULT {now}
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS audit_log (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      created_at DATETIME NOT NULL,
+      doctor_id INT NOT NULL,
+      action VARCHAR(20) NOT NULL,
+      entity VARCHAR(20) NOT NULL,
+      entity_id INT,
+      patient_id INT,
+      ip VARCHAR(45)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_audit_patient ON audit_log (patient_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_doctor ON audit_log (doctor_id, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS change_log (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      doctor_id INT NOT NULL,
+      patient_id INT NOT NULL,
+      entity VARCHAR(20) NOT NULL,
+      entity_id INT,
+      action VARCHAR(20) NOT NULL,
+      created_at TIMESTAMP DEFAULT {now}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_doctor_change ON change_log (doctor_id, id)",
+    """
+    CREATE TABLE IF NOT EXISTS daily_stats (
+      doctor_id INT NOT NULL,
+      day DATE NOT NULL,
+      metric VARCHAR(20) NOT NULL,
+      dimension VARCHAR(100) NOT NULL DEFAULT '',
+      value BIGINT NOT NULL DEFAULT 0,
+      PRIMARY KEY (doctor_id, day, metric, dimension)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_stats_day ON daily_stats (day)",
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      kind VARCHAR(50) NOT NULL,
+      payload TEXT NOT NULL,
+      priority INT NOT NULL DEFAULT 0,
+      state VARCHAR(20) NOT NULL DEFAULT 'queued',
+      run_at DATETIME NOT NULL DEFAULT {now},
+      attempts INT NOT NULL DEFAULT 0,
+      max_attempts INT NOT NULL DEFAULT 5,
+      last_error TEXT,
+      locked_by VARCHAR(100),
+      locked_at DATETIME,
+      recurring_key VARCHAR(50) UNIQUE,
+      repeat_seconds INT,
+      created_at TIMESTAMP DEFAULT {now},
+      finished_at DATETIME
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (state, priority, run_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (state, finished_at)",
+    """
+    CREATE TABLE IF NOT EXISTS search_documents (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      doctor_id INT NOT NULL,
+      patient_id INT NOT NULL,
+      visit_id INT,
+      source VARCHAR(20) NOT NULL,
+      source_id INT NOT NULL,
+      label VARCHAR(100),
+      body TEXT NOT NULL,
+      updated_at TIMESTAMP DEFAULT {now},
+      UNIQUE (source, source_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_search_doctor ON search_documents (doctor_id)",
+    "CREATE INDEX IF NOT EXISTS idx_search_patient ON search_documents (patient_id)",
+    _updated_at_trigger("search_documents"),
+]
+
+
+# ---------- types ----------
+
+def _convert_date(value):
+    try:
+        return date.fromisoformat(value[:10].decode())
+    except ValueError:
+        return value.decode()
+
+
+def _convert_datetime(value):
+    try:
+        return datetime.fromisoformat(value.decode())
+    except ValueError:
+        return value.decode()
+
+
+# Declared type of every date column in the schema, by column name
+DATE_COLUMNS = {
+    name: kind.upper()
+    for statement in SCHEMA
+    for name, kind in re.findall(r"^\s*(\w+)\s+(DATE|DATETIME|TIMESTAMP)\b", statement,
+                                 re.IGNORECASE | re.MULTILINE)
+}
+
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+sqlite3.register_converter("TIMESTAMP", _convert_datetime)
+sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()))
+
+
+# ---------- MySQL functions ----------
+
+def _now(precision=0):
+    now = datetime.now()
+    return now.isoformat(" ", timespec="milliseconds" if precision else "seconds")
+
+
+def _curdate():
+    return date.today().isoformat()
+
+
+def _parse(value):
+    if isinstance(value, (date, datetime)):
+        return value
+    value = str(value)
+    return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    year = value.year + month // 12
+    month = month % 12 + 1
+    return value.replace(year=year, month=month,
+                         day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def _date_add(value, amount, unit):
+    """`value + INTERVAL amount unit`, in MySQL's text formats."""
+    if value is None or amount is None:
+        return None
+    text = str(value)
+    value = _parse(value)
+    amount = int(amount)
+    if unit == "MONTH":
+        value = _add_months(value, amount)
+    elif unit == "YEAR":
+        value = _add_months(value, 12 * amount)
+    else:
+        seconds = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400, "WEEK": 604800}[unit]
+        if not isinstance(value, datetime) and seconds % 86400:
+            value = datetime.combine(value, datetime.min.time())
+        value = value + timedelta(seconds=amount * seconds)
+    if not isinstance(value, datetime):
+        return value.isoformat()
+    return value.isoformat(" ", timespec="milliseconds" if "." in text else "seconds")
+
+
+def _weekday(value):
+    return None if value is None else _parse(value).weekday()
+
+
+def _left(value, length):
+    return None if value is None else str(value)[:length]
+
+
+def _ft_match(body, query):
+    """MATCH(body) AGAINST (query IN BOOLEAN MODE) for the "+word*" queries
+    search.py builds: the number of matching words, 0 unless all are there."""
+    if not body:
+        return 0
+    words = re.findall(r"\w+", body.lower())
+    score = 0
+    for term in query.split():
+        required = term.startswith("+")
+        prefix = term.endswith("*")
+        term = term.strip("+*").lower()
+        hits = sum(1 for w in words if (w.startswith(term) if prefix else w == term))
+        if required and not hits:
+            return 0
+        score += hits
+    return score
+
+
+FUNCTIONS = {
+    "NOW": (-1, _now),
+    "CURDATE": (0, _curdate),
+    "DATE_ADD_INTERVAL": (3, _date_add),
+    "WEEKDAY": (1, _weekday),
+    "LEFT_CHARS": (2, _left),
+    "FT_MATCH": (2, _ft_match),
+}
+
+
+# ---------- statement translation ----------
+
+_INTERVAL = re.compile(
+    r"(?P<operand>\w+\([\w.]*\)|[\w.]+)\s*(?P<sign>[+-])\s*INTERVAL\s+"
+    r"(?P<amount>\w+\([\w.]*\)|%s|[\w.]+)\s+"
+    r"(?P<unit>SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)\b",
+    re.IGNORECASE,
+)
+_MATCH = re.compile(r"MATCH\s*\(([\w.]+)\)\s*AGAINST\s*\(\s*(%s)\s+IN\s+BOOLEAN\s+MODE\s*\)", re.IGNORECASE)
+_UPSERT = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.IGNORECASE)
+_VALUES_REF = re.compile(r"VALUES\((\w+)\)", re.IGNORECASE)
+_LOCKING = re.compile(r"\s+FOR\s+UPDATE(\s+SKIP\s+LOCKED|\s+NOWAIT)?", re.IGNORECASE)
+_UNION_PART = re.compile(r"(^|UNION\s+ALL)\s*\(\s*SELECT\b", re.IGNORECASE)
+# MAX(updated_at) AS updated, also as (SELECT MAX(updated_at) FROM ...) AS updated
+_DATE_AGGREGATE = re.compile(
+    r"\b((?:MIN|MAX)\(\s*(?:\w+\.)?(\w+)\s*\)[^,()]*\)?\s*AS\s+)(\w+)\b", re.IGNORECASE)
+
+
+def _typed_alias(m):
+    kind = DATE_COLUMNS.get(m[2])
+    # "alias [TYPE]": sqlite3 converts the value and reports the name as alias
+    return f'{m[1]}"{m[3]} [{kind}]"' if kind else m[0]
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def translate(operation):
+    """(sqlite statement, whether it locks rows) for a MySQL statement, or
+    (None, False) for statements with nothing to do here (SET SESSION ...)."""
+    sql = operation.strip()
+    if re.match(r"SET\s", sql, re.IGNORECASE):
+        return None, False
+    sql = _INTERVAL.sub(
+        lambda m: (f"DATE_ADD_INTERVAL({m['operand']}, {m['sign']}({m['amount']}), "
+                   f"'{m['unit'].upper()}')"),
+        sql,
+    )
+    sql = _MATCH.sub(r"FT_MATCH(\1, \2)", sql)
+    sql = re.sub(r"\bCURRENT_DATE\b(?!\()", "CURDATE()", sql, flags=re.IGNORECASE)
+    # LEFT is a keyword (LEFT JOIN) in SQLite, not a function
+    sql = re.sub(r"\bLEFT\s*\(", "LEFT_CHARS(", sql, flags=re.IGNORECASE)
+    sql = _DATE_AGGREGATE.sub(_typed_alias, sql)
+    parts = _UPSERT.split(sql, maxsplit=1)
+    if len(parts) == 2:
+        sql = parts[0] + "ON CONFLICT DO UPDATE SET" + _VALUES_REF.sub(r"excluded.\1", parts[1])
+    locking = bool(_LOCKING.search(sql))
+    sql = _LOCKING.sub("", sql)
+    # (SELECT ... LIMIT 1) UNION ALL (SELECT ...): SQLite wants subqueries
+    if sql.startswith("("):
+        sql = _UNION_PART.sub(lambda m: f"{m[1]} SELECT * FROM (SELECT", sql)
+    return sql.replace("%%", "\0").replace("%s", "?").replace("\0", "%"), locking
+
+
+# ---------- errors ----------
+
+def _error(e):
+    """The mysql.connector exception MySQL would have raised for `e`."""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if "UNIQUE" in message or "PRIMARY KEY" in message:
+            errno = ER_DUP_ENTRY
+        elif "FOREIGN KEY" in message:
+            errno = ER_NO_REFERENCED_ROW
+        elif "NOT NULL" in message:
+            errno = ER_BAD_NULL_ERROR
+        else:
+            errno = None
+        return mysql.connector.IntegrityError(msg=message, errno=errno)
+    if isinstance(e, sqlite3.OperationalError):
+        errno = ER_LOCK_WAIT_TIMEOUT if "locked" in message else None
+        return mysql.connector.OperationalError(msg=message, errno=errno)
+    if isinstance(e, sqlite3.ProgrammingError):
+        return mysql.connector.ProgrammingError(msg=message)
+    return mysql.connector.DatabaseError(msg=message)
+
+
+# ---------- connections ----------
+
+class _Session:
+    """One SQLite connection to one file, used by one Connection at a time."""
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in PRAGMAS:
+            self.raw.execute(pragma)
+        for name, (arity, function) in FUNCTIONS.items():
+            self.raw.create_function(name, arity, function)
+
+
+_local = threading.local()
+
+
+class Cursor:
+    """mysql.connector-style cursor over a handle's SQLite connection.
+
+    Holds the session rather than the Connection handle, so cursors cached
+    per handle (repository.py) never keep the handle alive.
+    """
+
+    def __init__(self, session, dictionary=False):
+        self._session = session
+        self._dictionary = dictionary
+        self._cursor = session.raw.cursor()
+        self._empty = False
+
+    def execute(self, operation, params=()):
+        sql, locking = translate(operation)
+        self._empty = sql is None
+        if sql is None:
+            return
+        try:
+            if locking and not self._session.raw.in_transaction:
+                # Take the write lock up front, like SELECT ... FOR UPDATE
+                self._session.raw.execute("BEGIN IMMEDIATE")
+            self._cursor.execute(sql, tuple(params or ()))
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def executemany(self, operation, seq_params):
+        sql, _ = translate(operation)
+        if sql is None:
+            return
+        try:
+            self._cursor.executemany(sql, [tuple(params) for params in seq_params])
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    @property
+    def column_names(self):
+        description = self._cursor.description
+        return tuple(column[0] for column in description) if description else ()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def with_rows(self):
+        return not self._empty and self._cursor.description is not None
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _rows(self, rows):
+        if not self._dictionary:
+            return rows
+        names = self.column_names
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchone(self):
+        if not self.with_rows:
+            return None
+        row = self._cursor.fetchone()
+        return None if row is None else self._rows([row])[0]
+
+    def fetchmany(self, size=1):
+        return self._rows(self._cursor.fetchmany(size)) if self.with_rows else []
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall()) if self.with_rows else []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    """A handle on its own SQLite connection to one database file."""
+
+    def __init__(self, session, idle):
+        self._session = session
+        self._idle = idle
+        self._closed = False
+
+    def cursor(self, dictionary=False, prepared=False, buffered=None, **_):
+        # Prepared or not, sqlite3 reuses compiled statements from its cache
+        return Cursor(self._session, dictionary)
+
+    def commit(self):
+        try:
+            self._session.raw.commit()
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def rollback(self):
+        self._session.raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._session.raw.in_transaction
+
+    @property
+    def connection_id(self):
+        return id(self._session)
+
+    def is_connected(self):
+        return not self._closed
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        return None
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        raw = self._session.raw
+        if raw.in_transaction:
+            raw.rollback()
+        if len(self._idle) < IDLE_CONNECTIONS:
+            self._idle.append(self._session)
+        else:
+            raw.close()
+
+
+def database_path(database):
+    return os.path.join(SQLITE_FOLDER, f"{database}.sqlite3")
+
+
+def connect(database="ehr_db", **_):
+    """Drop-in for mysql.connector.connect; host, user and password are ignored."""
+    path = database_path(database)
+    idle_by_path = getattr(_local, "idle", None)
+    if idle_by_path is None:
+        idle_by_path = _local.idle = {}
+    idle = idle_by_path.setdefault(path, [])
+    if idle:
+        session = idle.pop()
+    else:
+        try:
+            session = _Session(path)
+        except sqlite3.Error as e:
+            raise _error(e) from e
+    return Connection(session, idle)
+
+
+def init_schema(database):
+    os.makedirs(SQLITE_FOLDER, exist_ok=True)
+    conn = connect(database)
+    raw = conn._session.raw
+    try:
+        for statement in SCHEMA:
+            raw.execute(statement.format(now=NOW_SQL) if "{now}" in statement else statement)
+        raw.commit()
+    finally:
+        conn.close()
+
+
+def init_all():
+    databases = {DB_CONFIG["database"]} | {shard["primary"]["database"] for shard in SHARDS.values()}
+    for database in sorted(databases):
+        init_schema(database)
+        print(f"[OK] {database_path(database)} ready")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["init"]:
+        print(__doc__)
+    else:
+        init_all()
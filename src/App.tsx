@@ -42,6 +42,18 @@ interface Digestive {
 const SHEET_ORDER = ["digestive", "neurologic", "vascular", "cardiac", "respiratory", "abdomen"] as const;
 type SheetType = typeof SHEET_ORDER[number];
 
+const EMPTY_DIGESTIVE: Digestive = {
+  visit_date: "",
+  digestive_inspection: "",
+  digestive_auscultation: "",
+  digestive_palpation: "",
+  liver: "",
+  rectal: "",
+  smoker: 0,
+  insurance_type: "public",
+  notes: "",
+};
+
 function App() {
   const [isLoggedIn, setIsLoggedIn] = useState(false);
   const [patient, setPatient] = useState<Patient | null>(null);
@@ -53,17 +65,7 @@ function App() {
   const [showDocManager, setShowDocManager] = useState(false);
   const [searchKey, setSearchKey] = useState(0); // Force PatientSearch to reset
   
-  const [digestive, setDigestive] = useState<Digestive>({
-    visit_date: "",
-    digestive_inspection: "",
-    digestive_auscultation: "",
-    digestive_palpation: "",
-    liver: "",
-    rectal: "",
-    smoker: 0,
-    insurance_type: "public",
-    notes: "",
-  });
+  const [digestive, setDigestive] = useState<Digestive>(EMPTY_DIGESTIVE);
 
   useEffect(() => {
     fetch(`${API_BASE}/check-auth`, {
@@ -128,9 +130,10 @@ function App() {
 
   const loadPatientVisits = async (patientId: number) => {
     try {
-      const response = await fetch(`${API_BASE}/patients/${patientId}`, {
-        credentials: "include",
-      });
+      const response = await fetch(
+        `${API_BASE}/patients/${patientId}/dashboard?fields=visits`,
+        { credentials: "include" }
+      );
       const data = await response.json();
       if (data.visits) {
         setVisits(data.visits);
@@ -140,6 +143,36 @@ function App() {
     }
   };
 
+  // The digestive form is loaded once per selected patient; refreshing the
+  // visit list must not overwrite edits that are not saved yet
+  useEffect(() => {
+    if (!patient) return;
+    setDigestive(EMPTY_DIGESTIVE);
+    fetch(`${API_BASE}/patients/${patient.id}/dashboard?fields=digestive`, {
+      credentials: "include",
+    })
+      .then((res) => res.json())
+      .then((data) => {
+        // No stored form: keep it empty so the placeholders show
+        if (data.digestive) {
+          setDigestive(data.digestive);
+        }
+      })
+      .catch((err) => console.error("Error loading digestive form:", err));
+  }, [patient?.id]);
+
+  // Live updates: reload the visit list when someone else changes this patient
+  useEffect(() => {
+    if (!patient) return;
+    const events = new EventSource(`${API_BASE}/patients/${patient.id}/events`, {
+      withCredentials: true,
+    });
+    const reload = () => loadPatientVisits(patient.id);
+    events.addEventListener("change", reload);
+    events.addEventListener("resync", reload);
+    return () => events.close();
+  }, [patient?.id]);
+
   const calculateAge = (birthDate: string): number => {
     const today = new Date();
     const birth = new Date(birthDate);
@@ -63,21 +63,23 @@ export default function SheetForm({ patientId, visitId, sheetType, onSave, onBac
   const [selectedHistoryId, setSelectedHistoryId] = useState<number | null>(null);
 
   useEffect(() => {
-    loadLatestSheet();
-    loadHistory();
+    loadSheet();
   }, [patientId, sheetType]);
 
-  const loadLatestSheet = async () => {
+  // Latest entry and history in one dashboard request
+  const loadSheet = async () => {
     setLoading(true);
     try {
       const response = await fetch(
-        `${API_BASE}/sheets/${sheetType}/${patientId}/latest?visit_id=${visitId}`,
+        `${API_BASE}/patients/${patientId}/dashboard?fields=sheets,history&sheet_types=${sheetType}`,
         { credentials: "include" }
       );
       if (response.ok) {
         const result = await response.json();
-        setData(result.data || {});
-        setSelectedHistoryId(result.id);
+        const latest = result.sheets?.[sheetType] || {};
+        setData(latest.data || {});
+        setSelectedHistoryId(latest.id ?? null);
+        setHistory(result.history?.[sheetType] || []);
       }
     } catch (err) {
       console.error("Error loading sheet:", err);
@@ -88,12 +90,13 @@ export default function SheetForm({ patientId, visitId, sheetType, onSave, onBac
 
   const loadHistory = async () => {
     try {
-      const response = await fetch(`${API_BASE}/sheets/${sheetType}/${patientId}/history`, {
-        credentials: "include",
-      });
+      const response = await fetch(
+        `${API_BASE}/patients/${patientId}/dashboard?fields=history&sheet_types=${sheetType}`,
+        { credentials: "include" }
+      );
       if (response.ok) {
         const result = await response.json();
-        setHistory(result.history || []);
+        setHistory(result.history?.[sheetType] || []);
       }
     } catch (err) {
       console.error("Error loading history:", err);
@@ -0,0 +1,57 @@
+"""
+Job handlers run by worker.py
+Each handler takes the shard the job was queued on and the job's payload.
+They run in worker child processes, so they open their own connections.
+"""
+import os
+from datetime import date, timedelta
+
+from config import SHARDS, UPLOAD_FOLDER
+
+import analytics
+import db_backend
+import jobs
+
+
+def _connect(shard):
+    return db_backend.connect(**SHARDS[shard]["primary"])
+
+
+def delete_files(shard, payload):
+    """Remove uploaded files whose documents rows are gone."""
+    root = os.path.realpath(UPLOAD_FOLDER)
+    for path in payload["paths"]:
+        real = os.path.realpath(path)
+        if os.path.dirname(real) != root:
+            continue  # only ever touch files directly in the upload folder
+        try:
+            os.remove(real)
+        except FileNotFoundError:
+            pass
+
+
+def rebuild_analytics(shard, payload):
+    conn = _connect(shard)
+    try:
+        analytics.rebuild(conn, date.today() - timedelta(days=payload["days"]))
+    finally:
+        conn.close()
+
+
+def prune_jobs(shard, payload):
+    conn = _connect(shard)
+    try:
+        jobs.prune(conn, payload["days"])
+    finally:
+        conn.close()
+
+
+TASKS = {
+    "delete_files": delete_files,
+    "rebuild_analytics": rebuild_analytics,
+    "prune_jobs": prune_jobs,
+}
+
+
+def run(kind, shard, payload):
+    TASKS[kind](shard, payload)
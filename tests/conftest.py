@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite_backend  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """A fresh SQLite database with the full schema; returns a connect()."""
+    monkeypatch.setattr(sqlite_backend, "SQLITE_FOLDER", str(tmp_path))
+    sqlite_backend.init_schema("ehr_db")
+    return lambda: sqlite_backend.connect("ehr_db")
+
+
+@pytest.fixture
+def client(sqlite_db, monkeypatch):
+    """Flask test client of app.py running on the SQLite backend.
+
+    app.py builds its routers when first imported, so DB_BACKEND has to be
+    "sqlite" by then; later tests reuse the module with a fresh database.
+    """
+    import config
+    import db_backend
+    monkeypatch.setattr(config, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(db_backend, "DB_BACKEND", "sqlite")
+    sqlite_backend.init_all()
+    import app
+    from rate_limit import MemoryRateBackend
+    app.app.config["TESTING"] = True
+    # Tests log in and out freely: no token buckets
+    monkeypatch.setattr(app.rate_limiter, "backend", MemoryRateBackend())
+    monkeypatch.setattr(app.rate_limiter, "rates", {})
+    return app.app.test_client()
+
+
+@pytest.fixture
+def doctor(client):
+    """`client` logged in as a newly registered doctor."""
+    account = {"name": "Dr Test", "email": "test@example.com",
+               "doctor_number": "T-1", "password": "correct horse"}
+    assert client.post("/api/register", json=account).status_code == 201
+    response = client.post("/api/login", json={"doctor_number": "T-1", "password": "correct horse"})
+    assert response.status_code == 200
+    return client
+
+
+@pytest.fixture
+def patient_id(doctor):
+    response = doctor.post("/api/patients", json={
+        "first_name": "Ada", "last_name": "Lovelace",
+        "birth_date": "1815-12-10", "insurance_number": "INS-1",
+    })
+    assert response.status_code == 201
+    return response.get_json()["patient"]["id"]
+
+
+@pytest.fixture
+def switch_doctor(client):
+    """Log `client` in as doctor `number`, registering it first if needed."""
+    def switch(number):
+        client.post("/api/logout")
+        client.post("/api/register", json={
+            "name": f"Dr {number}", "email": f"{number}@example.com",
+            "doctor_number": number, "password": "correct horse"})
+        response = client.post("/api/login", json={"doctor_number": number, "password": "correct horse"})
+        assert response.status_code == 200
+    return switch
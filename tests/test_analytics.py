@@ -0,0 +1,32 @@
+from datetime import date
+
+from config import ANALYTICS_TOP_COMPLAINTS
+
+
+def add_visit(doctor, patient_id, complaint):
+    response = doctor.post(f"/api/patients/{patient_id}/visits", json={
+        "visit_date": date.today().isoformat(), "chief_complaint": complaint})
+    assert response.status_code == 201
+
+
+def test_revalidation_follows_writes(doctor, patient_id):
+    add_visit(doctor, patient_id, "cough")
+    response = doctor.get("/api/analytics")
+    assert response.status_code == 200
+    assert response.get_json()["totals"]["visits"] == 1
+    etag = response.headers["ETag"]
+    assert doctor.get("/api/analytics", headers={"If-None-Match": etag}).status_code == 304
+
+    add_visit(doctor, patient_id, "fever")
+    response = doctor.get("/api/analytics", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["totals"]["visits"] == 2
+
+
+def test_top_is_clamped(doctor, patient_id):
+    for i in range(ANALYTICS_TOP_COMPLAINTS + 2):
+        add_visit(doctor, patient_id, f"complaint {i}")
+    complaints = doctor.get("/api/analytics?top=0").get_json()["top_complaints"]
+    assert len(complaints) == 1
+    complaints = doctor.get("/api/analytics?top=100000").get_json()["top_complaints"]
+    assert len(complaints) == ANALYTICS_TOP_COMPLAINTS
@@ -0,0 +1,74 @@
+import json
+import threading
+
+import audit
+from audit import AuditLog, FileSink
+
+
+class ListSink:
+    def __init__(self, blocked=None, failures=0):
+        self.batches = []
+        self.blocked = blocked
+        self.failures = failures
+        self.entered = threading.Event()
+
+    def write(self, events):
+        self.entered.set()
+        if self.blocked is not None:
+            self.blocked.wait()
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.batches.append(list(events))
+
+
+def test_events_are_written_in_batches():
+    blocked = threading.Event()
+    sink = ListSink(blocked=blocked)
+    log = AuditLog(sink, batch_size=3, flush_interval=0.01)
+    log.record(1, "view", "patient", patient_id=0)
+    assert sink.entered.wait(5)  # the writer is now stuck in write()
+    for patient_id in range(1, 7):
+        log.record(1, "view", "patient", patient_id=patient_id)
+    blocked.set()
+    log.close()
+    assert [len(batch) for batch in sink.batches] == [1, 3, 3]
+    assert log.stats()["written"] == 7 and log.stats()["batches"] == 3
+
+
+def test_full_queue_writes_on_the_caller():
+    blocked = threading.Event()
+    sink = ListSink(blocked=blocked)
+    log = AuditLog(sink, max_queue=1, flush_interval=0.01, enqueue_timeout=0)
+    log.record(1, "view", "patient")
+    assert sink.entered.wait(5)
+    log.record(1, "view", "patient")  # fills the queue
+    caller = threading.Thread(target=log.record, args=(1, "view", "patient"))
+    caller.start()
+    caller.join(0.05)
+    assert caller.is_alive()  # writing its own event
+    blocked.set()
+    caller.join()
+    log.close()
+    assert log.stats()["sync_writes"] == 1
+    assert sum(len(batch) for batch in sink.batches) == 3
+
+
+def test_failed_batches_are_retried(monkeypatch):
+    monkeypatch.setattr(audit.time, "sleep", lambda seconds: None)
+    sink = ListSink(failures=2)
+    log = AuditLog(sink, flush_interval=0.01)
+    log.record(1, "view", "patient")
+    log.close()
+    assert len(sink.batches) == 1
+    assert log.stats()["failed"] == 0
+
+
+def test_file_sink_appends_json_lines(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    sink = FileSink(str(path))
+    sink.write([("2024-05-01 10:00:00", 1, "view", "patient", 3, 3, "127.0.0.1")])
+    sink.write([("2024-05-01 10:00:01", 1, "update", "patient", 3, 3, "127.0.0.1")])
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["action"] for line in lines] == ["view", "update"]
+    assert lines[0]["patient_id"] == 3
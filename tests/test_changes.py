@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from changes import SETTLE_SECONDS, fetch_changes, record_change
+
+
+def backdate(conn, change_id, seconds):
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE change_log SET created_at = %s WHERE id = %s",
+        (datetime.now() - timedelta(seconds=seconds), change_id),
+    )
+    conn.commit()
+    cur.close()
+
+
+def test_fresh_changes_are_held_back(sqlite_db):
+    conn = sqlite_db()
+    cur = conn.cursor(dictionary=True)
+    record_change(cur, 1, 10, "visit", 5, "create")
+    conn.commit()
+
+    changes, has_more = fetch_changes(cur, 1, 0, 10)
+    assert changes == [] and not has_more
+
+
+def test_settled_changes_come_in_id_order(sqlite_db):
+    conn = sqlite_db()
+    cur = conn.cursor(dictionary=True)
+    first = record_change(cur, 1, 10, "visit", 5, "create")
+    second = record_change(cur, 1, 10, "sheet", 6, "create")
+    other_doctor = record_change(cur, 2, 11, "visit", 7, "create")
+    conn.commit()
+    for change in (first, second, other_doctor):
+        backdate(conn, change["id"], SETTLE_SECONDS + 1)
+
+    changes, has_more = fetch_changes(cur, 1, 0, 10)
+    assert [c["id"] for c in changes] == [first["id"], second["id"]]
+    assert not has_more
+
+    changes, has_more = fetch_changes(cur, 1, 0, 1)
+    assert [c["id"] for c in changes] == [first["id"]] and has_more
+
+    changes, has_more = fetch_changes(cur, 1, first["id"], 10)
+    assert [c["id"] for c in changes] == [second["id"]]
+
+
+def test_cursor_stops_before_an_unsettled_change(sqlite_db):
+    # A change committed within SETTLE_SECONDS stays invisible, and so does
+    # everything after it with a fresh created_at
+    conn = sqlite_db()
+    cur = conn.cursor(dictionary=True)
+    settled = record_change(cur, 1, 10, "visit", 5, "create")
+    fresh = record_change(cur, 1, 10, "visit", 6, "create")
+    conn.commit()
+    backdate(conn, settled["id"], SETTLE_SECONDS + 1)
+
+    changes, _ = fetch_changes(cur, 1, 0, 10)
+    assert [c["id"] for c in changes] == [settled["id"]]
+    assert fresh["id"] not in [c["id"] for c in changes]
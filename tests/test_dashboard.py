@@ -0,0 +1,38 @@
+def test_sections_and_field_selection(doctor, patient_id):
+    response = doctor.get(f"/api/patients/{patient_id}/dashboard")
+    assert response.status_code == 200
+    dashboard = response.get_json()
+    assert set(dashboard) == {"patient", "visits", "digestive", "sheets", "history", "documents"}
+    # No stored digestive form: null, so the client keeps its placeholders
+    assert dashboard["digestive"] is None
+
+    dashboard = doctor.get(f"/api/patients/{patient_id}/dashboard?fields=visits").get_json()
+    assert set(dashboard) == {"visits"}
+
+
+def test_digestive_section_is_the_stored_row(doctor, patient_id):
+    response = doctor.post(f"/api/digestive/{patient_id}", json={"notes": "mild pain", "smoker": 1})
+    assert response.status_code == 200
+    dashboard = doctor.get(f"/api/patients/{patient_id}/dashboard?fields=digestive").get_json()
+    assert dashboard["digestive"]["notes"] == "mild pain"
+
+
+def test_unknown_sheet_types_are_dropped(doctor, patient_id):
+    visit = doctor.post(f"/api/patients/{patient_id}/visits", json={"visit_date": "2024-05-01"})
+    visit_id = visit.get_json()["visit"]["id"]
+    doctor.post("/api/sheets/cardiac", json={
+        "patient_id": patient_id, "visit_id": visit_id, "data": {"rhythm": "regular"}})
+
+    types = ",".join(["cardiac", "cardiac", "nope"] + [f"x{i}" for i in range(500)])
+    response = doctor.get(
+        f"/api/patients/{patient_id}/dashboard?fields=sheets,history&sheet_types={types}")
+    assert response.status_code == 200
+    dashboard = response.get_json()
+    assert set(dashboard["sheets"]) == set(dashboard["history"]) == {"cardiac"}
+    assert dashboard["sheets"]["cardiac"]["data"] == {"rhythm": "regular"}
+    assert len(dashboard["history"]["cardiac"]) == 1
+
+
+def test_other_doctors_patient_is_not_found(doctor, patient_id, switch_doctor):
+    switch_doctor("T-2")
+    assert doctor.get(f"/api/patients/{patient_id}/dashboard").status_code == 404
@@ -0,0 +1,124 @@
+import time
+
+import mysql.connector
+import pytest
+
+from db_router import ReplicaRouter
+
+
+class StubCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, operation, params=()):
+        self.conn.statements.append(operation)
+        if self.conn.config.get("down"):
+            raise mysql.connector.errors.OperationalError("server gone")
+
+    def fetchone(self):
+        # A replica reports its lag; the primary has no replica status
+        if "lag" not in self.conn.config:
+            return None
+        return {"Seconds_Behind_Source": self.conn.config["lag"]}
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    def __init__(self, config):
+        self.config = config
+        self.name = config["database"]
+        self.statements = []
+
+    def cursor(self, dictionary=False):
+        return StubCursor(self)
+
+    def close(self):
+        pass
+
+
+class StubServers:
+    """Stands in for mysql.connector.connect; the configs' database names the server."""
+
+    def __init__(self):
+        self.refused = set()
+
+    def __call__(self, **config):
+        if config["database"] in self.refused:
+            raise mysql.connector.errors.InterfaceError("connection refused")
+        return StubConnection(config)
+
+
+PRIMARY = {"database": "primary"}
+
+
+def make_router(*replicas, max_lag=5, **kwargs):
+    servers = StubServers()
+    router = ReplicaRouter(PRIMARY, list(replicas), max_lag=max_lag,
+                           check_interval=0, connect=servers, **kwargs)
+    return router, servers
+
+
+def test_writes_go_to_the_primary():
+    router, _ = make_router({"database": "replica", "lag": 0})
+    assert router.connection(read_only=False).name == "primary"
+    assert router.primary().name == "primary"
+
+
+def test_reads_go_to_replicas_in_turn():
+    router, _ = make_router({"database": "r0", "lag": 0}, {"database": "r1", "lag": 1})
+    names = [router.connection(read_only=True).name for _ in range(4)]
+    assert names == ["r0", "r1", "r0", "r1"]
+
+
+def test_reads_without_replicas_use_the_primary():
+    router, _ = make_router()
+    assert router.connection(read_only=True).name == "primary"
+
+
+def test_lagging_replica_is_skipped():
+    router, _ = make_router({"database": "slow", "lag": 30}, {"database": "fast", "lag": 2})
+    assert {router.replica().name for _ in range(4)} == {"fast"}
+
+
+@pytest.mark.parametrize("replica", [
+    {"database": "slow", "lag": 30},
+    {"database": "stopped", "lag": None},  # replication not running
+    {"database": "no_status"},  # not a replica at all
+    {"database": "broken", "lag": 0, "down": True},  # lag check fails
+])
+def test_reads_fall_back_to_the_primary(replica):
+    router, _ = make_router(replica)
+    assert router.connection(read_only=True).name == "primary"
+
+
+def test_unreachable_replica_falls_back_until_next_check():
+    router, servers = make_router({"database": "replica", "lag": 0})
+    router.check_interval = 60
+    assert router.replica().name == "replica"
+    servers.refused.add("replica")
+    assert router.replica().name == "primary"
+    servers.refused.clear()
+    # Marked unhealthy until the next lag check
+    assert router.replica().name == "primary"
+
+
+def test_read_your_writes_window():
+    router, _ = make_router({"database": "replica", "lag": 0})
+    now = time.time()
+    assert router.connection(True, last_write_at=now, read_your_writes=5).name == "primary"
+    assert router.connection(True, last_write_at=now - 10, read_your_writes=5).name == "replica"
+    # Sessions that never wrote read from replicas
+    assert router.connection(True, read_your_writes=5).name == "replica"
+
+
+def test_init_statements_run_on_every_unpooled_primary():
+    router, _ = make_router(init_statements=("SET time_zone = '+00:00'",))
+    conn = router.primary()
+    assert conn.statements == ["SET time_zone = '+00:00'"]
+
+
+def test_connect_hook_disables_pooling():
+    router, _ = make_router(primary_pool_size=8)
+    assert router.primary_pool_size == 0
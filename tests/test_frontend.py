@@ -0,0 +1,71 @@
+import pytest
+from flask import Flask
+
+from frontend import IMMUTABLE, REVALIDATE, Frontend
+
+
+@pytest.fixture
+def build(tmp_path):
+    """A dist/ folder with precompressed siblings for app.js only."""
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html>app</html>")
+    (tmp_path / "assets" / "app-AbCd1234.js").write_text("plain")
+    (tmp_path / "assets" / "app-AbCd1234.js.br").write_bytes(b"brotli")
+    (tmp_path / "assets" / "app-AbCd1234.js.gz").write_bytes(b"gzip")
+    (tmp_path / "assets" / "logo-AbCd1234.png").write_bytes(b"png")
+    return tmp_path
+
+
+@pytest.fixture
+def client(build):
+    app = Flask(__name__)
+    frontend = Frontend(str(build))
+
+    @app.route("/", defaults={"path": ""})
+    @app.route("/<path:path>")
+    def serve(path):
+        return frontend.response(path)
+
+    return app.test_client()
+
+
+def get(client, path, accept="identity"):
+    return client.get(path, headers={"Accept-Encoding": accept})
+
+
+@pytest.mark.parametrize("accept, encoding, body", [
+    ("gzip, br", "br", b"brotli"),
+    ("gzip", "gzip", b"gzip"),
+    ("identity", None, b"plain"),
+])
+def test_precompressed_sibling_matches_accept_encoding(client, accept, encoding, body):
+    response = get(client, "/assets/app-AbCd1234.js", accept)
+    assert response.get_data() == body
+    assert response.headers.get("Content-Encoding") == encoding
+    assert response.mimetype in ("application/javascript", "text/javascript")
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["Cache-Control"] == IMMUTABLE
+
+
+def test_files_without_siblings_do_not_vary(client):
+    response = get(client, "/assets/logo-AbCd1234.png", "gzip, br")
+    assert response.get_data() == b"png"
+    assert "Content-Encoding" not in response.headers
+    assert "Vary" not in response.headers
+
+
+def test_siblings_are_not_served_directly(client):
+    assert get(client, "/assets/app-AbCd1234.js.br").status_code == 404
+
+
+def test_client_routes_get_index_html(client):
+    for path in ("/", "/patients/12"):
+        response = get(client, path)
+        assert response.get_data() == b"<html>app</html>"
+        assert response.headers["Cache-Control"] == REVALIDATE
+
+
+def test_missing_files_are_not_index_html(client):
+    assert get(client, "/assets/gone-AbCd1234.js").status_code == 404
+    assert get(client, "/favicon.ico").status_code == 404
+    assert get(client, "/../secret.txt").status_code == 404
@@ -0,0 +1,98 @@
+import gzip
+
+import pytest
+from flask import Flask, Response, jsonify
+
+import http_cache
+
+BIG = {"notes": "x" * 2000}
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+
+    @app.route("/versioned/<int:version>")
+    def versioned(version):
+        if http_cache.not_modified(version):
+            return "", 304
+        return jsonify(version=version)
+
+    @app.route("/json")
+    def big_json():
+        return jsonify(BIG)
+
+    @app.route("/small")
+    def small_json():
+        return jsonify(ok=True)
+
+    @app.route("/missing")
+    def missing():
+        return jsonify(BIG), 404
+
+    @app.route("/png")
+    def png():
+        return Response(b"x" * 2000, mimetype="image/png")
+
+    @app.route("/stream")
+    def stream():
+        return Response((b"x" * 2000 for _ in range(2)), mimetype="text/plain")
+
+    @app.route("/encoded")
+    def encoded():
+        response = Response(b"x" * 2000, mimetype="text/plain")
+        response.headers["Content-Encoding"] = "identity"
+        return response
+
+    @app.after_request
+    def after(response):
+        response = http_cache.apply_cache_headers(response)
+        return http_cache.compress_response(response, min_size=1024)
+
+    return app.test_client()
+
+
+def test_etag_round_trip(app):
+    response = app.get("/versioned/1")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith("W/")
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = app.get("/versioned/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    # Another version, or another URL with the same version, is a new ETag
+    assert app.get("/versioned/2", headers={"If-None-Match": etag}).status_code == 200
+    assert app.get("/versioned/1?x=1", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_version_etag_depends_on_every_part():
+    assert http_cache.version_etag("a", 1) == http_cache.version_etag("a", 1)
+    assert http_cache.version_etag("a", 1) != http_cache.version_etag("a", 2)
+
+
+def test_gzip_when_brotli_is_not_accepted(app):
+    response = app.get("/json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert b'"notes"' in gzip.decompress(response.get_data())
+
+
+@pytest.mark.skipif(http_cache.brotli is None, reason="brotli not installed")
+def test_brotli_preferred(app):
+    response = app.get("/json", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+
+
+@pytest.mark.parametrize("path", ["/small", "/missing", "/png", "/stream", "/encoded"])
+def test_compression_skipped(app, path):
+    response = app.get(path, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers.get("Content-Encoding") in (None, "identity")
+
+
+def test_no_compression_without_accept_encoding(app):
+    response = app.get("/json", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    # Still varies: another client may get a compressed copy
+    assert "Accept-Encoding" in response.headers["Vary"]
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import jobs
+
+
+def make_due(conn):
+    """Move every job's run_at and lease into the past."""
+    cur = conn.cursor()
+    past = datetime.now() - timedelta(hours=1)
+    cur.execute("UPDATE jobs SET run_at = %s, locked_at = CASE WHEN locked_at IS NULL THEN NULL ELSE %s END",
+                (past, past))
+    conn.commit()
+    cur.close()
+
+
+def state(conn, job_id):
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT state, attempts, last_error FROM jobs WHERE id = %s", (job_id,))
+    row = cur.fetchone()
+    cur.close()
+    return row
+
+
+def enqueue(conn, kind, **kwargs):
+    cur = conn.cursor()
+    job_id = jobs.enqueue(cur, kind, {"n": 1}, **kwargs)
+    conn.commit()
+    cur.close()
+    return job_id
+
+
+def test_claim_by_priority_and_complete(sqlite_db):
+    conn = sqlite_db()
+    low = enqueue(conn, "low")
+    high = enqueue(conn, "high", priority=5)
+    later = enqueue(conn, "later", delay=3600)
+
+    claimed = jobs.claim(conn, "w1", 10)
+    assert [job["id"] for job in claimed] == [high, low]
+    assert claimed[0]["payload"] == {"n": 1} and claimed[0]["attempts"] == 1
+    assert jobs.claim(conn, "w2", 10) == []  # running, or not due
+
+    jobs.complete(conn, claimed[0])
+    assert state(conn, high)["state"] == "done"
+    assert state(conn, later)["state"] == "queued"
+
+
+def test_fail_retries_with_backoff_then_gives_up(sqlite_db):
+    conn = sqlite_db()
+    job_id = enqueue(conn, "flaky", max_attempts=2)
+
+    job, = jobs.claim(conn, "w1", 1)
+    jobs.fail(conn, job, "boom")
+    assert state(conn, job_id)["state"] == "queued"
+    assert jobs.claim(conn, "w1", 1) == []  # backing off
+
+    make_due(conn)
+    job, = jobs.claim(conn, "w1", 1)
+    jobs.fail(conn, job, "boom again")
+    assert state(conn, job_id) == {"state": "failed", "attempts": 2, "last_error": "boom again"}
+
+
+def test_backoff_grows_and_is_capped():
+    base = jobs.JOB_BACKOFF_BASE
+    # +-50% jitter around base * 2**(attempts - 1)
+    assert 0.5 * base <= jobs.backoff(1) <= 1.5 * base
+    assert 0.5 * 4 * base <= jobs.backoff(3) <= 1.5 * 4 * base
+    assert jobs.backoff(50) <= 1.5 * jobs.JOB_BACKOFF_MAX
+
+
+def test_stale_jobs_are_requeued(sqlite_db):
+    conn = sqlite_db()
+    job_id = enqueue(conn, "slow")
+    jobs.claim(conn, "w1", 1)
+    assert jobs.requeue_stale(conn, 60) == (0, 0)  # lease not expired
+
+    make_due(conn)
+    assert jobs.requeue_stale(conn, 60) == (1, 0)
+    assert state(conn, job_id)["state"] == "queued"
+    assert [job["id"] for job in jobs.claim(conn, "w2", 1)] == [job_id]
+
+
+def test_poison_job_fails_instead_of_killing_workers_forever(sqlite_db):
+    # The worker dies on every attempt, so fail() never runs
+    conn = sqlite_db()
+    job_id = enqueue(conn, "poison", max_attempts=2)
+    for _ in range(2):
+        assert [job["id"] for job in jobs.claim(conn, "w", 1)] == [job_id]
+        make_due(conn)
+        jobs.requeue_stale(conn, 60)
+    row = state(conn, job_id)
+    assert row["state"] == "failed" and row["last_error"] == "worker died while running"
+    assert jobs.claim(conn, "w", 1) == []
+
+
+def test_recurring_jobs_are_always_requeued(sqlite_db):
+    conn = sqlite_db()
+    jobs.schedule_recurring(conn, {"rollup": ("rollup", {}, 60)})
+    make_due(conn)
+    for _ in range(jobs.JOB_MAX_ATTEMPTS + 1):
+        job, = jobs.claim(conn, "w", 1)
+        make_due(conn)
+        assert jobs.requeue_stale(conn, 60) == (1, 0)
+    assert state(conn, job["id"])["state"] == "queued"
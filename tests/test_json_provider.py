@@ -0,0 +1,61 @@
+import datetime
+import decimal
+import json
+
+import pytest
+
+import json_provider
+from json_provider import RawJSON, dumps_stdlib
+
+# Spacing and key order a parse + dump would change
+RAW = '{"b": 1,  "a": [true, null], "text": "quote \\" and \\u00e9"}'
+ROWS_DATE = datetime.datetime(2024, 5, 1, 8, 30)
+ROWS = {
+    "entries": [
+        {"id": 1, "data": RawJSON(RAW), "created_at": ROWS_DATE},
+        {"id": 2, "data": RawJSON("[]")},
+    ],
+}
+
+
+def check(text):
+    assert RAW in text
+    parsed = json.loads(text)
+    assert parsed["entries"][0]["data"] == json.loads(RAW)
+    assert parsed["entries"][0]["created_at"] == "2024-05-01 08:30:00"
+
+
+def test_stdlib_splices_raw_json():
+    check(dumps_stdlib(ROWS))
+
+
+def test_stdlib_leaves_lookalike_strings():
+    text = dumps_stdlib({"note": "0:1", "data": RawJSON("{}")})
+    assert json.loads(text) == {"note": "0:1", "data": {}}
+
+
+@pytest.mark.skipif(json_provider.orjson is None, reason="orjson not installed")
+@pytest.mark.parametrize("has_fragment", [True, False])
+def test_orjson_splices_raw_json(has_fragment, monkeypatch):
+    if has_fragment and not hasattr(json_provider.orjson, "Fragment"):
+        pytest.skip("orjson < 3.9")
+    monkeypatch.setattr(json_provider, "HAS_FRAGMENT", has_fragment)
+    # loads must not be needed to embed the raw text
+    monkeypatch.setattr(json_provider.orjson, "loads", None)
+    text = json_provider.dumps_orjson(ROWS, json_provider.orjson.OPT_PASSTHROUGH_DATETIME)
+    check(text.decode("utf-8"))
+
+
+def test_decimals_keep_flasks_string_format():
+    assert json.loads(dumps_stdlib({"t": decimal.Decimal("36.60")})) == {"t": "36.60"}
+
+
+@pytest.mark.parametrize("text", [RAW.encode(), bytearray(RAW.encode()), memoryview(RAW.encode())])
+def test_driver_bytes_are_spliced(text):
+    check(dumps_stdlib({"entries": [{"data": RawJSON(text), "created_at": ROWS_DATE}]}))
+
+
+def test_invalid_stored_json_falls_back():
+    for text in ('{"unterminated": ', "", b"\xff"):
+        assert json.loads(dumps_stdlib({"data": RawJSON(text)})) == {"data": {}}
+    assert json.loads(dumps_stdlib({"data": RawJSON("nope", fallback="null")})) == {"data": None}
@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.fixture
+def visit_id(doctor, patient_id):
+    response = doctor.post(f"/api/patients/{patient_id}/visits", json={"visit_date": "2024-05-01"})
+    return response.get_json()["visit"]["id"]
+
+
+def change_count(sqlite_db, patient_id):
+    cur = sqlite_db().cursor()
+    cur.execute("SELECT COUNT(*) FROM change_log WHERE patient_id = %s", (patient_id,))
+    return cur.fetchone()[0]
+
+
+def test_foreign_sheet_is_refused(doctor, patient_id, visit_id, sqlite_db, switch_doctor):
+    before = change_count(sqlite_db, patient_id)
+    switch_doctor("T-2")
+    response = doctor.post("/api/sheets/cardiac", json={
+        "patient_id": patient_id, "visit_id": visit_id, "data": {"rhythm": "injected"}})
+    assert response.status_code == 404
+    assert change_count(sqlite_db, patient_id) == before
+
+
+def test_visit_of_another_patient_is_refused(doctor, patient_id, visit_id):
+    other = doctor.post("/api/patients", json={
+        "first_name": "Bob", "last_name": "B", "birth_date": "1990-01-01",
+        "insurance_number": "INS-2"}).get_json()["patient"]["id"]
+    response = doctor.post("/api/sheets/cardiac", json={
+        "patient_id": other, "visit_id": visit_id, "data": {}})
+    assert response.status_code == 404
+    response = doctor.post("/api/sheets/cardiac", json={
+        "patient_id": patient_id, "visit_id": visit_id, "data": {}})
+    assert response.status_code == 201
+
+
+def test_bad_ids_are_rejected(doctor):
+    response = doctor.post("/api/sheets/cardiac", json={"patient_id": "x", "data": {}})
+    assert response.status_code == 400
+
+
+def test_foreign_digestive_is_refused(doctor, patient_id, sqlite_db, switch_doctor):
+    before = change_count(sqlite_db, patient_id)
+    switch_doctor("T-2")
+    assert doctor.post(f"/api/digestive/{patient_id}", json={"notes": "injected"}).status_code == 404
+    assert doctor.get(f"/api/digestive/{patient_id}").status_code == 404
+    assert change_count(sqlite_db, patient_id) == before
@@ -0,0 +1,22 @@
+import json
+import os
+
+from profiling import Profiler
+
+
+def test_profiles_are_saved_by_the_writer_thread(doctor, patient_id, tmp_path, monkeypatch):
+    import app
+    profiler = Profiler(str(tmp_path / "settings.json"), str(tmp_path), interval=0.001)
+    profiler.settings.update({"enabled": True, "sample_rate": 1.0})
+    monkeypatch.setattr(app, "profiler", profiler)
+
+    assert doctor.get(f"/api/patients/{patient_id}/dashboard").status_code == 200
+    profiler.writer.close()  # flushes the queue
+
+    [saved] = profiler.profiles()
+    assert saved["endpoint"] == "get_patient_dashboard" and saved["status"] == 200
+    assert saved["totals"]["sql"]["count"] > 0
+    with open(tmp_path / (saved["name"] + ".json"), encoding="utf-8") as f:
+        spans = json.load(f)["spans"]
+    assert spans["children"]
+    assert os.path.exists(tmp_path / (saved["name"] + ".folded"))
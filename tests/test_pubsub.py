@@ -0,0 +1,43 @@
+import sys
+import types
+
+import pytest
+
+import pubsub
+
+
+def test_gunicorn_without_gevent_refuses_to_start(monkeypatch):
+    monkeypatch.setitem(sys.modules, "gunicorn", types.ModuleType("gunicorn"))
+    monkeypatch.setattr(pubsub, "gevent_active", lambda: False)
+    with pytest.raises(RuntimeError, match="gevent"):
+        pubsub.check_gevent()
+    monkeypatch.setattr(pubsub, "gevent_active", lambda: True)
+    pubsub.check_gevent()
+
+
+def test_dev_server_needs_no_gevent(monkeypatch):
+    monkeypatch.delitem(sys.modules, "gunicorn", raising=False)
+    pubsub.check_gevent()
+
+
+def test_local_broker_fans_out_and_flags_overflow():
+    broker = pubsub.make_broker("memory", max_pending=1)
+    first = broker.subscribe("patient:1")
+    second = broker.subscribe("patient:1")
+    other = broker.subscribe("patient:2")
+    broker.publish("patient:1", {"id": 1})
+    assert first.get(timeout=0.1) == {"id": 1}
+    assert second.get(timeout=0.1) == {"id": 1}
+    assert other.get(timeout=0.01) is None
+
+    broker.publish("patient:1", {"id": 2})
+    broker.publish("patient:1", {"id": 3})
+    assert first.overflowed
+    first.close()
+    second.close()
+    other.close()
+
+
+def test_events_stream_is_read_only(client):
+    import app
+    assert getattr(app.app.view_functions["patient_events"], "read_only", False)
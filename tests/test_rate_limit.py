@@ -0,0 +1,57 @@
+import pytest
+
+import rate_limit
+from rate_limit import MemoryRateBackend, RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """rate_limit's monotonic clock, advanced by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+
+    def advance(seconds):
+        now[0] += seconds
+    return advance
+
+
+def test_burst_then_refill(clock):
+    backend = MemoryRateBackend()
+    # 2 tokens a second, bursts of 3
+    assert [backend.take("k", 2, 3) for _ in range(3)] == [0, 0, 0]
+    assert backend.take("k", 2, 3) == pytest.approx(0.5)
+    clock(0.5)
+    assert backend.take("k", 2, 3) == 0
+    assert backend.take("k", 2, 3) == pytest.approx(0.5)
+
+
+def test_refill_is_capped_at_burst(clock):
+    backend = MemoryRateBackend()
+    backend.take("k", 1, 2)
+    clock(3600)
+    assert [backend.take("k", 1, 2) for _ in range(2)] == [0, 0]
+    assert backend.take("k", 1, 2) > 0
+
+
+def test_buckets_are_per_key(clock):
+    backend = MemoryRateBackend()
+    assert backend.take("a", 1, 1) == 0
+    assert backend.take("a", 1, 1) > 0
+    assert backend.take("b", 1, 1) == 0
+
+
+def test_limiter_refuses_with_retry_after(clock):
+    limiter = RateLimiter(MemoryRateBackend(), {"writes": (0.5, 1)}, {"writes": 1})
+    assert limiter.check("doctor:1", "writes") is None
+    limiter.done("writes")
+    # Empty bucket: wait 2 s for the next token
+    assert limiter.check("doctor:1", "writes") == (429, 2)
+    clock(2)
+    assert limiter.check("doctor:1", "writes") is None
+    # The only slot is still taken
+    clock(2)
+    assert limiter.check("doctor:2", "writes") == (503, 1)
+    limiter.done("writes")
+    # The refused request still spent its token
+    clock(2)
+    assert limiter.check("doctor:2", "writes") is None
@@ -0,0 +1,63 @@
+import mysql.connector
+import pytest
+
+import repository
+
+
+class StubCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.executed = []
+
+    def execute(self, operation, params):
+        if self.conn.drop_statements:
+            self.conn.drop_statements -= 1
+            raise mysql.connector.errors.DatabaseError(errno=repository.ER_UNKNOWN_STMT_HANDLER)
+        self.executed.append((operation, params))
+
+    def fetchall(self):
+        return [("row",)]
+
+
+class StubConnection:
+    def __init__(self, drop_statements=0):
+        self.cursors = []
+        self.drop_statements = drop_statements
+
+    def cursor(self, prepared=False, dictionary=False):
+        assert prepared
+        cursor = StubCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+
+def test_prepared_cursor_is_reused_per_connection():
+    conn = StubConnection()
+    assert repository.fetch_one(conn, "doctor_by_number", ("D1",)) == ("row",)
+    assert repository.fetch_all(conn, "doctor_by_number", ("D2",)) == [("row",)]
+    [cursor] = conn.cursors
+    # The same statement object both times, so it is prepared once
+    assert cursor.executed[0][0] is cursor.executed[1][0]
+
+    other = StubConnection()
+    repository.fetch_one(other, "doctor_by_number", ("D1",))
+    assert len(other.cursors) == 1
+
+
+def test_dictionary_cursors_are_cached_separately():
+    conn = StubConnection()
+    repository.fetch_one(conn, "doctor_by_number", ("D1",))
+    repository.fetch_one(conn, "doctor_by_number", ("D1",), dictionary=True)
+    assert len(conn.cursors) == 2
+
+
+def test_dropped_statement_is_prepared_again_once():
+    conn = StubConnection()
+    repository.fetch_one(conn, "doctor_by_number", ("D1",))
+    conn.drop_statements = 1
+    assert repository.fetch_one(conn, "doctor_by_number", ("D1",)) == ("row",)
+    assert len(conn.cursors) == 2
+
+    conn.drop_statements = 2
+    with pytest.raises(mysql.connector.errors.DatabaseError):
+        repository.fetch_one(conn, "doctor_by_number", ("D1",))
@@ -0,0 +1,66 @@
+import search
+from config import SEARCH_MAX_TERMS
+
+
+def hit_count(client, query):
+    response = client.get(f"/api/search?q={query}")
+    assert response.status_code == 200
+    return len(response.get_json()["results"])
+
+
+def test_foreign_writes_do_not_touch_the_index(doctor, patient_id, switch_doctor):
+    assert doctor.post(f"/api/digestive/{patient_id}", json={"notes": "zebra stripes"}).status_code == 200
+    assert hit_count(doctor, "zebra") == 1
+
+    switch_doctor("T-2")
+    # Would re-index the row under T-2, hiding it from its owner
+    assert doctor.post(f"/api/digestive/{patient_id}", json={"notes": "zebra"}).status_code == 404
+    assert doctor.post("/api/sheets/cardiac", json={
+        "patient_id": patient_id, "data": {"note": "zebra"}}).status_code == 404
+    assert hit_count(doctor, "zebra") == 0
+
+    switch_doctor("T-1")
+    assert hit_count(doctor, "zebra") == 1
+
+
+def test_terms_are_plain_lower_case_words():
+    assert search.terms('Abdo +PAIN "pain" -fever*') == ["abdo", "pain", "fever"]
+    assert search.terms("+-*()") == []
+    assert len(search.terms(" ".join(f"w{i}" for i in range(50)))) == SEARCH_MAX_TERMS
+
+
+class RecordingCursor:
+    def execute(self, operation, params):
+        self.operation, self.params = operation, params
+
+    def fetchall(self):
+        return []
+
+
+def test_every_word_is_a_required_prefix():
+    cur = RecordingCursor()
+    hits, has_more = search.search(cur, 7, ["abdo", "pain"], 20, 40)
+    assert (hits, has_more) == ([], False)
+    query, again, doctor, owner, limit, offset = cur.params
+    assert query == again == "+abdo* +pain*"
+    assert (doctor, owner, limit, offset) == (7, 7, 21, 40)
+
+
+def test_snippet_highlights_word_prefixes():
+    text, highlights = search.snippet("Severe abdominal pain since Monday", ["abdo", "pain"], width=100)
+    assert text == "Severe abdominal pain since Monday"
+    assert [text[a:b] for a, b in highlights] == ["abdominal", "pain"]
+
+
+def test_snippet_window_is_marked_and_offsets_follow():
+    body = "filler " * 40 + "abdominal pain " + "more " * 40
+    text, highlights = search.snippet(body, ["pain"], width=60)
+    assert text.startswith("…") and text.endswith("…")
+    assert [text[a:b] for a, b in highlights] == ["pain"]
+
+
+def test_sheet_text_flattens_filled_fields():
+    data = {"rhythm": "regular", "murmur": True, "edema": False, "notes": "",
+            "pulses": {"left_radial": "weak"}, "drugs": ["aspirin", None]}
+    assert search.sheet_text(data) == [
+        "rhythm: regular", "murmur", "pulses left radial: weak", "drugs: aspirin"]
@@ -0,0 +1,43 @@
+from session_store import DoctorContextCache, MemoryBackend, make_backend
+
+
+def test_entries_are_separate_keys():
+    backend = MemoryBackend()
+    cache = DoctorContextCache(backend, ttl=60)
+    cache.remember(1, "p:10", 10)
+    cache.remember(1, "v:100", 10)
+    assert backend.get("doctor:1:p:10") == 10
+    assert backend.get("doctor:1:v:100") == 10
+    assert cache.lookup(1, "p:10") == 10
+    assert cache.lookup(2, "p:10") is None
+
+
+def test_forget_patient_and_clear():
+    backend = MemoryBackend()
+    cache = DoctorContextCache(backend, ttl=60)
+    cache.remember(1, "p:10", 10)
+    cache.remember(1, "p:11", 11)
+    cache.remember(2, "p:20", 20)
+    cache.forget_patient(1, 10)
+    assert cache.lookup(1, "p:10") is None
+    assert cache.lookup(1, "p:11") == 11
+    cache.clear(1)
+    assert cache.lookup(1, "p:11") is None
+    assert cache.lookup(2, "p:20") == 20
+
+
+def test_entries_expire(monkeypatch):
+    import session_store
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+    cache = DoctorContextCache(MemoryBackend(), ttl=60)
+    cache.remember(1, "p:10", 10)
+    now[0] += 61
+    assert cache.lookup(1, "p:10") is None
+
+
+def test_cookie_sessions_cache_nothing():
+    assert make_backend("cookie") is None
+    cache = DoctorContextCache(None)
+    cache.remember(1, "p:10", 10)
+    assert cache.lookup(1, "p:10") is None
@@ -0,0 +1,78 @@
+import pytest
+
+import sqlite_backend
+from db_router import ReplicaRouter
+from sharding import ShardMap, ShardMoving
+
+SHARDS = {
+    "shard0": {"primary": {"database": "ehr_db"}, "id_offset": 1},
+    "shard1": {"primary": {"database": "shard1"}, "id_offset": 2},
+}
+
+
+@pytest.fixture
+def shard_map(sqlite_db):
+    sqlite_backend.init_schema("shard1")
+    directory = ReplicaRouter({"database": "ehr_db"}, [], connect=sqlite_backend.connect)
+    conn = sqlite_db()
+    cur = conn.cursor()
+    for doctor_id in (1, 2, 3):
+        cur.execute(
+            "INSERT INTO doctors (id, doctor_number, name, email, password_hash) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (doctor_id, f"D-{doctor_id}", f"Dr {doctor_id}", f"{doctor_id}@example.com", "x"),
+        )
+    conn.commit()
+    conn.close()
+    return ShardMap(directory, SHARDS, "shard0", 10, cache_seconds=60,
+                    connect=sqlite_backend.connect)
+
+
+def set_state(sqlite_db, doctor_id, shard, state):
+    conn = sqlite_db()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO doctor_shards (doctor_id, shard, state) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE shard = VALUES(shard), state = VALUES(state)",
+        (doctor_id, shard, state),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_unmapped_doctors_live_on_the_default_shard(shard_map):
+    assert shard_map.lookup(1) == ("shard0", "active")
+    assert shard_map.router_for(1) is shard_map.routers["shard0"]
+
+
+def test_mapped_doctor_routes_to_its_shard(shard_map, sqlite_db):
+    set_state(sqlite_db, 2, "shard1", "active")
+    assert shard_map.router_for(2) is shard_map.routers["shard1"]
+    assert shard_map.router_for(2, write=False) is shard_map.routers["shard1"]
+
+
+def test_moving_doctor_blocks_writes_but_not_reads(shard_map, sqlite_db):
+    set_state(sqlite_db, 1, "shard0", "moving")
+    assert shard_map.router_for(1, write=False) is shard_map.routers["shard0"]
+    with pytest.raises(ShardMoving):
+        shard_map.router_for(1)
+
+
+def test_lookups_are_cached_until_invalidated(shard_map, sqlite_db):
+    assert shard_map.lookup(1) == ("shard0", "active")
+    set_state(sqlite_db, 1, "shard1", "active")
+    assert shard_map.lookup(1) == ("shard0", "active")
+    shard_map.invalidate(1)
+    assert shard_map.lookup(1) == ("shard1", "active")
+
+
+def test_assign_picks_the_emptiest_shard(shard_map, sqlite_db):
+    conn = sqlite_db()
+    cur = conn.cursor()
+    # Ties go to the first shard by name
+    assert shard_map.assign(cur, 1) == "shard0"
+    assert shard_map.assign(cur, 2) == "shard1"
+    assert shard_map.assign(cur, 3) == "shard0"
+    conn.commit()
+    conn.close()
+    assert shard_map.lookup(2) == ("shard1", "active")
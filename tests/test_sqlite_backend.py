@@ -0,0 +1,124 @@
+from datetime import date, datetime
+
+import mysql.connector
+import pytest
+
+from sqlite_backend import ER_DUP_ENTRY, translate
+
+
+def test_translate():
+    assert translate("SELECT * FROM t WHERE a = %s AND b > NOW() - INTERVAL %s DAY") == (
+        "SELECT * FROM t WHERE a = ? AND b > DATE_ADD_INTERVAL(NOW(), -(?), 'DAY')", False)
+    assert translate(
+        "INSERT INTO t (a, b) VALUES (%s, %s) ON DUPLICATE KEY UPDATE b = VALUES(b)"
+    ) == ("INSERT INTO t (a, b) VALUES (?, ?) ON CONFLICT DO UPDATE SET b = excluded.b", False)
+    # FOR UPDATE becomes a write transaction
+    assert translate("SELECT id FROM t WHERE id = %s FOR UPDATE") == (
+        "SELECT id FROM t WHERE id = ?", True)
+
+
+def test_duplicate_key_raises_mysql_integrity_error(sqlite_db):
+    conn = sqlite_db()
+    cur = conn.cursor()
+    sql = """
+        INSERT INTO doctors (doctor_number, name, email, password_hash)
+        VALUES (%s, %s, %s, %s)
+    """
+    cur.execute(sql, ("D1", "Doctor", "d1@example.com", "hash"))
+    conn.commit()
+    with pytest.raises(mysql.connector.IntegrityError) as raised:
+        cur.execute(sql, ("D1", "Doctor", "other@example.com", "hash"))
+    assert raised.value.errno == ER_DUP_ENTRY
+    conn.rollback()
+
+
+def test_app_smoke(client):
+    doctor = {"name": "Dr Test", "email": "test@example.com",
+              "doctor_number": "T-1", "password": "correct horse"}
+    assert client.post("/api/register", json=doctor).status_code == 201
+    assert client.post("/api/register", json=doctor).status_code == 400  # duplicate
+
+    response = client.post("/api/login", json={"doctor_number": "T-1", "password": "correct horse"})
+    assert response.status_code == 200
+
+    response = client.post("/api/patients", json={
+        "first_name": "Ada", "last_name": "Lovelace",
+        "birth_date": "1815-12-10", "insurance_number": "INS-1",
+    })
+    assert response.status_code == 201
+    patient_id = response.get_json()["patient"]["id"]
+
+    response = client.post(f"/api/patients/{patient_id}/visits", json={
+        "visit_date": date.today().isoformat(), "visit_type": "general",
+        "chief_complaint": "abdominal pain", "notes": "",
+    })
+    assert response.status_code == 201
+    visit_id = response.get_json()["visit"]["id"]
+
+    response = client.get(f"/api/patients/{patient_id}/dashboard")
+    assert response.status_code == 200
+    dashboard = response.get_json()
+    assert dashboard["patient"]["last_name"] == "Lovelace"
+    assert [visit["id"] for visit in dashboard["visits"]] == [visit_id]
+
+    etag = response.headers["ETag"]
+    response = client.get(f"/api/patients/{patient_id}/dashboard",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_app_requires_login(client):
+    assert client.get("/api/patients/1/dashboard").status_code == 401
+
+
+def add_doctor(conn, number):
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO doctors (doctor_number, name, email, password_hash) VALUES (%s, %s, %s, %s)",
+        (number, "2024-01-02 03:04:05", f"{number}@example.com", "hash"),
+    )
+    return cur
+
+
+def count_doctors(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM doctors")
+    return cur.fetchone()[0]
+
+
+def test_each_handle_has_its_own_transaction(sqlite_db):
+    request, audit = sqlite_db(), sqlite_db()
+    add_doctor(request, "D1")
+    # Another handle on the same thread neither sees nor commits the write
+    assert count_doctors(audit) == 0
+    audit.commit()
+    audit.close()
+    request.rollback()
+    assert count_doctors(request) == 0
+
+
+def test_close_rolls_back_uncommitted_writes(sqlite_db):
+    conn = sqlite_db()
+    add_doctor(conn, "D1")
+    other = sqlite_db()
+    conn.close()
+    assert count_doctors(other) == 0
+    # The next connect() reuses the closed handle's connection, clean
+    reused = sqlite_db()
+    assert not reused.in_transaction
+    assert count_doctors(reused) == 0
+
+
+def test_only_date_columns_come_back_as_datetimes(sqlite_db):
+    conn = sqlite_db()
+    cur = add_doctor(conn, "D1")
+    cur.execute("INSERT INTO doctor_shards (doctor_id, shard) VALUES (%s, %s)", (cur.lastrowid, "shard0"))
+    conn.commit()
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT name FROM doctors")
+    # Text that happens to look like a timestamp stays text
+    assert cur.fetchone()["name"] == "2024-01-02 03:04:05"
+    cur.execute("SELECT updated_at, MAX(updated_at) AS latest FROM doctor_shards")
+    row = cur.fetchone()
+    assert isinstance(row["updated_at"], datetime)
+    assert isinstance(row["latest"], datetime)
@@ -0,0 +1,88 @@
+import os
+import time
+
+import pytest
+
+import db_backend
+import upload_gc
+
+OLD = time.time() - 30 * 86400
+
+
+@pytest.fixture
+def uploads(sqlite_db, tmp_path, monkeypatch):
+    """An upload folder next to a database with one visit to attach files to.
+
+    Returns add(name, referenced=False, age=OLD) -> path.
+    """
+    folder = tmp_path / "uploads"
+    folder.mkdir()
+    monkeypatch.setattr(db_backend, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(upload_gc, "UPLOAD_FOLDER", str(folder))
+    monkeypatch.setattr(upload_gc, "QUARANTINE_FOLDER", str(folder / ".quarantine"))
+    monkeypatch.setattr(upload_gc, "UPLOAD_GC_MAX_OPS_PER_SECOND", 0)
+
+    conn = sqlite_db()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO doctors (doctor_number, name, email, password_hash) VALUES (%s, %s, %s, %s)",
+        ("D1", "Doctor", "d1@example.com", "hash"),
+    )
+    cur.execute("INSERT INTO patients (doctor_id, last_name) VALUES (%s, %s)", (cur.lastrowid, "Lovelace"))
+    patient_id = cur.lastrowid
+    cur.execute("INSERT INTO visits (patient_id, visit_date) VALUES (%s, %s)", (patient_id, "2024-05-01"))
+    visit_id = cur.lastrowid
+    conn.commit()
+
+    def add(name, referenced=False, age=OLD):
+        path = os.path.join(upload_gc.UPLOAD_FOLDER, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        os.utime(path, (age, age))
+        if referenced:
+            cur.execute(
+                "INSERT INTO documents (visit_id, patient_id, file_name, file_path) VALUES (%s, %s, %s, %s)",
+                (visit_id, patient_id, name, path),
+            )
+            conn.commit()
+        return path
+
+    yield add
+    conn.close()
+
+
+def test_only_old_unreferenced_files_are_quarantined(uploads):
+    kept = uploads("kept.pdf", referenced=True)
+    orphan = uploads("orphan.pdf")
+    fresh = uploads("fresh.pdf", age=time.time())
+
+    stats = upload_gc.collect()
+
+    assert (stats["scanned"], stats["too_new"], stats["orphans"], stats["quarantined"]) == (3, 1, 1, 1)
+    assert stats["orphan_bytes"] == 10
+    assert os.path.exists(kept) and os.path.exists(fresh)
+    assert not os.path.exists(orphan)
+    assert [name.split("_", 1)[1] for name in os.listdir(upload_gc.QUARANTINE_FOLDER)] == ["orphan.pdf"]
+
+
+def test_dry_run_moves_nothing(uploads):
+    orphan = uploads("orphan.pdf")
+    stats = upload_gc.collect(dry_run=True)
+    assert stats["orphans"] == 1 and stats["quarantined"] == 0
+    assert os.path.exists(orphan)
+
+
+def test_expired_quarantine_is_purged_unless_referenced_again(uploads):
+    os.makedirs(upload_gc.QUARANTINE_FOLDER)
+    stamp = int(OLD)
+    for name in ("gone.pdf", "back.pdf"):
+        open(os.path.join(upload_gc.QUARANTINE_FOLDER, f"{stamp}_{name}"), "wb").close()
+    # Referenced again after it was quarantined: the row exists, the file does not
+    back = uploads("back.pdf", referenced=True)
+    os.remove(back)
+
+    stats = upload_gc.collect()
+
+    assert (stats["purged"], stats["restored"]) == (1, 1)
+    assert os.path.exists(back)
+    assert os.listdir(upload_gc.QUARANTINE_FOLDER) == []
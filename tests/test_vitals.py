@@ -0,0 +1,55 @@
+import pytest
+
+READINGS = [
+    ("2024-05-06 08:00:00", 60, "36.5"),
+    ("2024-05-06 20:00:00", 80, "37.5"),
+    ("2024-05-08 09:00:00", 70, "37.0"),
+]
+
+
+@pytest.fixture
+def vitals(doctor, patient_id, sqlite_db):
+    visit = doctor.post(f"/api/patients/{patient_id}/visits", json={"visit_date": "2024-05-06"})
+    visit_id = visit.get_json()["visit"]["id"]
+    conn = sqlite_db()
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO ehr_data (visit_id, patient_id, created_at, heart_rate, temperature) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        [(visit_id, patient_id) + reading for reading in READINGS],
+    )
+    conn.commit()
+    conn.close()
+    return f"/api/patients/{patient_id}/vitals"
+
+
+def test_daily_buckets(doctor, vitals):
+    result = doctor.get(vitals + "?metrics=heart_rate,temperature").get_json()
+    assert result["count"] == [2, 1]
+    assert result["series"]["heart_rate"] == {"min": [60, 70], "max": [80, 70], "avg": [70, 70]}
+    # Numbers, not Decimal strings, so charts can plot them
+    assert result["series"]["temperature"]["avg"] == [37.0, 37.0]
+    assert set(result["series"]) == {"heart_rate", "temperature"}
+
+
+def test_weekly_buckets_start_on_monday(doctor, vitals):
+    result = doctor.get(vitals + "?metrics=heart_rate&bucket=week").get_json()
+    assert result["t"] == ["2024-05-06"]
+    assert result["count"] == [3]
+
+
+def test_raw_readings_in_range(doctor, vitals):
+    result = doctor.get(vitals + "?metrics=heart_rate&bucket=raw&from=2024-05-06 12:00:00").get_json()
+    assert result["t"] == ["2024-05-06 20:00:00", "2024-05-08 09:00:00"]
+    assert result["series"]["heart_rate"] == [80, 70]
+    assert result["truncated"] is False
+
+
+def test_unknown_metric_or_bucket(doctor, vitals):
+    assert doctor.get(vitals + "?metrics=shoe_size").status_code == 400
+    assert doctor.get(vitals + "?bucket=hour").status_code == 400
+
+
+def test_other_doctors_patient(doctor, vitals, switch_doctor):
+    switch_doctor("T-2")
+    assert doctor.get(vitals).status_code == 404
@@ -0,0 +1,172 @@
+"""
+Upload garbage collector
+Finds files in the upload folder that no `documents` row on any shard points
+at (left behind by failed uploads or deleted patients), moves them to a
+quarantine folder, and deletes quarantined files after a grace period.
+
+Usage:
+    python upload_gc.py            # quarantine orphans, purge old quarantine
+    python upload_gc.py dry-run    # only report what would happen
+
+The folder is read with os.scandir and checked against MySQL in batches,
+so memory stays bounded however many files there are; each batch reads a
+fresh snapshot. Files younger than
+UPLOAD_GC_MIN_AGE_SECONDS are skipped (their upload may still be
+committing), and file operations are paced to UPLOAD_GC_MAX_OPS_PER_SECOND.
+A quarantined file that is referenced again is moved back, not deleted.
+"""
+import os
+import sys
+import time
+
+import mysql.connector
+from config import (
+    SHARDS, UPLOAD_FOLDER, UPLOAD_GC_BATCH_SIZE, UPLOAD_GC_MIN_AGE_SECONDS,
+    UPLOAD_GC_QUARANTINE_DAYS, UPLOAD_GC_MAX_OPS_PER_SECOND,
+)
+
+import db_backend
+
+QUARANTINE_FOLDER = os.path.join(UPLOAD_FOLDER, ".quarantine")
+
+
+class Pacer:
+    """Sleeps as needed to stay under `per_second` operations."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+def _batches(entries, size):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _referenced(conns, paths):
+    """The subset of `paths` that some documents row points at."""
+    found = set()
+    for conn in conns:
+        remaining = [p for p in paths if p not in found]
+        if not remaining:
+            break
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                f"SELECT file_path FROM documents WHERE file_path IN ({', '.join(['%s'] * len(remaining))})",
+                tuple(remaining),
+            )
+            found.update(row[0] for row in cur.fetchall())
+        finally:
+            cur.close()
+            # End the read snapshot: under REPEATABLE READ one snapshot for
+            # the whole run would hide documents added since it started
+            conn.rollback()
+    return found
+
+
+def _files(folder):
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def quarantine_orphans(conns, dry_run, pacer, stats):
+    cutoff = time.time() - UPLOAD_GC_MIN_AGE_SECONDS
+    for batch in _batches(_files(UPLOAD_FOLDER), UPLOAD_GC_BATCH_SIZE):
+        stats["scanned"] += len(batch)
+        candidates = {}
+        for entry in batch:
+            info = entry.stat(follow_symlinks=False)
+            if info.st_mtime > cutoff:
+                stats["too_new"] += 1
+            else:
+                # Same form upload_document stores in documents.file_path
+                candidates[os.path.join(UPLOAD_FOLDER, entry.name)] = (entry.name, info.st_size)
+        if not candidates:
+            continue
+        referenced = _referenced(conns, list(candidates))
+        for path, (name, size) in candidates.items():
+            if path in referenced:
+                continue
+            stats["orphans"] += 1
+            stats["orphan_bytes"] += size
+            if dry_run:
+                print(f"  would quarantine {path} ({size} bytes)")
+                continue
+            pacer.wait()
+            # Rename within the same filesystem; the prefix records when it moved
+            os.replace(path, os.path.join(QUARANTINE_FOLDER, f"{int(time.time())}_{name}"))
+            stats["quarantined"] += 1
+
+
+def purge_quarantine(conns, dry_run, pacer, stats):
+    if not os.path.isdir(QUARANTINE_FOLDER):
+        return
+    cutoff = time.time() - UPLOAD_GC_QUARANTINE_DAYS * 86400
+    for batch in _batches(_files(QUARANTINE_FOLDER), UPLOAD_GC_BATCH_SIZE):
+        expired = {}
+        for entry in batch:
+            stamp, _, name = entry.name.partition("_")
+            if stamp.isdigit() and int(stamp) < cutoff:
+                expired[os.path.join(UPLOAD_FOLDER, name)] = entry.path
+        if not expired:
+            continue
+        referenced = _referenced(conns, list(expired))
+        for original, quarantined in expired.items():
+            pacer.wait()
+            if original in referenced:
+                stats["restored"] += 1
+                if not dry_run:
+                    os.replace(quarantined, original)
+                print(f"  {'would restore' if dry_run else 'restored'} {original} (referenced again)")
+                continue
+            stats["purged"] += 1
+            if not dry_run:
+                os.remove(quarantined)
+
+
+def collect(dry_run=False):
+    if not dry_run:
+        os.makedirs(QUARANTINE_FOLDER, exist_ok=True)
+    conns = [db_backend.connect(**shard["primary"]) for shard in SHARDS.values()]
+    pacer = Pacer(UPLOAD_GC_MAX_OPS_PER_SECOND)
+    stats = dict.fromkeys(
+        ("scanned", "too_new", "orphans", "orphan_bytes", "quarantined", "purged", "restored"), 0
+    )
+    try:
+        quarantine_orphans(conns, dry_run, pacer, stats)
+        purge_quarantine(conns, dry_run, pacer, stats)
+        print(f"[OK] Scanned {stats['scanned']} files ({stats['too_new']} too new to judge)")
+        print(f"[OK] {stats['orphans']} orphans, {stats['orphan_bytes']} bytes"
+              + (" (dry run, nothing moved)" if dry_run else f", {stats['quarantined']} quarantined"))
+        print(f"[OK] {stats['purged']} quarantined files {'to delete' if dry_run else 'deleted'}, "
+              f"{stats['restored']} restored")
+    except mysql.connector.Error as e:
+        print(f"[ERROR] Database error, stopping: {e}")
+    finally:
+        for conn in conns:
+            conn.close()
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] != "dry-run":
+        print(__doc__)
+    else:
+        collect(dry_run=len(sys.argv) > 1)
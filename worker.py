@@ -0,0 +1,125 @@
+"""
+Background job worker
+Polls the `jobs` table of every shard and runs due jobs (see jobs.py and
+tasks.py) in a pool of processes. Run as many workers as needed; they
+never claim the same job twice. Run from the app directory so relative
+upload paths resolve.
+
+Usage:
+    python worker.py [processes]
+
+SIGTERM/SIGINT stop claiming new jobs and wait for running ones.
+"""
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import mysql.connector
+from config import (
+    SHARDS, JOB_WORKER_PROCESSES, JOB_POLL_INTERVAL, JOB_LEASE_SECONDS, RECURRING_JOBS,
+)
+
+import db_backend
+import jobs
+import tasks
+
+
+def _ignore_signals():
+    # Children finish their job; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+class Worker:
+    def __init__(self, processes):
+        self.processes = processes
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.conns = {}
+        self.running = {}  # future -> (shard, job)
+        self.stopping = False
+        self._next_stale_check = 0.0
+
+    def conn(self, shard):
+        conn = self.conns.get(shard)
+        if conn is None or not conn.is_connected():
+            conn = db_backend.connect(**SHARDS[shard]["primary"])
+            self.conns[shard] = conn
+        return conn
+
+    def stop(self, *_):
+        if not self.stopping:
+            print(f"Stopping, waiting for {len(self.running)} running jobs...")
+        self.stopping = True
+
+    def _claim(self, pool):
+        for shard in SHARDS:
+            free = self.processes - len(self.running)
+            if free <= 0:
+                return
+            for job in jobs.claim(self.conn(shard), self.worker_id, free):
+                future = pool.submit(tasks.run, job["kind"], shard, job["payload"])
+                self.running[future] = (shard, job)
+
+    def _finish(self, done):
+        for future in done:
+            shard, job = self.running.pop(future)
+            error = future.exception()
+            if error is None:
+                jobs.complete(self.conn(shard), job)
+                print(f"[OK] {shard} job {job['id']} ({job['kind']})")
+            else:
+                message = "".join(
+                    traceback.format_exception(type(error), error, error.__traceback__)
+                )[-2000:]
+                jobs.fail(self.conn(shard), job, message)
+                print(f"[ERROR] {shard} job {job['id']} ({job['kind']}) attempt "
+                      f"{job['attempts']}: {error}")
+
+    def _requeue_stale(self):
+        now = time.monotonic()
+        if now < self._next_stale_check:
+            return
+        self._next_stale_check = now + JOB_LEASE_SECONDS / 10
+        for shard in SHARDS:
+            requeued, failed = jobs.requeue_stale(self.conn(shard), JOB_LEASE_SECONDS)
+            if requeued:
+                print(f"[OK] Requeued {requeued} stale jobs on {shard}")
+            if failed:
+                print(f"[ERROR] {failed} jobs on {shard} killed their worker on every attempt, marked failed")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for shard in SHARDS:
+            jobs.schedule_recurring(self.conn(shard), RECURRING_JOBS)
+        print(f"Worker {self.worker_id} running {self.processes} processes "
+              f"on {', '.join(SHARDS)}")
+
+        with ProcessPoolExecutor(self.processes, initializer=_ignore_signals) as pool:
+            while not self.stopping or self.running:
+                try:
+                    if not self.stopping:
+                        self._requeue_stale()
+                        self._claim(pool)
+                    if self.running:
+                        done, _ = wait(self.running, timeout=JOB_POLL_INTERVAL,
+                                       return_when=FIRST_COMPLETED)
+                        self._finish(done)
+                    else:
+                        time.sleep(JOB_POLL_INTERVAL)
+                except mysql.connector.Error as e:
+                    # Database went away: drop connections and try again
+                    print(f"[ERROR] {e}")
+                    self.conns.clear()
+                    time.sleep(JOB_POLL_INTERVAL)
+
+        for conn in self.conns.values():
+            conn.close()
+
+
+if __name__ == "__main__":
+    Worker(int(sys.argv[1]) if len(sys.argv) > 1 else JOB_WORKER_PROCESSES).run()